@@ -2,24 +2,23 @@ import requests
 import json
 import ssl
 import os
+import time
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
 
-import logging
+from metrics import (API_REQUEST_SECONDS, API_ERRORS, API_THROTTLED, API_RATE_LIMIT_WAIT_SECONDS,
+                     API_RETRIES)
+from rate_limiter import rate_limiter
+from resilience import resilience, CircuitOpenError, RETRY_STATUS_CODES
+from logger import Logger
+from tracing import tracer
 
-LOGPATH = "./"
-LOGNAME = LOGPATH+"pox_schedule.log"
 CHALLENGE_END_STATES =  [   "ENDED_SUCCESSFULLY",
                             "ENDED_WITH_PARTIAL_SUCCESS", 
                             "ERROR_NOT_ENOUGH_CHALLENGERS",
                             "ERROR_ENDED_WITH_FAILURE"
                         ]
-# Configure the logging
-logging.basicConfig(filename=LOGNAME,
-                    filemode='a',
-                    level=logging.INFO,
-                    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-                    datefmt='%Y-%m-%d %H:%M:%S')
-logger = logging.getLogger(__name__)
+logger = Logger()
 
 full_path = os.path.abspath(__file__)
 SRC_PATH=os.path.dirname(full_path)+"/"
@@ -30,6 +29,72 @@ SSL_CONTEXT.check_hostname = True
 
 TIMEOUT_SECS = 120
 
+# 429s a call waits out (for Retry-After) before the 429 is returned to the caller
+MAX_THROTTLED_RETRIES = 5
+
+def _post(session, url, idempotent=True, **kwargs):
+    """
+    session.post under the shared rate limiter, retry policy and circuit breaker,
+    recording latency and failures per endpoint.
+
+    A 429 pauses the endpoint for its Retry-After and the request is sent again,
+    up to MAX_THROTTLED_RETRIES times. Network errors and 5xx responses are
+    retried with backoff as the host's RetryPolicy allows; pass idempotent=False
+    for calls that must not be repeated once the API may have acted on them,
+    which are only sent again when the connection could not be opened (a 429
+    still pauses the endpoint, and is returned).
+    While the endpoint's circuit is open, CircuitOpenError is raised at once.
+    """
+    endpoint = url.rsplit("/", 1)[-1]
+    policy = resilience.policy(url)
+    breaker = resilience.breaker(url)
+    if policy:
+        kwargs["timeout"] = policy.timeout
+    attempt = throttled = 0
+    while True:
+        if not breaker.allow():
+            API_ERRORS.labels(endpoint, CircuitOpenError.__name__).inc()
+            raise CircuitOpenError(f'Circuit for {endpoint} is open')
+        API_RATE_LIMIT_WAIT_SECONDS.labels(endpoint).observe(rate_limiter.acquire(url))
+        started = time.perf_counter()
+        try:
+            with tracer.span(f"api.{endpoint}", attempt=attempt) as span:
+                response = session.post(url=url, **kwargs)
+                span.set(status_code=response.status_code)
+        except Exception as e:
+            breaker.record_failure()
+            API_ERRORS.labels(endpoint, type(e).__name__).inc()
+            if not (policy and isinstance(e, requests.exceptions.RequestException)
+                    and policy.retry_error(e, idempotent, attempt)):
+                raise
+            API_RETRIES.labels(endpoint, type(e).__name__).inc()
+            time.sleep(policy.backoff(attempt))
+            attempt += 1
+            continue
+        finally:
+            API_REQUEST_SECONDS.labels(endpoint).observe(time.perf_counter() - started)
+
+        if response.status_code in RETRY_STATUS_CODES:
+            breaker.record_failure()
+        else:
+            breaker.record_success()
+        if response.status_code == 429 and throttled < MAX_THROTTLED_RETRIES:
+            throttled += 1
+            API_THROTTLED.labels(endpoint).inc()
+            rate_limiter.throttled(url, response.headers.get("Retry-After"))
+            if idempotent:
+                continue
+        if policy and policy.retry_status(response.status_code, idempotent, attempt):
+            API_ERRORS.labels(endpoint, str(response.status_code)).inc()
+            API_RETRIES.labels(endpoint, str(response.status_code)).inc()
+            time.sleep(policy.backoff(attempt))
+            attempt += 1
+            continue
+        break
+    if response.status_code != 200:
+        API_ERRORS.labels(endpoint, str(response.status_code)).inc()
+    return response
+
 def create_pre_login_payload(ethereum_address, proof_config, account_config, proof_type):
      return {
             "publicKey": ethereum_address,
@@ -47,7 +112,7 @@ def create_pre_login_payload(ethereum_address, proof_config, account_config, pro
 
 
 def get_pre_login_message(session, api_config, proof_type, payload):
-    response = session.post(
+    response = _post(session,
                                 url     = f"{api_config['api_url']}/{proof_type}/pre-login",  
                                 data    = json.dumps(payload),
                                 verify  = SSL_CONTEXT.check_hostname, 
@@ -63,8 +128,9 @@ def get_pre_login_message(session, api_config, proof_type, payload):
 
 def login(session,api_config, proof_type,payload):
     try:
-        response = session.post(
+        response = _post(session,
                                     url     = f"{api_config['api_url']}/{proof_type}/login",  
+                                    idempotent = False,
                                     data    = json.dumps(payload),
                                     verify  = SSL_CONTEXT.check_hostname, 
                                     timeout = TIMEOUT_SECS
@@ -80,13 +146,13 @@ def login(session,api_config, proof_type,payload):
     except Exception as e:
         logger.error(e)
 
-def get_provers(session,api_config, proof_type):
-    response = session.post(
+def get_provers(session,api_config, proof_type, skip=0, limit=10000):
+    response = _post(session,
                                 url     = f"{api_config['api_url']}/{proof_type}/provers",
                                 data    = json.dumps(
                                     { 
-                                        "skip": 0 ,
-                                        "limit": 10000
+                                        "skip": skip ,
+                                        "limit": limit
                                     }
                                     ),
                                 verify  = SSL_CONTEXT.check_hostname, 
@@ -100,8 +166,40 @@ def get_provers(session,api_config, proof_type):
         return response.json()["result"]
 
 
+class ProverListError(RuntimeError):
+    """Raised when a page of the prover list can't be fetched, leaving the list incomplete."""
+
+
+def iter_provers(session, api_config, proof_type, page_size=500):
+    """
+    Yield provers page by page using skip/limit.
+
+    The next page is requested in the background while the current one is
+    being consumed, so callers can start challenging after the first page.
+    A page that fails (request error or non-200) raises ProverListError
+    instead of ending the list early, so callers never mistake the provers
+    yielded so far for the whole list.
+    """
+    with ThreadPoolExecutor(max_workers=1, thread_name_prefix="provers-prefetch") as prefetch:
+        skip = 0
+        fetch = tracer.bind(get_provers)
+        page = prefetch.submit(fetch, session, api_config, proof_type, skip, page_size)
+        while page is not None:
+            try:
+                response = page.result()
+            except Exception as e:
+                raise ProverListError(f'Fetching provers from {skip} failed: {e}') from e
+            if response is None:
+                raise ProverListError(f'Fetching provers from {skip} failed, see the response logged above')
+            provers = response.get("provers", [])
+            skip += len(provers)
+            page = (prefetch.submit(fetch, session, api_config, proof_type, skip, page_size)
+                    if len(provers) >= page_size else None)
+            yield from provers
+
+
 def get_user_info(session,api_config, proof_type):
-    response = session.post(
+    response = _post(session,
                                 url     = f"{api_config['api_url']}/{proof_type}/user-info",
                                 verify  = SSL_CONTEXT.check_hostname, 
                                 timeout = TIMEOUT_SECS
@@ -135,8 +233,9 @@ def request_challenge(session,api_config, proof_type, prover, challenge_id, chal
     payload = create_request_challenge_payload()
     
     try:
-        response = session.post(
+        response = _post(session,
                                 url     = f"{api_config['api_url']}/{proof_type}/{api_config['challenge_trigger_end_point']}",  
+                                idempotent = False,
                                 data    = json.dumps(payload),
                                 verify  = SSL_CONTEXT.check_hostname, 
                                 timeout = TIMEOUT_SECS
@@ -145,13 +244,13 @@ def request_challenge(session,api_config, proof_type, prover, challenge_id, chal
             logger.error(f'Status of challenge trigger for challenge_id: {challenge_id} - {response.text}')
             return None
     except requests.exceptions.RequestException as e:
-        logger.error(f'Request failed: {e},  {e.message}')
+        logger.error(f'Challenge trigger for prover {prover} failed: {e}', prover=prover)
         return None
     return response.json()
 
 
 def get_statistics(session,api_config, proof_type):
-    response = session.post(
+    response = _post(session,
                                 url     = f"{api_config['api_url']}/{proof_type}/statistics",
                                 verify  = SSL_CONTEXT.check_hostname, 
                                 timeout = TIMEOUT_SECS
@@ -165,26 +264,28 @@ def get_statistics(session,api_config, proof_type):
 
 def get_challenge_status(session,api_config, proof_type, challenge_id):
 
-    print(challenge_id)
-
     payload = {
                     "challenge_id": challenge_id
     }
 
-    response = session.post(
+    response = _post(session,
                                 url     = f"{api_config['api_url']}/{proof_type}/challenge-status",
                                 data    = json.dumps(payload),
                                 verify  = SSL_CONTEXT.check_hostname, 
                                 timeout = TIMEOUT_SECS
                             )
     if response.status_code != 200:
-        logger.error(response.status_code,response.reason)
+        logger.error(f'Status of challenge_id: {challenge_id} - {response.status_code} {response.reason}',
+                     challenge_id=challenge_id)
+        if response.status_code in RETRY_STATUS_CODES or response.status_code == 429:
+            # The API could not answer; not a verdict on the challenge
+            raise requests.exceptions.HTTPError(f'{response.status_code} {response.reason}', response=response)
         return None   
     else :
         return response.json()["result"]
 
 def get_challenger(session,api_config, proof_type,challenger_id):
-    response = session.post(
+    response = _post(session,
                                 url     = f"{api_config['api_url']}/{proof_type}/challenger",
                                 json    = { 
                                        "id": challenger_id
@@ -201,6 +302,11 @@ def get_challenger(session,api_config, proof_type,challenger_id):
 
 
 def has_challenge_ended(session,api_config, proof_type,challenge_id):
+    """
+    Returns (ended, state). When the status could not be read for a transient
+    reason (timeout, connection error, 5xx, open circuit) the state is None and
+    the challenge has not ended, so the caller polls it again later.
+    """
     try:
         response = get_challenge_status(session, api_config, proof_type, challenge_id)
         if not response:
@@ -208,6 +314,9 @@ def has_challenge_ended(session,api_config, proof_type,challenge_id):
         current_state = response["state"]
         has_ended = current_state in CHALLENGE_END_STATES
         return has_ended, current_state
+    except requests.exceptions.RequestException as e:
+        logger.warning(f'Status of challenge_id: {challenge_id} unavailable - {e}', challenge_id=challenge_id)
+        return (False, None)
     except Exception as e:
         logger.error(e)
         return (True,"FAILED")
@@ -221,7 +330,7 @@ def is_alive_yet (last_alive,time_delta):
     return False
 
 def get_prover(session,api_config, proof_type,prover_id):
-    response = session.post(
+    response = _post(session,
                                 url     = f"{api_config['api_url']}/{proof_type}/prover",
                                 data    = json.dumps(
                                     { 
@@ -1,5 +1,8 @@
 from abc import ABC, abstractmethod
 import argparse
+import os
+
+from payer_pool import PAYER_KEYS_ENV
 
 class ArgumentParser:
     @staticmethod
@@ -16,7 +19,9 @@ class ArgumentParser:
         parser.add_argument('--tolerance_count', type=int, default=1,
                           help='Minimum # of challengers that should participate : (default: 1)')
         parser.add_argument('--private_key', type=str,
-                          help='Private key of the payer : ')
+                          help='Private key of the payer, or several separated by commas : ')
+        parser.add_argument('--payer_keyfile', type=str, default=None,
+                          help=f'File with one payer private key per line, added to --private_key and ${PAYER_KEYS_ENV} (default: payers.keyfile from config)')
         parser.add_argument('--prover', type=str, default='all',
                           help='Prover\'s address to challenge : (default: all )')
         parser.add_argument('--project_name', type=str, default='',
@@ -25,6 +30,20 @@ class ArgumentParser:
                           help='Bandwidth Challenge Type (Downlink: 0 (default), Uplink: 1) : ')
         parser.add_argument('--network', type=str, default="testnet",
                           help='Network to run on (testnet or mainnet) (default is testnet ): ')
+        parser.add_argument('--max_in_flight', type=int, default=None,
+                          help='Max # of challenges running concurrently (default: max_in_flight_challenges from config)')
+        parser.add_argument('--metrics_port', type=int, default=None,
+                          help='Serve Prometheus metrics on this local port (default: metrics.port from config)')
+        parser.add_argument('--metrics_textfile', type=str, default=None,
+                          help='Write Prometheus metrics to this file (default: metrics.textfile from config)')
+        parser.add_argument('--batch_requests', action='store_true', default=None,
+                          help='Pack many provers into each on-chain submitRequest (default: batch_requests from the chain config)')
+        parser.add_argument('--shards', type=int, default=1,
+                          help='Split the provers across this many worker processes (default: 1, no sharding)')
+        parser.add_argument('--trace_file', type=str, default=None,
+                          help='Record a trace of the run and write it to this file on exit')
+        parser.add_argument('--trace_format', type=str, choices=['chrome', 'otlp'], default=None,
+                          help='Trace file format (default: otlp for *.otlp.json, chrome otherwise)')
         
         args = parser.parse_args()
         
@@ -33,7 +52,7 @@ class ArgumentParser:
             args.config_file = input('Please enter the path to the configuration file (default: config/config.json): ').strip() or 'config/config.json'
         if not args.proof_type:
             args.proof_type = input('Please enter the type of proof to run (default: pol): ').strip() or 'pol'
-        if not args.private_key:
+        if not args.private_key and not args.payer_keyfile and not os.environ.get(PAYER_KEYS_ENV):
             args.private_key = input('Please enter the private key of the payer: ').strip()
         
         # Optional interactive inputs
@@ -0,0 +1,362 @@
+import argparse
+import json
+import os
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import eth_abi
+from eth_account import Account
+from eth_utils import event_abi_to_log_topic, to_checksum_address
+from web3 import Web3
+from web3.datastructures import AttributeDict
+
+from config.config import Config
+from api import is_alive_yet
+from chain import sign_message, sign_contract_transaction
+from challenge import PoLChallenge
+from challenge_encoding import POL_ENCODER, POB_ENCODER
+from cooldown_cache import CooldownCache
+from custom_session import CustomSession
+from prover_processor import ProverProcessor
+from prover_selection import select_provers
+
+PROJECTS = ["WITNESS_CHAIN", "pingpong", "eigenlayer", "PingPong-Testnet", "acme"]
+
+# Throwaway key for offline signing benchmarks; never holds funds
+BENCH_PRIVATE_KEY = "0x" + "01" * 32
+
+Result = Dict[str, Any]
+
+
+def synthetic_provers(count: int, seed: int = 0) -> List[Dict[str, Any]]:
+    """Build a prover list shaped like the /provers response."""
+    rng = random.Random(seed)
+    now = datetime.now(timezone.utc)
+    provers = []
+    for i in range(count):
+        # Half-minute offsets keep every prover clear of alive-window edges while timing
+        last_alive = now - timedelta(minutes=rng.randrange(600) + 0.5)
+        provers.append({
+            "id": f'{rng.choice(["IPv4", "IPv6"])}/0x{rng.getrandbits(160):040x}',
+            "projectName": rng.choice(PROJECTS),
+            "last_alive": last_alive.isoformat(timespec="milliseconds").replace("+00:00", "Z"),
+            "claims": {
+                "latitude": rng.uniform(-90, 90),
+                "longitude": rng.uniform(-180, 180),
+                "uplink_bandwidth": rng.randint(1, 1000),
+                "downlink_bandwidth": rng.randint(1, 1000),
+            },
+        })
+    return provers
+
+
+def measure(name: str, fn: Callable[[], Any], ops: int = 1, repeat: int = 5,
+            **params: Any) -> Result:
+    """
+    Time fn over repeat runs.
+
+    Args:
+        name: Benchmark name
+        fn: Callable doing ops operations per call
+        ops: Operations per call, for the per-operation time
+        repeat: Number of timed runs
+        **params: Parameters identifying the case, e.g. n
+
+    Returns:
+        Result: Timings in seconds plus the best time per operation in microseconds
+    """
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - started)
+    result = {
+        "name": name,
+        "params": params,
+        "ops": ops,
+        "repeat": repeat,
+        "best_seconds": min(timings),
+        "median_seconds": statistics.median(timings),
+        "per_op_us": min(timings) / ops * 1e6,
+    }
+    print(f'{name} {json.dumps(params, sort_keys=True)}: best {result["best_seconds"] * 1000:.2f} ms, '
+          f'{result["per_op_us"]:.2f} us/op')
+    return result
+
+
+def bench_selection(config_file: str, sizes: List[int], repeat: int) -> List[Result]:
+    config = Config(config_file)
+    proof_config = config.get_proof_config("pol")
+    processor = ProverProcessor(None, config.get_api_config("testnet"), {}, proof_config, "./")
+    alive_minutes = proof_config["alive_check_minutes"]
+
+    def per_prover(provers, project_name, prover_to_challenge):
+        return [
+            processor.should_run_for_prover(p, p["id"].split("/")[1], project_name, prover_to_challenge)
+            and is_alive_yet(p["last_alive"], alive_minutes)
+            for p in provers
+        ]
+
+    results = []
+    for size in sizes:
+        provers = synthetic_provers(size)
+        results.append(measure("is_alive_yet",
+                               lambda: [is_alive_yet(p["last_alive"], alive_minutes) for p in provers],
+                               ops=size, repeat=repeat, n=size))
+        # Equivalence with the per-prover checks is covered by tests/test_prover_selection.py
+        for project_name, prover_to_challenge in (("ping", None), (None, "all")):
+            case = {"n": size, "project": project_name, "prover": prover_to_challenge}
+            results.append(measure("should_run_for_prover",
+                                   lambda: per_prover(provers, project_name, prover_to_challenge),
+                                   ops=size, repeat=repeat, **case))
+            results.append(measure("select_provers",
+                                   lambda: select_provers(provers, alive_minutes, project_name,
+                                                          prover_to_challenge),
+                                   ops=size, repeat=repeat, **case))
+    return results
+
+
+def random_challenge_values(rng: random.Random, types: List[str]) -> List[Any]:
+    """Random values for a challenge layout, biased towards the edges of each type's range."""
+    values = []
+    for abi_type in types:
+        if abi_type == "address":
+            address = f'0x{rng.getrandbits(160):040x}'
+            values.append(rng.choice([address, address.upper().replace("0X", "0x"),
+                                      to_checksum_address(address)]))
+        elif abi_type == "bool":
+            values.append(rng.random() < 0.5)
+        elif abi_type.startswith("uint"):
+            values.append(rng.choice([0, 1, 2**256 - 1, rng.getrandbits(rng.randint(1, 256))]))
+        else:
+            values.append(rng.choice([0, -1, 2**255 - 1, -2**255,
+                                      rng.getrandbits(rng.randint(1, 255)) * rng.choice([1, -1])]))
+    return values
+
+
+def bench_encoding(config_file: str, sizes: List[int], repeat: int) -> List[Result]:
+    # Equivalence with eth_abi.encode is covered by tests/test_challenge_encoding.py
+    rng = random.Random(0)
+    results = []
+    for name, encoder in (("pol", POL_ENCODER), ("pob", POB_ENCODER)):
+        types = list(encoder.types)
+        for size in sizes:
+            # Shaped like real payloads: the configured registry proxy and API prover addresses
+            proxy = to_checksum_address(f'0x{rng.getrandbits(160):040x}')
+            rows = [[proxy, prover["id"].split("/")[1], *random_challenge_values(rng, types[2:])]
+                    for prover in synthetic_provers(size)]
+            # eth_abi is slow enough that one run per size is plenty
+            results.append(measure("eth_abi.encode", lambda: [eth_abi.encode(types, values) for values in rows],
+                                   ops=size, repeat=1, proof_type=name, n=size))
+            results.append(measure("encode_challenge", lambda: [encoder.encode(values) for values in rows],
+                                   ops=size, repeat=repeat, proof_type=name, n=size))
+            results.append(measure("encode_challenges", lambda: encoder.encode_many(rows),
+                                   ops=size, repeat=repeat, proof_type=name, n=size))
+    return results
+
+
+def _request_handler(src_path: str) -> Any:
+    with open(os.path.join(src_path, "abi", "request_handler.abi")) as file:
+        abi = json.load(file)
+    # No provider: everything below runs offline
+    return Web3().eth.contract(address=to_checksum_address("0x" + "11" * 20), abi=abi)
+
+
+def bench_signing(config_file: str, sizes: List[int], repeat: int) -> List[Result]:
+    config = Config(config_file)
+    account = Account.from_key(BENCH_PRIVATE_KEY)
+    contract = _request_handler(os.path.dirname(os.path.abspath(__file__)))
+    proof_config = config.get_proof_config("pol")
+    message = f"Sign this message to log in: {random.Random(0).getrandbits(128):032x}"
+    count = 200
+    results = [measure("sign_message", lambda: [sign_message(message, account) for _ in range(count)],
+                       ops=count, repeat=repeat)]
+
+    for batch in (1, 50):
+        infos = [bytes(POL_ENCODER.size)] * batch
+        results.append(measure(
+            "sign_contract_transaction",
+            lambda: [sign_contract_transaction(1, contract, 10_000_000, account, nonce, "submitRequest",
+                                               proof_config["challenge_timeout_secs_minimum_default"],
+                                               proof_config["attribute_ids"], infos)
+                     for nonce in range(count // 4)],
+            ops=count // 4, repeat=repeat, challenges=batch))
+    return results
+
+
+def synthetic_receipt(contract: Any, challenge_count: int) -> AttributeDict:
+    """A submitRequest receipt carrying one RequestProcessed log."""
+    event_abi = next(abi for abi in contract.abi
+                     if abi.get("type") == "event" and abi["name"] == "RequestProcessed")
+    data = eth_abi.encode(["uint256[]", "string[]"],
+                          [list(range(1000, 1000 + challenge_count)), ["pol-v1.witnesschain.com"]])
+    log = AttributeDict({
+        "address": contract.address,
+        "topics": [event_abi_to_log_topic(event_abi), (42).to_bytes(32, "big")],
+        "data": data,
+        "blockNumber": 1,
+        "blockHash": b"\x22" * 32,
+        "transactionHash": b"\x33" * 32,
+        "transactionIndex": 0,
+        "logIndex": 0,
+    })
+    return AttributeDict({"logs": [log], "status": 1, "transactionHash": b"\x33" * 32})
+
+
+def bench_process_logs(config_file: str, sizes: List[int], repeat: int) -> List[Result]:
+    config = Config(config_file)
+    src_path = os.path.dirname(os.path.abspath(__file__)) + "/"
+    contract = _request_handler(src_path)
+    challenge = PoLChallenge({"prover_registry": {"proxy": contract.address}},
+                             config.get_proof_config("pol"), src_path)
+    count = 500
+    results = []
+    for provers in (1, 50):
+        challengers = 2
+        receipt = synthetic_receipt(contract, provers * challengers)
+        addresses = [f"0x{i:040x}" for i in range(provers)]
+        assert challenge.process_logs(receipt, contract, addresses)[0] == 42
+        results.append(measure("process_logs",
+                               lambda: [challenge.process_logs(receipt, contract, addresses)
+                                        for _ in range(count)],
+                               ops=count, repeat=repeat, provers=provers))
+    return results
+
+
+def bench_cookies(config_file: str, sizes: List[int], repeat: int) -> List[Result]:
+    session = CustomSession()
+    header = ", ".join([
+        "__session=" + "a" * 180 + "; Path=/; Expires=Wed, 21 Oct 2026 07:28:00 GMT; HttpOnly; Secure",
+        "csrf=" + "b" * 32 + "; Path=/; SameSite=Strict",
+        "region=eu-west; Path=/",
+    ])
+    assert len(session.get_cookie_header_value(header)) >= 2
+    count = 5000
+    return [measure("get_cookie_header_value",
+                    lambda: [session.get_cookie_header_value(header) for _ in range(count)],
+                    ops=count, repeat=repeat)]
+
+
+def bench_cooldown(config_file: str, sizes: List[int], repeat: int) -> List[Result]:
+    results = []
+    with tempfile.TemporaryDirectory() as directory:
+        for size in sizes:
+            cooldowns = CooldownCache(os.path.join(directory, f"cooldown-{size}.db"),
+                                      max_entries=size, refresh_seconds=0)
+            addresses = [p["id"].split("/")[1] for p in synthetic_provers(size)]
+            marked = addresses[::10]
+            results.append(measure("cooldown_claim",
+                                   lambda: [cooldowns.claim("testnet", "pol", a) for a in marked],
+                                   ops=len(marked), repeat=1, n=size))
+
+            def sweep():
+                cooling = cooldowns.cooling("testnet", "pol")
+                return [a for a in addresses if a.lower() not in cooling]
+            assert len(sweep()) == size - len(marked)
+            results.append(measure("cooldown_sweep", sweep, ops=size, repeat=repeat, n=size))
+            cooldowns.close()
+    return results
+
+
+def bench_config(config_file: str, sizes: List[int], repeat: int) -> List[Result]:
+    count = 500
+    return [measure("Config", lambda: [Config(config_file) for _ in range(count)],
+                    ops=count, repeat=repeat)]
+
+
+BENCHMARKS: Dict[str, Callable[..., List[Result]]] = {
+    "selection": bench_selection,
+    "encoding": bench_encoding,
+    "signing": bench_signing,
+    "process_logs": bench_process_logs,
+    "cookies": bench_cookies,
+    "cooldown": bench_cooldown,
+    "config": bench_config,
+}
+
+
+def environment() -> Dict[str, Any]:
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True,
+                                text=True, check=True).stdout.strip()
+    except Exception:
+        commit = None
+    return {
+        "commit": commit,
+        "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+    }
+
+
+def _case_key(result: Result) -> Tuple[str, str]:
+    return result["name"], json.dumps(result["params"], sort_keys=True)
+
+
+def compare(results: List[Result], baseline_file: str, threshold: float) -> List[str]:
+    """
+    Compare per-operation times against a previous run.
+
+    Returns:
+        List[str]: One line per case slower than baseline by more than threshold
+    """
+    with open(baseline_file) as file:
+        baseline = {_case_key(result): result for result in json.load(file)["results"]}
+    regressions = []
+    for result in results:
+        previous = baseline.get(_case_key(result))
+        if not previous:
+            continue
+        ratio = result["per_op_us"] / previous["per_op_us"]
+        line = (f'{result["name"]} {_case_key(result)[1]}: {previous["per_op_us"]:.2f} -> '
+                f'{result["per_op_us"]:.2f} us/op ({ratio:.2f}x)')
+        print(line)
+        if ratio > threshold:
+            regressions.append(line)
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the scheduler\'s CPU-side hot paths offline')
+    parser.add_argument('--config_file', type=str, default='config/config.json',
+                      help='The path to the configuration file (default: config/config.json) ')
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10_000, 100_000],
+                      help='Prover list sizes to benchmark (default: 10000 100000)')
+    parser.add_argument('--only', type=str, nargs='+', choices=sorted(BENCHMARKS),
+                      help='Benchmarks to run (default: all)')
+    parser.add_argument('--repeat', type=int, default=5,
+                      help='Timed runs per case; the best one is reported (default: 5)')
+    parser.add_argument('--output', type=str, default=None,
+                      help='Write the results as JSON to this file (optional)')
+    parser.add_argument('--compare', type=str, default=None,
+                      help='JSON results of an earlier run to compare against (optional)')
+    parser.add_argument('--threshold', type=float, default=1.2,
+                      help='Slowdown ratio reported as a regression with --compare (default: 1.2)')
+    args = parser.parse_args()
+
+    results: List[Result] = []
+    for name in args.only or BENCHMARKS:
+        results += BENCHMARKS[name](args.config_file, args.sizes, args.repeat)
+
+    if args.output:
+        with open(args.output, "w") as file:
+            json.dump({"environment": environment(), "results": results}, file, indent=2)
+
+    regressions: Optional[List[str]] = None
+    if args.compare:
+        regressions = compare(results, args.compare, args.threshold)
+        for line in regressions:
+            print(f'REGRESSION {line}')
+    sys.exit(1 if regressions else 0)
+
+
+if __name__ == "__main__":
+    main()
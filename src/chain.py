@@ -4,6 +4,8 @@ from   eth_utils            import to_bytes
 from   eth_account.messages import encode_defunct
 import eth_abi
 
+from contract_cache import contract_cache
+
 import os
 import sys
 import json
@@ -28,19 +30,9 @@ def sign_message(message,account):
     return signed_message
 
 def get_contract_with_abi(connection_rpc, abi_file, contract_address):
-    with open(abi_file,"r") as abi_file:
-        contract_abi = json.load(abi_file)
-        return connection_rpc.eth.contract(address=contract_address, abi=contract_abi)
-    return None
-
-def submit_transaction(chain_id, connection_rpc, gas_limit, caller_account, contract_address, abi_file, function_name, *params):    
-    
-    def get_nonce(connection_rpc,account):
-        return connection_rpc.eth.get_transaction_count(account.address)
+    return contract_cache.get_contract(connection_rpc, abi_file, contract_address)
 
-    contract = get_contract_with_abi(connection_rpc,abi_file,contract_address)
-    
-    nonce = get_nonce(connection_rpc,caller_account)
+def sign_contract_transaction(chain_id, contract, gas_limit, caller_account, nonce, function_name, *params):
     contract_function = getattr(contract.functions, function_name)
 
     transaction = contract_function(*params).build_transaction({
@@ -50,8 +42,22 @@ def submit_transaction(chain_id, connection_rpc, gas_limit, caller_account, cont
       "nonce"    : nonce,
     })
     
-    signed_transaction = caller_account.sign_transaction(transaction)
-    transaction_receipt = connection_rpc.eth.send_raw_transaction(signed_transaction.rawTransaction)
+    return caller_account.sign_transaction(transaction)
+
+def send_signed_transaction(connection_rpc, signed_transaction):
+    return connection_rpc.eth.send_raw_transaction(signed_transaction.rawTransaction)
+
+def submit_transaction(chain_id, connection_rpc, gas_limit, caller_account, contract_address, abi_file, function_name, *params):    
+    
+    def get_nonce(connection_rpc,account):
+        return connection_rpc.eth.get_transaction_count(account.address)
+
+    contract = get_contract_with_abi(connection_rpc,abi_file,contract_address)
+    
+    nonce = get_nonce(connection_rpc,caller_account)
+    signed_transaction = sign_contract_transaction(chain_id, contract, gas_limit, caller_account,
+                                                   nonce, function_name, *params)
+    transaction_receipt = send_signed_transaction(connection_rpc, signed_transaction)
     receipt = connection_rpc.eth.wait_for_transaction_receipt(transaction_receipt)
 
     return receipt,contract
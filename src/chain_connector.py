@@ -1,15 +1,19 @@
 
 from typing import Dict, List, Any, Optional, Tuple
 from chain import *
+from rpc_pool import RpcPool
 
 class ChainConnector:
     def __init__(self, chain_config: Dict[str, Any]):
         self.chain_config = chain_config
-        self.connection = None
+        self.pool: Optional[RpcPool] = None
+
+    def get_pool(self) -> RpcPool:
+        # Pools are shared process-wide, so every challenge reuses the same connections
+        if not self.pool:
+            self.pool = RpcPool.for_chain_config(self.chain_config)
+        return self.pool
 
     def get_rpc(self):
-        if not self.connection:
-            self.connection = connect_to_rpc(self.chain_config["rpc_url"])
-            if not self.connection:
-                raise ConnectionError(f"Unable to connect to {self.chain_config['rpc_url']}")
-        return self.connection
\ No newline at end of file
+        """Connection to the fastest healthy endpoint, for reads."""
+        return self.get_pool().reader()
@@ -4,11 +4,17 @@ import time
 import random
 import requests
 from abc import ABC, abstractmethod
-from typing import Dict, List, Any, Optional, Tuple
+from concurrent.futures import Future
+from typing import Callable, Dict, List, Any, Optional, Tuple
+
+from web3.exceptions import TransactionNotFound
 
 from chain import *
 from chain_connector import ChainConnector
+from challenge_encoding import POL_ENCODER, POB_ENCODER, StaticTupleEncoder
+from contract_cache import contract_cache
 from transaction_manager import TransactionManager
+from payer_pool import PayerPool
 
 from config.config import Config
 from api import * 
@@ -17,29 +23,145 @@ from hexbytes import HexBytes
 from logger import Logger
 
 class BaseChallenge(ABC):
-    def __init__(self, chain_config: Dict[str, Any], proof_config: Dict[str, Any], src_path: str):
+    # Precompiled encoder for the challenge info layout
+    ENCODER: StaticTupleEncoder
+
+    def __init__(self, chain_config: Dict[str, Any], proof_config: Dict[str, Any], src_path: str,
+                 chain_connector: Optional[ChainConnector] = None,
+                 payers: Optional[PayerPool] = None):
         self.chain_config = chain_config
         self.proof_config = proof_config
-        self.chain_connector = ChainConnector(chain_config)
-        self.transaction_manager = TransactionManager(chain_config, src_path)
+        self.chain_connector = chain_connector or ChainConnector(chain_config)
+        self.transaction_manager = TransactionManager(chain_config, src_path, payers)
         self.logger = Logger()
 
     @abstractmethod
-    def encode_challenge(self, prover: str, **kwargs) -> bytes:
+    def challenge_values(self, prover: str, **kwargs) -> List[Any]:
+        """Values of the challenge info tuple, in ENCODER's type order."""
         pass
 
-    def prepare_and_submit_request(self, account: str, challenge_info: bytes) -> Tuple[Dict, Any]:
-        """Submit a challenge request transaction."""
+    def encode_challenge(self, prover: str, **kwargs) -> bytes:
+        return self.ENCODER.encode(self.challenge_values(prover, **kwargs))
+
+    def encode_challenges(self, challenges: List[Tuple[str, Dict[str, Any]]]) -> List[bytes]:
+        """
+        Encode the challenge info of many provers at once.
+
+        Args:
+            challenges: (prover, challenge params) pairs
+
+        Returns:
+            List[bytes]: Encoded challenge info, one per prover
+        """
+        return self.ENCODER.encode_many(
+            self.challenge_values(prover, **params) for prover, params in challenges)
+
+    def prepare_and_submit_request(self, account: str, challenge_info: bytes,
+                                   on_sent: Optional[Callable[[str], None]] = None) -> Tuple[Dict, Any]:
+        """Submit a challenge request transaction; on_sent gets its hash before the receipt is awaited."""
         connection = self.chain_connector.get_rpc()
         return self.transaction_manager.prepare_and_submit_request_transaction(
+            self.proof_config,
+            connection,
+            account,
+            challenge_info,
+            on_sent
+        )
+
+    def submit_request(self, account: str, challenge_info: bytes) -> Future:
+        """
+        Submit a challenge request transaction without waiting for it to be mined.
+
+        Returns:
+            Future: Resolved with (receipt, contract)
+        """
+        connection = self.chain_connector.get_rpc()
+        return self.transaction_manager.submit_request_transaction_async(
             self.proof_config,
             connection,
             account,
             challenge_info
         )
 
-    def process_logs(self, receipt: Dict, contract: Any) -> Tuple[int, List]:
-        logs = contract.events.RequestProcessed().process_receipt(receipt)
+    def submit_batch(self, account: str, challenges: List[Tuple[str, bytes]],
+                     on_sent: Optional[Callable[[str, List[str]], None]] = None
+                     ) -> List[Tuple[Future, List[str]]]:
+        """
+        Submit encoded challenges for many provers in as few transactions as gas_limit allows.
+
+        Args:
+            account: Account to submit the transactions from
+            challenges: (prover, encoded challenge) pairs
+            on_sent: Called with each transaction's hash and its provers as soon as
+                it is sent, before its receipt is awaited (optional)
+
+        Returns:
+            List[Tuple[Future, List[str]]]: Per transaction, a future resolved with
+            (receipt, contract) and the provers it carries, in order
+        """
+        connection = self.chain_connector.get_rpc()
+        batches = self.transaction_manager.submit_batch_request_transactions_async(
+            self.proof_config,
+            connection,
+            account,
+            [challenge_info for _, challenge_info in challenges],
+            on_sent and (lambda tx_hash, indices: on_sent(tx_hash, [challenges[i][0] for i in indices]))
+        )
+        return [(future, [challenges[i][0] for i in indices]) for future, indices in batches]
+
+    def find_request(self, tx_hash: str, prover: str) -> Tuple[Optional[str], int, List[int]]:
+        """
+        Read back what became of a submitRequest transaction sent by an earlier run.
+
+        The request id and new challenge ids come from the receipt's logs; the
+        transaction's own challengeInfos tell which of them belong to prover.
+
+        Args:
+            tx_hash: Transaction hash
+            prover: Prover address
+
+        Returns:
+            Tuple[Optional[str], int, List[int]]: None, the request id and the prover's
+            challenge ids once the request was processed; otherwise PENDING while the
+            transaction isn't mined, REVERTED, or DROPPED when the node no longer knows it
+        """
+        connection = self.chain_connector.get_rpc()
+        try:
+            receipt = connection.eth.get_transaction_receipt(tx_hash)
+        except TransactionNotFound:
+            try:
+                connection.eth.get_transaction(tx_hash)
+            except TransactionNotFound:
+                return "DROPPED", 0, []
+            return "PENDING", 0, []
+        if receipt.get("status") != 1:
+            return "REVERTED", 0, []
+
+        contract = self.transaction_manager.request_handler(connection)
+        _, params = contract.decode_function_input(connection.eth.get_transaction(tx_hash)["input"])
+        provers = [self.prover_of(challenge_info) for challenge_info in params["challengeInfos"]]
+        request_id, challenges = self.process_logs(receipt, contract, provers=provers)
+        return None, request_id, challenges.get(prover.lower(), [])
+
+    def prover_of(self, challenge_info: bytes) -> str:
+        """Lowercase prover address of an encoded challenge info (the layout's second word)."""
+        return "0x" + bytes(challenge_info[44:64]).hex()
+
+    def process_logs(self, receipt: Dict, contract: Any,
+                     provers: Optional[List[str]] = None) -> Tuple[int, Any]:
+        """
+        Extract the request id and new challenge ids from a submitRequest receipt.
+
+        Args:
+            receipt: Transaction receipt
+            contract: RequestHandler contract instance
+            provers: Provers of a batched request, in submission order (optional)
+
+        Returns:
+            Tuple[int, Any]: Request id and the newChallenges list, or, when
+            provers is given, a dict mapping each prover to its challenge ids
+        """
+        logs = contract_cache.get_event(contract, "RequestProcessed").process_receipt(receipt)
         request_id = 0
         new_challenges = []
         
@@ -47,36 +169,50 @@ class BaseChallenge(ABC):
             request_id = log['args']['requestId']
             new_challenges = log['args']['newChallenges']
         
-        return request_id, new_challenges
+        if provers is None:
+            return request_id, new_challenges
+        return request_id, self._map_challenges_to_provers(new_challenges, provers)
+
+    def _map_challenges_to_provers(self, new_challenges: List[int],
+                                   provers: List[str]) -> Dict[str, List[int]]:
+        """
+        newChallenges follows the order of challengeInfos, with the same number
+        of challenges created for every entry.
+        """
+        if not provers or len(new_challenges) % len(provers):
+            self.logger.error(f'Cannot map {len(new_challenges)} new challenges to {len(provers)} provers')
+            return {}
+        per_prover = len(new_challenges) // len(provers)
+        return {
+            prover: list(new_challenges[i * per_prover:(i + 1) * per_prover])
+            for i, prover in enumerate(provers)
+        }
 
 class PoLChallenge(BaseChallenge):
-    def encode_challenge(self, prover: str, **kwargs) -> bytes:
-        return eth_abi.encode(
-            ["address", "address", "bool", "uint256", "uint256", "int256", "int256"],
-            [
-                self.chain_config["prover_registry"]["proxy"],
-                prover,
-                kwargs.get('is_ip_v6', False),
-                kwargs.get('challengers_count') or self.proof_config["number_challengers_default"],
-                kwargs.get('tolerance') or self.proof_config["challengers_tolerance_default"],
-                kwargs.get('latitude', 0),
-                kwargs.get('longitude', 0)
-            ]
-        )
+    ENCODER = POL_ENCODER
+
+    def challenge_values(self, prover: str, **kwargs) -> List[Any]:
+        return [
+            self.chain_config["prover_registry"]["proxy"],
+            prover,
+            kwargs.get('is_ip_v6', False),
+            kwargs.get('challengers_count') or self.proof_config["number_challengers_default"],
+            kwargs.get('tolerance') or self.proof_config["challengers_tolerance_default"],
+            kwargs.get('latitude', 0),
+            kwargs.get('longitude', 0)
+        ]
 
 class PoBChallenge(BaseChallenge):
     CHALLENGE_TYPES = {0: "downlink", 1: "uplink"}
+    ENCODER = POB_ENCODER
 
-    def encode_challenge(self, prover: str, **kwargs) -> bytes:
-        return eth_abi.encode(
-            ["address", "address", "uint", "bool", "uint256", "uint256", "uint256"],
-            [
-                self.chain_config["prover_registry"]["proxy"],
-                prover,
-                kwargs.get('bandwidth_challenge_type', 0),
-                kwargs.get('is_ip_v6', False),
-                kwargs.get('challengers_count') or self.proof_config["number_challengers_default"],
-                kwargs.get('bandwidth', 0),
-                kwargs.get('tolerance_count') or self.proof_config["challengers_tolerance_default"]
-            ]
-        )
+    def challenge_values(self, prover: str, **kwargs) -> List[Any]:
+        return [
+            self.chain_config["prover_registry"]["proxy"],
+            prover,
+            kwargs.get('bandwidth_challenge_type', 0),
+            kwargs.get('is_ip_v6', False),
+            kwargs.get('challengers_count') or self.proof_config["number_challengers_default"],
+            kwargs.get('bandwidth', 0),
+            kwargs.get('tolerance_count') or self.proof_config["challengers_tolerance_default"]
+        ]
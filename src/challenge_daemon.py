@@ -0,0 +1,221 @@
+import random
+import threading
+import time
+from typing import Dict, List, Any, Optional, Tuple
+
+from apscheduler.schedulers.blocking import BlockingScheduler
+
+from custom_session import CustomSession
+from chain import get_web3_account
+from chain_connector import ChainConnector
+from challenge_network import ChallengeNetwork
+from challenge_poller import ChallengePoller
+from event_indexer import EventIndexer
+from payer_pool import PayerPool
+from proof_validations import validate_inputs
+from logger import Logger
+
+# Run arguments a job may set, with the same defaults as challenge_network.py
+JOB_DEFAULTS = {
+    "prover": "all",
+    "project_name": "",
+    "challenger_count": 2,
+    "tolerance_count": 1,
+    "bandwidth_challenge_type": 0,
+    "max_in_flight": None,
+    "batch_requests": None,
+}
+
+
+class ChallengeDaemon:
+    """
+    Runs the challenge jobs declared in the config in-process.
+
+    Unlike scheduler.py spawning run_challenge.py per tick, the daemon keeps one
+    authenticated session, poller and chain connector per (network, proof_type)
+    alive across ticks and caches the prover list for provers_cache_seconds.
+    """
+
+    def __init__(self, config_file: str, src_path: str, private_key: str,
+                 payer_keyfile: Optional[str] = None):
+        self.src_path = src_path
+        self.challenge_network = ChallengeNetwork(config_file, src_path)
+        self.config = self.challenge_network.config
+        self.daemon_config = self.config.get_daemon_config()
+        self.payer_keys = self.challenge_network.payer_keys(private_key, payer_keyfile)
+        self.account = get_web3_account(self.payer_keys[0])
+        self.logger = Logger()
+
+        self._lock = threading.Lock()
+        self._sessions: Dict[Tuple[str, str], CustomSession] = {}
+        self._login_locks: Dict[Tuple[str, str], threading.Lock] = {}
+        self._pollers: Dict[Tuple[str, str], ChallengePoller] = {}
+        self._chain_connectors: Dict[str, ChainConnector] = {}
+        self._payers: Dict[str, PayerPool] = {}
+        self._provers: Dict[Tuple[str, str], Tuple[float, List[Dict[str, Any]]]] = {}
+        self._indexers: Dict[str, EventIndexer] = {}
+
+    def _get_session(self, network: str, proof_type: str) -> Optional[CustomSession]:
+        key = (network, proof_type)
+        with self._lock:
+            session = self._sessions.get(key)
+            if session is not None:
+                return session
+            login_lock = self._login_locks.setdefault(key, threading.Lock())
+        # Logging in is a network round trip: hold only this key's lock through it, so
+        # jobs for other networks and proof types don't wait on it
+        with login_lock:
+            with self._lock:
+                session = self._sessions.get(key)
+            if session is not None:
+                return session
+            session = self.challenge_network.open_session(network, proof_type, self.account)
+            if session is None:
+                return None
+            poller = ChallengePoller(session, self.config.get_api_config(network))
+            with self._lock:
+                self._sessions[key] = session
+                self._pollers[key] = poller
+            return session
+
+    def _get_chain_connector(self, network: str) -> ChainConnector:
+        with self._lock:
+            if network not in self._chain_connectors:
+                self._chain_connectors[network] = ChainConnector(self.config.get_chain_config(network))
+            return self._chain_connectors[network]
+
+    def _get_payers(self, network: str) -> PayerPool:
+        with self._lock:
+            if network not in self._payers:
+                self._payers[network] = self.challenge_network.payer_pool(network, self.payer_keys)
+            return self._payers[network]
+
+    def _get_indexer(self, network: str) -> EventIndexer:
+        connection = self._get_chain_connector(network).get_rpc()
+        with self._lock:
+            if network not in self._indexers:
+                self._indexers[network] = EventIndexer.for_chain_config(
+                    connection,
+                    self.config.get_chain_config(network),
+                    self.src_path,
+                    self.config.get_event_index_config()
+                )
+            return self._indexers[network]
+
+    def sync_events(self, network: str) -> None:
+        """Bring the local RequestHandler event index for a network up to date."""
+        try:
+            indexer = self._get_indexer(network)
+            indexer.sync()
+            self.logger.info(f'Request events on {network}: {indexer.summary()}')
+        except Exception as e:
+            self.logger.error(f'Error indexing request events on {network}: {e}')
+
+    def _get_provers(self, session: CustomSession, network: str, proof_type: str,
+                     prover_to_challenge: str) -> List[Dict[str, Any]]:
+        cache_seconds = self.daemon_config.get("provers_cache_seconds", 300)
+        key = (network, proof_type)
+        with self._lock:
+            cached = self._provers.get(key)
+        if cached and time.monotonic() - cached[0] < cache_seconds:
+            provers = list(cached[1])
+            random.shuffle(provers)
+        else:
+            provers = list(self.challenge_network._get_provers(
+                session, self.config.get_api_config(network), proof_type, 'all', network))
+            if provers:
+                with self._lock:
+                    self._provers[key] = (time.monotonic(), provers)
+
+        if prover_to_challenge.lower() != 'all':
+            address = prover_to_challenge.lower()
+            provers = [p for p in provers if p["id"].split("/")[1].lower() == address]
+        return provers
+
+    def run_job(self, job: Dict[str, Any]) -> None:
+        """Run one tick of a configured job."""
+        job = {**JOB_DEFAULTS, **job}
+        network, proof_type = job["network"], job["proof_type"]
+        self.logger.info(f'Running {proof_type} job on {network} for prover {job["prover"]} '
+                         f'project {job["project_name"] or "-"}')
+        try:
+            session = self._get_session(network, proof_type)
+            if not session:
+                self.logger.error(f'Skipping {proof_type} job on {network}: authentication failed')
+                return
+
+            self.challenge_network.run_sweep(
+                session,
+                proof_type,
+                self.account,
+                provers=self._get_provers(session, network, proof_type, job["prover"]),
+                poller=self._pollers[(network, proof_type)],
+                chain_connector=self._get_chain_connector(network),
+                payers=self._get_payers(network),
+                indexer=(self._get_indexer(network)
+                         if self.config.get_event_index_config().get("sync_interval_seconds") else None),
+                network=network,
+                prover_to_challenge=job["prover"],
+                project_name=job["project_name"],
+                challenger_count=job["challenger_count"],
+                tolerance_count=job["tolerance_count"],
+                bandwidth_challenge_type=job["bandwidth_challenge_type"],
+                max_in_flight=job["max_in_flight"],
+                batch_requests=job["batch_requests"],
+            )
+        except Exception as e:
+            self.logger.error(f'Error running {proof_type} job on {network}: {e}')
+
+    def start(self) -> None:
+        """Schedule every configured job and block until interrupted."""
+        jobs = self.daemon_config.get("jobs", [])
+        if not jobs:
+            self.logger.error('No jobs configured under "daemon" in the config file')
+            return
+
+        scheduler = BlockingScheduler()
+        for job in jobs:
+            if job["network"] not in ["testnet", "mainnet"]:
+                raise Exception("invalid value for network", job["network"])
+            validate_inputs(self.config.get_proof_config(job["proof_type"]))
+            scheduler.add_job(
+                self.run_job,
+                'interval',
+                minutes=job.get("interval_minutes", 5),
+                args=[job],
+                max_instances=1,
+                coalesce=True,
+            )
+
+        sync_seconds = self.config.get_event_index_config().get("sync_interval_seconds")
+        if sync_seconds:
+            for network in sorted({job["network"] for job in jobs}):
+                scheduler.add_job(
+                    self.sync_events,
+                    'interval',
+                    seconds=sync_seconds,
+                    args=[network],
+                    max_instances=1,
+                    coalesce=True,
+                )
+        self.logger.info(f'Challenge daemon started with {len(jobs)} jobs')
+        try:
+            scheduler.start()
+        finally:
+            self.close()
+
+    def close(self) -> None:
+        with self._lock:
+            pollers, self._pollers = list(self._pollers.values()), {}
+            sessions, self._sessions = list(self._sessions.values()), {}
+            indexers, self._indexers = list(self._indexers.values()), {}
+        for poller in pollers:
+            poller.stop()
+        for session in sessions:
+            session.close()
+        for indexer in indexers:
+            indexer.close()
+        if self.challenge_network.journal:
+            self.challenge_network.journal.close()
+        if self.challenge_network.cooldowns:
+            self.challenge_network.cooldowns.close()
@@ -0,0 +1,134 @@
+import struct
+from functools import lru_cache
+from typing import Any, Callable, Iterable, List, Sequence, Tuple
+
+from eth_abi.exceptions import EncodingTypeError, ValueOutOfBounds
+from eth_utils import is_checksum_address
+
+WORD_SIZE = 32
+
+POL_CHALLENGE_TYPES = ("address", "address", "bool", "uint256", "uint256", "int256", "int256")
+POB_CHALLENGE_TYPES = ("address", "address", "uint", "bool", "uint256", "uint256", "uint256")
+
+# Head words packed in place: small integers take one 8-byte field after zero
+# (or, when negative, 0xff) padding, addresses 20 bytes after 12 zero bytes
+_SMALL_UINT = struct.Struct(">24xQ")
+_SMALL_INT = struct.Struct(">24sq")
+_ADDRESS = struct.Struct(">12x20s")
+_SIGN_PADDING = b"\xff" * 24
+_HEX_DIGITS = frozenset("0123456789abcdefABCDEF")
+
+Writer = Callable[[bytearray, int, Any], None]
+
+
+def _write_address(buffer: bytearray, offset: int, value: Any) -> None:
+    if isinstance(value, (bytes, bytearray)):
+        if len(value) != 20:
+            raise EncodingTypeError(f"Value {value!r} is not a 20 byte address")
+        _ADDRESS.pack_into(buffer, offset, bytes(value))
+        return
+    if not isinstance(value, str):
+        raise EncodingTypeError(f"Value {value!r} is not a valid address")
+    _ADDRESS.pack_into(buffer, offset, _hex_address(value))
+
+
+@lru_cache(maxsize=4096)
+def _hex_address(value: str) -> bytes:
+    body = value[2:] if value[:2] in ("0x", "0X") else value
+    if len(body) != 40 or not _HEX_DIGITS.issuperset(body):
+        raise EncodingTypeError(f"Value {value!r} is not a valid address")
+    # Same rule as eth_abi: mixed-case addresses must carry a valid checksum
+    if body != body.lower() and body != body.upper() and not is_checksum_address(value):
+        raise EncodingTypeError(f"Value {value!r} has an invalid address checksum")
+    return bytes.fromhex(body)
+
+
+def _write_bool(buffer: bytearray, offset: int, value: Any) -> None:
+    if not isinstance(value, bool):
+        raise EncodingTypeError(f"Value {value!r} is not a bool")
+    _SMALL_UINT.pack_into(buffer, offset, value)
+
+
+def _write_uint(buffer: bytearray, offset: int, value: Any) -> None:
+    if not isinstance(value, int) or isinstance(value, bool):
+        raise EncodingTypeError(f"Value {value!r} is not an integer")
+    if 0 <= value < 1 << 64:
+        _SMALL_UINT.pack_into(buffer, offset, value)
+        return
+    try:
+        buffer[offset:offset + WORD_SIZE] = value.to_bytes(WORD_SIZE, "big")
+    except OverflowError:
+        raise ValueOutOfBounds(f"Value {value} does not fit in uint256")
+
+
+def _write_int(buffer: bytearray, offset: int, value: Any) -> None:
+    if not isinstance(value, int) or isinstance(value, bool):
+        raise EncodingTypeError(f"Value {value!r} is not an integer")
+    if 0 <= value < 1 << 63:
+        _SMALL_UINT.pack_into(buffer, offset, value)
+        return
+    if -(1 << 63) <= value < 0:
+        _SMALL_INT.pack_into(buffer, offset, _SIGN_PADDING, value)
+        return
+    try:
+        buffer[offset:offset + WORD_SIZE] = value.to_bytes(WORD_SIZE, "big", signed=True)
+    except OverflowError:
+        raise ValueOutOfBounds(f"Value {value} does not fit in int256")
+
+
+_WORD_WRITERS = {
+    "address": _write_address,
+    "bool": _write_bool,
+    "uint": _write_uint,
+    "uint256": _write_uint,
+    "int": _write_int,
+    "int256": _write_int,
+}
+
+
+class StaticTupleEncoder:
+    """
+    ABI encoder for a tuple of one-word static types.
+
+    Every value takes exactly one 32-byte word, so a payload is a fixed-size
+    layout. Precompiled per-type writers pack each word straight into a
+    buffer at its offset (encode_into); encode_many fills one preallocated
+    buffer for all rows. Output and validation errors match eth_abi.encode
+    for the same types.
+    """
+
+    def __init__(self, types: Sequence[str]):
+        unsupported = [abi_type for abi_type in types if abi_type not in _WORD_WRITERS]
+        if unsupported:
+            raise ValueError(f"Not one-word static ABI types: {unsupported}")
+        self.types = tuple(types)
+        self.size = WORD_SIZE * len(self.types)
+        self._writers: List[Tuple[int, Writer]] = [
+            (index * WORD_SIZE, _WORD_WRITERS[abi_type]) for index, abi_type in enumerate(self.types)]
+
+    def encode_into(self, buffer: bytearray, offset: int, values: Sequence[Any]) -> None:
+        """Write the encoding of values into buffer[offset:offset + size]."""
+        if len(values) != len(self._writers):
+            raise EncodingTypeError(f"Expected {len(self._writers)} values, got {len(values)}")
+        for (word_offset, write), value in zip(self._writers, values):
+            write(buffer, offset + word_offset, value)
+
+    def encode(self, values: Sequence[Any]) -> bytes:
+        buffer = bytearray(self.size)
+        self.encode_into(buffer, 0, values)
+        return bytes(buffer)
+
+    def encode_many(self, rows: Iterable[Sequence[Any]]) -> List[bytes]:
+        """Encode many tuples into one buffer; returns one payload per row."""
+        rows = rows if isinstance(rows, list) else list(rows)
+        size = self.size
+        buffer = bytearray(size * len(rows))
+        encode_into = self.encode_into
+        for index, values in enumerate(rows):
+            encode_into(buffer, index * size, values)
+        view = memoryview(buffer)
+        return [bytes(view[start:start + size]) for start in range(0, len(buffer), size)]
+
+
+POL_ENCODER = StaticTupleEncoder(POL_CHALLENGE_TYPES)
+POB_ENCODER = StaticTupleEncoder(POB_CHALLENGE_TYPES)
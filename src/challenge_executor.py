@@ -0,0 +1,109 @@
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor, wait
+from typing import Any, Callable, Iterable, List
+
+from logger import Logger
+from tracing import tracer
+
+
+class ChallengeExecutor:
+    """
+    Runs prover challenges on a bounded pool of worker threads.
+
+    A worker that returns a Future (a challenge handed to the ChallengePoller)
+    frees its thread immediately but keeps its in-flight slot until that
+    Future resolves.
+    """
+
+    def __init__(self, max_in_flight: int = 1):
+        self.max_in_flight = max(1, int(max_in_flight or 1))
+        self._slots = threading.BoundedSemaphore(self.max_in_flight)
+        self._pool = ThreadPoolExecutor(
+            max_workers=self.max_in_flight,
+            thread_name_prefix="challenge"
+        )
+        self._futures: List[Future] = []
+        self._challenges: List[Future] = []
+        self._lock = threading.Lock()
+        self.logger = Logger()
+
+    def submit(self, fn: Callable[..., Any], *args, **kwargs) -> Future:
+        """
+        Schedule a challenge, blocking while max_in_flight challenges are running.
+
+        Blocking here (instead of queueing inside the pool) keeps the caller from
+        pulling the whole prover list into memory ahead of the workers.
+
+        Args:
+            fn: Callable that runs one challenge end to end
+            *args: Positional arguments for fn
+            **kwargs: Keyword arguments for fn
+
+        Returns:
+            Future: Future resolved when the challenge is done
+        """
+        self._slots.acquire()
+        try:
+            future = self._pool.submit(tracer.bind(self._run), fn, *args, **kwargs)
+        except Exception:
+            self._slots.release()
+            raise
+        future.add_done_callback(self._on_done)
+        self._futures.append(future)
+        return future
+
+    def run_all(self, fn: Callable[..., Any], items: Iterable[Any], **kwargs) -> int:
+        """
+        Run fn for every item with at most max_in_flight running at once.
+
+        Args:
+            fn: Callable invoked as fn(item, **kwargs)
+            items: Items to process, consumed lazily
+            **kwargs: Keyword arguments passed to every call
+
+        Returns:
+            int: Number of items submitted
+        """
+        submitted = 0
+        try:
+            for item in items:
+                self.submit(fn, item, **kwargs)
+                submitted += 1
+        finally:
+            # Challenges already running finish even when items raised
+            self.wait()
+        return submitted
+
+    def wait(self) -> None:
+        """Block until every submitted challenge has finished."""
+        futures, self._futures = self._futures, []
+        wait(futures)
+        with self._lock:
+            challenges, self._challenges = self._challenges, []
+        wait(challenges)
+
+    def shutdown(self, wait: bool = True) -> None:
+        self._pool.shutdown(wait=wait)
+
+    def _run(self, fn: Callable[..., Any], *args, **kwargs) -> Any:
+        result = fn(*args, **kwargs)
+        if isinstance(result, Future):
+            # Recorded before the worker's future resolves: waiters wake before
+            # done-callbacks run, so _on_done would be too late for wait()
+            with self._lock:
+                self._challenges.append(result)
+        return result
+
+    def _on_done(self, future: Future) -> None:
+        if not future.cancelled() and future.exception():
+            self.logger.error(f'Challenge worker failed: {future.exception()}')
+        elif not future.cancelled() and isinstance(future.result(), Future):
+            future.result().add_done_callback(lambda _: self._slots.release())
+            return
+        self._slots.release()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.shutdown(wait=True)
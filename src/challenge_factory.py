@@ -1,11 +1,15 @@
 from abc import ABC, abstractmethod
 from typing import Dict, List, Any, Optional, Tuple
 from challenge import BaseChallenge, PoBChallenge, PoLChallenge
+from chain_connector import ChainConnector
+from payer_pool import PayerPool
 
 class ChallengeFactory:
     @staticmethod
     def create_challenge(challenge_type: str, chain_config: Dict[str, Any], 
-                        proof_config: Dict[str, Any], src_path: str) -> BaseChallenge:
+                        proof_config: Dict[str, Any], src_path: str,
+                        chain_connector: Optional[ChainConnector] = None,
+                        payers: Optional[PayerPool] = None) -> BaseChallenge:
         """
         Create appropriate challenge instance based on type.
         
@@ -14,13 +18,15 @@ class ChallengeFactory:
             chain_config: Chain configuration dictionary
             proof_config: Proof configuration dictionary
             src_path: Source path for ABI files
+            chain_connector: Connector to share across challenges (optional)
+            payers: Payer accounts to spread transactions across (optional)
             
         Returns:
             BaseChallenge: Instance of appropriate challenge class
         """
         if challenge_type.lower() == 'pol':
-            return PoLChallenge(chain_config, proof_config, src_path)
+            return PoLChallenge(chain_config, proof_config, src_path, chain_connector, payers)
         elif challenge_type.lower() == 'pob':
-            return PoBChallenge(chain_config, proof_config, src_path)
+            return PoBChallenge(chain_config, proof_config, src_path, chain_connector, payers)
         else:
             raise ValueError(f"Unsupported challenge type: {challenge_type}")
\ No newline at end of file
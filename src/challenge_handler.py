@@ -1,39 +1,132 @@
-import time
+from concurrent.futures import Future
 #import requests
 from custom_session import CustomSession
 
-from typing import Dict, List, Any, Optional, Tuple
+from typing import Callable, Dict, List, Any, Optional, Tuple
 
-from api import request_challenge, has_challenge_ended
+from api import request_challenge
+from challenge_poller import ChallengePoller
+from challenge_journal import ChallengeJournal, ABANDONED, ENDED, TRIGGERED
+from metrics import CHALLENGES_TRIGGERED, CHALLENGES_TRIGGER_FAILED
 from logger import Logger
+from tracing import tracer
 
 class ChallengeHandler:
-    def __init__(self, session: CustomSession, api_config: Dict[str, Any]):
+    def __init__(self, session: CustomSession, api_config: Dict[str, Any],
+                 poller: Optional[ChallengePoller] = None,
+                 journal: Optional[ChallengeJournal] = None):
         self.session = session
         self.api_config = api_config
+        self.poller = poller or ChallengePoller(session, api_config)
+        self.journal = journal
         self.logger = Logger()
 
-    def handle_challenge(self, proof_type: str, challenge_id: str, prover_id: str, 
-                        request_id: str, poll_seconds: int, challenge_type: str,
-                        challenger_count: int = 1) -> None:
-        response = request_challenge(self.session, self.api_config, proof_type, 
-                                  prover_id, challenge_id, challenge_type,challenger_count)
+    def handle_challenge(self, proof_type: str, challenge_id: str, prover_id: str,
+                        request_id: str, challenge_type: str,
+                        challenger_count: int = 1,
+                        journal_entry: Optional[str] = None) -> Optional[Future]:
+        """
+        Trigger a challenge and hand it to the poller.
+
+        Args:
+            journal_entry: Journal entry to record the trigger and final state under (optional)
+
+        Returns:
+            Optional[Future]: Resolved with the final challenge state, None if the trigger failed
+        """
+        with tracer.span("request_challenge", prover=prover_id, proof_type=proof_type):
+            response = request_challenge(self.session, self.api_config, proof_type,
+                                      prover_id, challenge_id, challenge_type,challenger_count)
         if not response:
-            return
+            CHALLENGES_TRIGGER_FAILED.labels(proof_type).inc()
+            if journal_entry:
+                self.journal.record(journal_entry, ABANDONED, state="TRIGGER_FAILED")
+            return None
+        CHALLENGES_TRIGGERED.labels(proof_type).inc()
 
-        self.logger.info(f'Challenge {response["result"]["challenge_id"]} for Prover {prover_id} '
-                        f'Status: {response["result"]["challenge_status"]}')
-        
         challenge_id = response["result"]["challenge_id"]
         status = response["result"]["challenge_status"]
-        retries = 0
-        while retries < self.api_config["retries"]:
-            challenge_ended, status = has_challenge_ended(self.session, self.api_config, 
-                                                       proof_type, challenge_id)
-            self.logger.info(f'Status of challenge request for challenge_id : {challenge_id} - {status}')
-            
-            if challenge_ended:
-                return
-            
-            retries += 1
-            time.sleep(poll_seconds)
\ No newline at end of file
+        self.logger.info(f'Challenge {challenge_id} for Prover {prover_id} Status: {status}',
+                         challenge_id=challenge_id, prover=prover_id, state=status,
+                         request_id=request_id, proof_type=proof_type)
+        if journal_entry:
+            self.journal.record(journal_entry, TRIGGERED, challenge_id=challenge_id, state=status)
+        return self._poll(proof_type, challenge_id, prover_id, status, challenge_type, journal_entry)
+
+    def _poll(self, proof_type: str, challenge_id: str, prover_id: str, status: Optional[str],
+              challenge_type: Optional[str], journal_entry: Optional[str]) -> Future:
+        on_end = None
+        if journal_entry:
+            on_end = lambda state: self.journal.record(journal_entry, ENDED, state=state)
+        future = self.poller.register(proof_type, challenge_id, prover_id, status, challenge_type, on_end)
+        span = tracer.start_span("poll_challenge", challenge_id=challenge_id, prover=prover_id)
+        future.add_done_callback(lambda done: span.end(state=done.result()))
+        return future
+
+    def resume(self, network: str, proof_type: str,
+               owns: Optional[Callable[[str], bool]] = None,
+               recover: Optional[Callable[[Dict[str, Any]], Optional[Future]]] = None) -> List[Future]:
+        """
+        Pick up the challenges an earlier run journaled but never saw finish.
+
+        Triggered challenges go straight back to the poller. Requests that made it
+        on-chain but were never triggered are triggered now with the journaled ids,
+        so no new transaction is sent. Entries with a sent transaction but no
+        request id are handed to recover, which reads the request back from the
+        chain. Entries that got no further than selection cost nothing to redo
+        and are abandoned. Each entry is claimed first, so entries another live
+        run is driving are left alone.
+
+        Args:
+            network: Network the entries were journaled on
+            proof_type: Type of proof (pol/pob)
+            owns: Only resume entries of provers for which this returns True (optional)
+            recover: Finishes an entry from its tx_hash, e.g. ProverProcessor.resume_submitted (optional)
+
+        Returns:
+            List[Future]: One per resumed challenge, resolved with its final state
+        """
+        if not self.journal:
+            return []
+        futures = []
+        for entry in self.journal.unfinished(network, proof_type):
+            entry_id, prover_id = entry["entry_id"], entry.get("prover")
+            if owns and not owns(prover_id or ""):
+                continue
+            # Another run may have picked the entry up since unfinished() read it
+            if not self.journal.claim(entry_id, network, proof_type, prover_id):
+                continue
+            if entry.get("challenge_id") and entry["stage"] == TRIGGERED:
+                self.logger.info(f'Resuming challenge {entry["challenge_id"]} for Prover {prover_id}',
+                                 challenge_id=entry["challenge_id"], prover=prover_id,
+                                 state=entry.get("state"), proof_type=proof_type)
+                futures.append(self._poll(proof_type, entry["challenge_id"], prover_id, entry.get("state"),
+                                          entry.get("challenge_type"), entry_id))
+            elif entry.get("request_id"):
+                self.logger.info(f'Triggering journaled request {entry["request_id"]} for Prover {prover_id}',
+                                 request_id=entry["request_id"], prover=prover_id, proof_type=proof_type)
+                future = self.handle_challenge(proof_type, entry.get("challenge_id"), prover_id,
+                                               entry["request_id"], entry.get("challenge_type"),
+                                               entry.get("challenger_count") or 1, entry_id)
+                if future:
+                    futures.append(future)
+            elif entry.get("tx_hash"):
+                if not recover:
+                    # Left open rather than abandoned: the transaction may have created a paid request
+                    self.logger.warning(f'Journaled transaction {entry["tx_hash"]} for Prover {prover_id} '
+                                        f'has no request id and nothing to recover it with',
+                                        tx_hash=entry["tx_hash"], prover=prover_id)
+                    continue
+                try:
+                    future = recover(entry)
+                except Exception as e:
+                    self.logger.error(f'Unable to recover journaled transaction {entry["tx_hash"]} '
+                                      f'for Prover {prover_id}: {e}', tx_hash=entry["tx_hash"], prover=prover_id)
+                    continue
+                if future:
+                    futures.append(future)
+            else:
+                self.journal.record(entry_id, ABANDONED, state=entry.get("state"))
+        if futures:
+            self.logger.info(f'Resumed {len(futures)} unfinished {proof_type} challenges on {network}')
+        return futures
@@ -0,0 +1,277 @@
+import os
+import socket
+import sqlite3
+import threading
+import time
+import uuid
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+from logger import Logger
+
+# Stages a challenge moves through, in order; ENDED and ABANDONED are terminal
+SELECTED = "SELECTED"
+SUBMITTED = "SUBMITTED"
+REQUESTED = "REQUESTED"
+TRIGGERED = "TRIGGERED"
+ENDED = "ENDED"
+ABANDONED = "ABANDONED"
+TERMINAL_STAGES = (ENDED, ABANDONED)
+
+FIELDS = ("network", "proof_type", "prover", "challenge_type", "challenger_count",
+          "tx_hash", "request_id", "challenge_id", "state")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS journal (
+    seq              INTEGER PRIMARY KEY AUTOINCREMENT,
+    entry_id         TEXT NOT NULL,
+    stage            TEXT NOT NULL,
+    recorded_at      REAL NOT NULL,
+    network          TEXT,
+    proof_type       TEXT,
+    prover           TEXT,
+    challenge_type   TEXT,
+    challenger_count INTEGER,
+    tx_hash          TEXT,
+    request_id       TEXT,
+    challenge_id     TEXT,
+    state            TEXT,
+    owner            TEXT
+);
+CREATE INDEX IF NOT EXISTS journal_by_entry ON journal (entry_id, seq);
+CREATE INDEX IF NOT EXISTS journal_by_stage ON journal (stage, recorded_at);
+CREATE TABLE IF NOT EXISTS leases (
+    entry_id    TEXT PRIMARY KEY,
+    owner       TEXT NOT NULL,
+    lease_until REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS leases_by_owner ON leases (owner);
+"""
+
+
+def _owner_alive(owner: str) -> bool:
+    """Whether the process named by a host:pid owner still runs; unknowable for other hosts."""
+    host, _, pid = owner.rpartition(":")
+    if host != socket.gethostname():
+        return True
+    try:
+        os.kill(int(pid), 0)
+    except ProcessLookupError:
+        return False
+    except (PermissionError, ValueError):
+        return True
+    return True
+
+
+class ChallengeJournal:
+    """
+    Append-only SQLite journal of every challenge this scheduler starts.
+
+    Each selected prover gets an entry, and every step it takes (selected,
+    transaction submitted, on-chain request id, challenge triggered, final
+    state) is appended as a row and committed before the run moves on. After a
+    crash or restart, unfinished() returns the entries that never reached a
+    terminal stage so they can be polled again instead of re-issued.
+
+    Several processes may share the file (cron runs, the daemon, shards). Each
+    row names the process that wrote it (host:pid), and every open entry is
+    leased to the process driving it for lease_seconds, renewed in the
+    background. unfinished() leaves out entries whose lease is held by a live
+    process, and claim() takes an entry over atomically before it is acted on.
+    """
+
+    def __init__(self, path: str, retention_days: float = 7, lease_seconds: float = 300):
+        self.path = path
+        self.lease_seconds = lease_seconds
+        self.owner = f'{socket.gethostname()}:{os.getpid()}'
+        self.logger = Logger()
+        self._lock = threading.Lock()
+        # Entries this process is driving: entry_id -> (network, proof_type, prover)
+        self._tracked: Dict[str, Tuple[str, str, str]] = {}
+        self._db = sqlite3.connect(path, check_same_thread=False, timeout=30, isolation_level=None)
+        self._db.row_factory = sqlite3.Row
+        with self._lock:
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute("PRAGMA synchronous=FULL")
+            self._db.executescript(SCHEMA)
+            columns = {row["name"] for row in self._db.execute("PRAGMA table_info(journal)")}
+            if "owner" not in columns:
+                self._db.execute("ALTER TABLE journal ADD COLUMN owner TEXT")
+        if retention_days:
+            self.prune(retention_days * 86400)
+        self._stop = threading.Event()
+        self._renewer = threading.Thread(target=self._renew_leases, name="journal-leases", daemon=True)
+        self._renewer.start()
+
+    @classmethod
+    def from_config(cls, journal_config: Dict[str, Any]) -> Optional["ChallengeJournal"]:
+        """Open the journal configured under "journal", None when it has no path."""
+        if not journal_config.get("path"):
+            return None
+        return cls(journal_config["path"], journal_config.get("retention_days", 7),
+                   journal_config.get("lease_seconds", 300))
+
+    def close(self) -> None:
+        """Stop renewing and hand this process's unfinished entries back to later runs."""
+        self._stop.set()
+        self._renewer.join()
+        with self._lock:
+            try:
+                self._db.execute("DELETE FROM leases WHERE owner = ?", (self.owner,))
+            except sqlite3.Error as e:
+                self.logger.error(f'Unable to release journal leases: {e}')
+            self._db.close()
+
+    def _renew_leases(self) -> None:
+        while not self._stop.wait(self.lease_seconds / 3):
+            try:
+                with self._lock:
+                    self._db.execute("UPDATE leases SET lease_until = ? WHERE owner = ?",
+                                     (time.time() + self.lease_seconds, self.owner))
+            except sqlite3.Error as e:
+                self.logger.error(f'Unable to renew journal leases: {e}')
+
+    def open_entry(self, network: str, proof_type: str, prover: str,
+                   challenge_type: Optional[str] = None,
+                   challenger_count: Optional[int] = None) -> str:
+        """
+        Start an entry for a selected prover.
+
+        Returns:
+            str: Entry id to pass to record()
+        """
+        entry_id = uuid.uuid4().hex
+        with self._lock:
+            self._tracked[entry_id] = (network, proof_type, prover)
+            try:
+                self._db.execute("INSERT OR REPLACE INTO leases (entry_id, owner, lease_until) VALUES (?, ?, ?)",
+                                 (entry_id, self.owner, time.time() + self.lease_seconds))
+            except sqlite3.Error as e:
+                self.logger.error(f'Unable to lease journal entry {entry_id}: {e}')
+        self.record(entry_id, SELECTED, network=network, proof_type=proof_type, prover=prover,
+                    challenge_type=challenge_type, challenger_count=challenger_count)
+        return entry_id
+
+    def claim(self, entry_id: str, network: str, proof_type: str, prover: str) -> bool:
+        """
+        Take over an entry replayed from the journal, atomically across processes.
+
+        The claim succeeds when nobody holds the entry's lease, the lease has
+        expired, or its owner on this host has exited, and the entry is still
+        unfinished.
+
+        Returns:
+            bool: True if this process now drives the entry
+        """
+        now = time.time()
+        with self._lock:
+            try:
+                self._db.execute("BEGIN IMMEDIATE")
+                try:
+                    finished = self._db.execute(
+                        f"SELECT 1 FROM journal WHERE entry_id = ? AND stage IN ({', '.join('?' * len(TERMINAL_STAGES))})",
+                        (entry_id, *TERMINAL_STAGES)
+                    ).fetchone()
+                    lease = self._db.execute("SELECT owner, lease_until FROM leases WHERE entry_id = ?",
+                                             (entry_id,)).fetchone()
+                    if finished or (lease and lease["owner"] != self.owner and lease["lease_until"] > now
+                                    and _owner_alive(lease["owner"])):
+                        self._db.execute("ROLLBACK")
+                        return False
+                    self._db.execute("INSERT OR REPLACE INTO leases (entry_id, owner, lease_until) VALUES (?, ?, ?)",
+                                     (entry_id, self.owner, now + self.lease_seconds))
+                    self._db.execute("COMMIT")
+                except BaseException:
+                    self._db.execute("ROLLBACK")
+                    raise
+            except sqlite3.Error as e:
+                self.logger.error(f'Unable to claim journal entry {entry_id}: {e}')
+                return False
+            self._tracked[entry_id] = (network, proof_type, prover)
+            return True
+
+    def record(self, entry_id: str, stage: str, **fields: Any) -> None:
+        """
+        Append a stage for an entry and commit it.
+
+        Args:
+            entry_id: Entry from open_entry
+            stage: One of SELECTED, SUBMITTED, REQUESTED, TRIGGERED, ENDED, ABANDONED
+            **fields: Values known at this stage (tx_hash, request_id, challenge_id, state, ...)
+        """
+        unknown = set(fields) - set(FIELDS)
+        if unknown:
+            raise ValueError(f"Unknown journal fields: {sorted(unknown)}")
+        values = [fields.get(field) for field in FIELDS]
+        try:
+            with self._lock:
+                self._db.execute(
+                    f"INSERT INTO journal (entry_id, stage, recorded_at, owner, {', '.join(FIELDS)}) "
+                    f"VALUES (?, ?, ?, ?, {', '.join('?' * len(FIELDS))})",
+                    [entry_id, stage, time.time(), self.owner, *values]
+                )
+                if stage in TERMINAL_STAGES:
+                    self._tracked.pop(entry_id, None)
+                    self._db.execute("DELETE FROM leases WHERE entry_id = ?", (entry_id,))
+        except sqlite3.Error as e:
+            self.logger.error(f'Unable to journal {stage} for entry {entry_id}: {e}')
+
+    def unfinished(self, network: str, proof_type: str) -> List[Dict[str, Any]]:
+        """
+        Entries that never reached a terminal stage and no live process is driving.
+
+        Entries of this process, and entries leased to another process whose
+        lease has not expired and which may still be running, are left out.
+        Call claim() before acting on an entry.
+
+        Returns:
+            List[Dict[str, Any]]: One dict per entry with entry_id, stage (the last one
+            reached) and the latest value of every field, oldest entry first
+        """
+        with self._lock:
+            rows = self._db.execute(
+                """
+                SELECT * FROM journal WHERE entry_id IN (
+                    SELECT entry_id FROM journal GROUP BY entry_id
+                    HAVING SUM(stage IN (?, ?)) = 0 AND MAX(network) = ? AND MAX(proof_type) = ?
+                ) ORDER BY seq
+                """,
+                (*TERMINAL_STAGES, network, proof_type)
+            ).fetchall()
+            leases = {row["entry_id"]: (row["owner"], row["lease_until"])
+                      for row in self._db.execute("SELECT * FROM leases WHERE owner != ?", (self.owner,))}
+            tracked = set(self._tracked)
+
+        now = time.time()
+        held = {entry_id for entry_id, (owner, lease_until) in leases.items()
+                if lease_until > now and _owner_alive(owner)}
+        entries: Dict[str, Dict[str, Any]] = {}
+        for row in rows:
+            if row["entry_id"] in tracked or row["entry_id"] in held:
+                continue
+            entry = entries.setdefault(row["entry_id"], {"entry_id": row["entry_id"]})
+            entry["stage"] = row["stage"]
+            for field in FIELDS:
+                if row[field] is not None:
+                    entry[field] = row[field]
+        return list(entries.values())
+
+    def tracked_provers(self, network: str, proof_type: str) -> Set[str]:
+        """Provers with a challenge this process is still driving."""
+        with self._lock:
+            return {prover for entry_network, entry_proof_type, prover in self._tracked.values()
+                    if entry_network == network and entry_proof_type == proof_type}
+
+    def prune(self, older_than_seconds: float) -> int:
+        """Delete entries that finished more than older_than_seconds ago."""
+        cutoff = time.time() - older_than_seconds
+        with self._lock:
+            deleted = self._db.execute(
+                """
+                DELETE FROM journal WHERE entry_id IN (
+                    SELECT entry_id FROM journal WHERE stage IN (?, ?) AND recorded_at < ?
+                )
+                """,
+                (*TERMINAL_STAGES, cutoff)
+            ).rowcount
+            self._db.execute("DELETE FROM leases WHERE entry_id NOT IN (SELECT entry_id FROM journal)")
+        return deleted
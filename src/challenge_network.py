@@ -2,29 +2,90 @@ import os
 import argparse
 import time
 import random
+from itertools import islice
 #import requests
 from custom_session import CustomSession
 from abc import ABC, abstractmethod
-from typing import Dict, List, Any, Optional, Tuple
+from typing import Dict, List, Any, Iterable, Iterator, Optional, Tuple
 
 from chain import get_web3_account,sign_message
 from chain_connector import ChainConnector
 from transaction_manager import TransactionManager
 from prover_processor import ProverProcessor
+from challenge_executor import ChallengeExecutor
+from challenge_poller import ChallengePoller
+from challenge_journal import ChallengeJournal
+from cooldown_cache import CooldownCache
+from payer_pool import PayerPool, load_private_keys
+from session_cache import SessionCache
+from prover_catalog import ProverCatalog
+from event_indexer import EventIndexer
+from metrics import registry as metrics_registry, start_exporters
+from rate_limiter import rate_limiter
+from resilience import resilience
+from tracing import tracer
 from argument_parser import ArgumentParser
 from proof_validations import validate_inputs
+from prover_selection import shard_of
 
 from config.config import Config
-from api import create_pre_login_payload, get_pre_login_message, login, get_provers
+from api import (create_pre_login_payload, get_pre_login_message, login, iter_provers, get_prover,
+                 ProverListError)
 from hexbytes import HexBytes
 from logger import Logger
 
 
+def chunked(items: Iterable[Any], size: int) -> Iterator[List[Any]]:
+    """Lists of up to size consecutive items."""
+    items = iter(items)
+    while True:
+        chunk = list(islice(items, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def windowed_shuffle(items: Iterable[Any], window: int, first: Optional[int] = None) -> Iterator[Any]:
+    """
+    Shuffle a stream through a buffer of up to window items.
+
+    Items start coming out once first items are buffered (the whole window by
+    default), so a sweep can start on the first page of provers. The buffer
+    then grows by one for every two items received until it holds window
+    items, after which each arriving item takes the place of a random buffered
+    one. Ordering is randomized within a sliding window without holding the
+    whole stream in memory.
+    """
+    first = min(first or window, window)
+    buffer: List[Any] = []
+    for received, item in enumerate(items, 1):
+        buffer.append(item)
+        if len(buffer) < first or (len(buffer) < window and received % 2):
+            continue
+        index = random.randrange(len(buffer))
+        buffer[index], buffer[-1] = buffer[-1], buffer[index]
+        yield buffer.pop()
+    random.shuffle(buffer)
+    yield from buffer
+
+
 class ChallengeNetwork:
     def __init__(self, config_file: str, src_path: str):
         self.config = Config(config_file)
         self.src_path = src_path
+        Logger.configure(self.config.get_logging_config())
         self.logger = Logger()
+        session_cache_config = self.config.get_session_cache_config()
+        self.session_cache = SessionCache(
+            session_cache_config.get("path"),
+            session_cache_config.get("ttl_seconds", 3600)
+        )
+        catalog_config = self.config.get_catalog_config()
+        self.catalog = (ProverCatalog(catalog_config["path"],
+                                      catalog_config.get("sync_interval_seconds", 300))
+                        if catalog_config.get("path") else None)
+        self.journal = ChallengeJournal.from_config(self.config.get_journal_config())
+        self.cooldowns = CooldownCache.from_config(self.config.get_cooldown_config())
 
     def _authenticate(self, 
                      session: CustomSession, 
@@ -85,91 +146,298 @@ class ChallengeNetwork:
                      session: CustomSession, 
                      api_config: Dict[str, Any],
                      proof_type: str,
-                     prover_to_challenge: str) -> List[Dict[str, Any]]:
+                     prover_to_challenge: str,
+                     network: Optional[str] = None,
+                     project_name: Optional[str] = None) -> Iterator[Dict[str, Any]]:
         """
-        Get list of provers from the API.
+        Stream provers from the prover catalog or the API, page by page.
         
         Args:
             session: Active requests session
             api_config: API configuration dictionary
             proof_type: Type of proof being requested
             prover_to_challenge: Specific prover to challenge or 'all'
+            network: Network being run on, enables the prover catalog (optional)
+            project_name: Project name to narrow catalog queries to (optional)
             
         Returns:
-            List of prover dictionaries
+            Iterator of prover dictionaries
         """
+        count = 0
         try:
-            response = get_provers(session, api_config, proof_type)
-            if not response or "provers" not in response:
-                self.logger.error('Error: No provers found')
-                return []
-            
-            provers = response["provers"]
-            self.logger.info(f'Got Provers: {len(provers)}')
-            
-            # Shuffle provers for randomization
-            random.shuffle(provers)
-            
+            if self.catalog and network:
+                provers = self._get_catalog_provers(
+                    session, api_config, proof_type, prover_to_challenge, network, project_name)
+            else:
+                provers = iter_provers(session, api_config, proof_type,
+                                       api_config.get("provers_page_size", 500))
+
             # Filter provers if specific prover requested
             if prover_to_challenge != 'all':
-                provers = list(filter(
-                    lambda p: p["id"].split("/")[1] == prover_to_challenge, 
+                provers = filter(
+                    lambda p: str(p.get("id", "")).split("/")[-1].lower() == prover_to_challenge.lower(),
                     provers
-                ))
-                
-            return provers
+                )
+
+            # Shuffle provers for randomization
+            # Start yielding after the first page rather than only once the window is full
+            for prover in windowed_shuffle(provers, api_config.get("provers_shuffle_window", 1000),
+                                           api_config.get("provers_page_size", 500)):
+                count += 1
+                yield prover
 
         except Exception as e:
-            self.logger.error(f'Error getting provers: {str(e)}')
-            return []
+            # Raised on, so the sweep ends as a failure rather than a run over the whole list
+            self.logger.error(f'Prover list incomplete after {count} provers: {e}')
+            raise
+        finally:
+            if count:
+                self.logger.info(f'Got Provers: {count}')
+            else:
+                self.logger.error('Error: No provers found')
 
-    def run(self, proof_type: str, private_key: str, **kwargs):
-        network = kwargs["network"]
+    def _get_catalog_provers(self,
+                             session: CustomSession,
+                             api_config: Dict[str, Any],
+                             proof_type: str,
+                             prover_to_challenge: str,
+                             network: str,
+                             project_name: Optional[str]) -> Iterable[Dict[str, Any]]:
+        """
+        Answer prover selection from the local catalog, syncing it when stale.
 
-        if network not in ["testnet","mainnet"]:
-            raise Exception("invalid value for network", network)
-        
+        A single prover already in the catalog is refreshed with one /prover
+        call instead of downloading the full list.
+        """
+        stale = self.catalog.is_stale(network, proof_type)
+
+        if prover_to_challenge != 'all':
+            known = self.catalog.select(network, proof_type, address=prover_to_challenge)
+            if known and not stale:
+                return known
+            refreshed = [get_prover(session, api_config, proof_type, p["id"]) for p in known]
+            if known and all(isinstance(p, dict) and "id" in p for p in refreshed):
+                self.catalog.upsert(network, proof_type, refreshed)
+                return refreshed
+
+        if stale:
+            return self.catalog.sync(
+                network, proof_type,
+                iter_provers(session, api_config, proof_type, api_config.get("provers_page_size", 500))
+            )
+
+        return self.catalog.select(
+            network, proof_type,
+            project_name=project_name or None,
+            alive_within_minutes=self.config.get_proof_config(proof_type)["alive_check_minutes"]
+        )
+
+    def open_session(self, network: str, proof_type: str, account: Any) -> Optional[CustomSession]:
+        """
+        Create a session for the API and authenticate it.
+
+        Cookies cached by an earlier run are reused when they have not expired;
+        the session logs in again by itself if the API rejects them.
+
+        Args:
+            network: Network to run on (testnet/mainnet)
+            proof_type: Type of proof being requested
+            account: Web3 account object
+
+        Returns:
+            Optional[CustomSession]: Authenticated session, None if authentication failed
+        """
         api_config = self.config.get_api_config(network)
-        chain_config = self.config.get_chain_config(network)
         proof_config = self.config.get_proof_config(proof_type)
         account_config = self.config.get_account_config()
-        
-        validate_inputs(proof_config)
-        account = get_web3_account(private_key)
+        rate_limiter.configure(api_config["api_url"], api_config.get("rate_limits", {}))
+        resilience.configure(api_config["api_url"], api_config.get("retry", {}),
+                             api_config.get("circuit_breaker", {}))
 
-        with CustomSession() as session:
-            session.verify = True
-            session.headers.update(api_config["content_type_json"])
-            
-            if not self._authenticate(session, api_config, proof_config, 
-                                    account_config, proof_type, account):
-                return
+        session = CustomSession()
+        session.verify = True
+        session.headers.update(api_config["content_type_json"])
 
-            processor = ProverProcessor(
-                session, 
-                api_config, 
-                chain_config, 
-                proof_config,
-                self.src_path  # Pass src_path to ProverProcessor
-            )
-            
+        cache_key = SessionCache.key(account.address, network, proof_type)
+
+        def log_in() -> bool:
+            session.cookies.clear()
+            with tracer.span("login", network=network, proof_type=proof_type):
+                authenticated = self._authenticate(session, api_config, proof_config,
+                                                   account_config, proof_type, account)
+            if not authenticated:
+                self.session_cache.invalidate(cache_key)
+                return False
+            self.session_cache.store(cache_key, session.cookies.get_dict())
+            return True
+
+        cookies = self.session_cache.load(cache_key)
+        if cookies:
+            session.cookies.update(cookies)
+            self.logger.info('Reusing cached session')
+        elif not log_in():
+            session.close()
+            return None
+
+        session.reauthenticate = log_in
+        return session
+
+    def run_sweep(self,
+                  session: CustomSession,
+                  proof_type: str,
+                  account: Any,
+                  provers: Optional[Iterable[Dict[str, Any]]] = None,
+                  poller: Optional[ChallengePoller] = None,
+                  chain_connector: Optional[ChainConnector] = None,
+                  shard: Optional[Tuple[int, int]] = None,
+                  payers: Optional[PayerPool] = None,
+                  indexer: Optional[EventIndexer] = None,
+                  **kwargs) -> None:
+        """
+        Challenge the selected provers over an authenticated session.
+
+        Args:
+            session: Authenticated session from open_session
+            proof_type: Type of proof being requested
+            account: Web3 account object
+            provers: Provers to select from, streamed from the API when None
+            poller: Poller shared across sweeps (optional)
+            chain_connector: Chain connector shared across sweeps (optional)
+            shard: (index, count) when this sweep is one shard of a sharded run (optional)
+            payers: Payer accounts to spread on-chain requests across (optional)
+            indexer: Request event index checked when resuming journaled transactions (optional)
+            **kwargs: Run arguments (network, prover_to_challenge, project_name, ...)
+        """
+        network = kwargs["network"]
+        api_config = self.config.get_api_config(network)
+        chain_config = self.config.get_chain_config(network)
+        proof_config = self.config.get_proof_config(proof_type)
+
+        owns_poller = poller is None
+        poller = poller or ChallengePoller(session, api_config)
+        processor = ProverProcessor(
+            session, 
+            api_config, 
+            chain_config, 
+            proof_config,
+            self.src_path,  # Pass src_path to ProverProcessor
+            poller,
+            chain_connector,
+            self.journal,
+            self.cooldowns,
+            payers,
+            indexer
+        )
+        
+        if provers is None:
             provers = self._get_provers(
                 session, 
                 api_config, 
                 proof_type, 
-                kwargs.get('prover_to_challenge', 'all')
+                kwargs.get('prover_to_challenge', 'all'),
+                network,
+                kwargs.get('project_name')
             )
-            
-            if not provers:
-                return
-
-            for prover in provers:
-                processor.process_prover(
-                    proof_type, 
-                    prover, 
-                    account=account, 
-                    **kwargs
+
+        max_in_flight = (kwargs.get('max_in_flight')
+                         or api_config.get("max_in_flight_challenges", 1))
+        self.logger.info(f'Running challenges with up to {max_in_flight} in flight')
+
+        selected = processor.iter_selected(
+            proof_type,
+            provers,
+            api_config.get("provers_page_size", 500),
+            **kwargs
+        )
+        if self.journal:
+            # Poll what an earlier run left unfinished and don't challenge those provers again
+            owns = (lambda prover_id: shard_of(prover_id, shard[1]) == shard[0]) if shard else None
+            processor.challenge_handler.resume(
+                network, proof_type, owns,
+                lambda entry: processor.resume_submitted(proof_type, entry, **kwargs))
+            busy = self.journal.tracked_provers(network, proof_type)
+            selected = (prover for prover in selected if prover["id"] not in busy)
+
+        batch_size = self._request_batch_size(chain_config, **kwargs)
+        if batch_size > 1:
+            self.logger.info(f'Requesting challenges on-chain in batches of up to {batch_size} provers')
+            work, items = processor.process_batch, chunked(selected, batch_size)
+        else:
+            work, items = processor.process_prover, selected
+
+        status_requests = poller.status_requests
+        try:
+            with ChallengeExecutor(max_in_flight) as executor:
+                executor.run_all(
+                    lambda item: work(
+                        proof_type,
+                        item,
+                        account=account,
+                        selected=True,
+                        **kwargs
+                    ),
+                    items
                 )
+        except ProverListError:
+            self.logger.error(f'Sweep ended early after {poller.status_requests - status_requests} '
+                              f'status requests: the prover list is incomplete')
+            raise
+        finally:
+            if owns_poller:
+                poller.stop()
+        self.logger.info(f'Sweep finished after {poller.status_requests - status_requests} status requests')
+
+    def _request_batch_size(self, chain_config: Dict[str, Any], **kwargs) -> int:
+        """Provers per batched submitRequest sweep item, 1 when requests are not batched."""
+        if not (kwargs.get('batch_requests') or chain_config.get("batch_requests")):
+            return 1
+        if not chain_config.get("submit_on_chain"):
+            self.logger.warning('Batched requests need submit_on_chain in the chain config; not batching')
+            return 1
+        return max(1, int(chain_config.get("max_batch_size", 50)))
+
+    def payer_keys(self, private_key: Optional[str] = None,
+                   payer_keyfile: Optional[str] = None) -> List[str]:
+        """
+        Payer keys from --private_key, the keyfile and $PAYER_PRIVATE_KEYS.
+
+        Args:
+            private_key: Primary payer key, or several separated by commas
+            payer_keyfile: File of payer keys (default: payers.keyfile from config)
+
+        Returns:
+            List[str]: Keys without duplicates, the primary one first
+        """
+        return load_private_keys(private_key,
+                                 payer_keyfile or self.config.get_payers_config().get("keyfile"))
+
+    def payer_pool(self, network: str, private_keys: List[str]) -> PayerPool:
+        """Pool of payer accounts on a network; its primary account logs in to the API."""
+        payers = PayerPool.from_config(private_keys, self.config.get_chain_config(network),
+                                       self.config.get_payers_config())
+        if len(payers) > 1:
+            self.logger.info(f'Spreading on-chain requests across {len(payers)} payer accounts '
+                             f'({payers.strategy})')
+        return payers
+
+    def run(self, proof_type: str, private_key: str, payer_keyfile: Optional[str] = None, **kwargs):
+        network = kwargs["network"]
+
+        if network not in ["testnet","mainnet"]:
+            raise Exception("invalid value for network", network)
+        
+        proof_config = self.config.get_proof_config(proof_type)
+        validate_inputs(proof_config)
+        payers = self.payer_pool(network, self.payer_keys(private_key, payer_keyfile))
+        account = payers.primary
+
+        with tracer.span("open_session", network=network, proof_type=proof_type):
+            session = self.open_session(network, proof_type, account)
+        if not session:
+            return
+
+        with session, tracer.span("sweep", network=network, proof_type=proof_type):
+            self.run_sweep(session, proof_type, account, payers=payers, **kwargs)
 
 def main():
     args = ArgumentParser.parse_arguments()
@@ -177,16 +445,32 @@ def main():
     src_path = os.path.dirname(full_path) + "/"
     
     challenge_system = ChallengeNetwork(args.config_file, src_path)
-    challenge_system.run(
-        proof_type=args.proof_type,
-        private_key=args.private_key,
-        prover_to_challenge=args.prover,
-        challenger_count=args.challenger_count,
-        tolerance_count=args.tolerance_count,
-        project_name=args.project_name,
-        bandwidth_challenge_type=args.bandwidth_challenge_type,
-        network=args.network,
-    )
+    if args.trace_file:
+        tracer.enable()
+    textfile = start_exporters(challenge_system.config.get_metrics_config(),
+                               args.metrics_port, args.metrics_textfile)
+    run = challenge_system.run
+    if args.shards > 1:
+        from sharded_runner import ShardedRunner  # imports this module
+        run = ShardedRunner(challenge_system, args.config_file, src_path, args.shards).run
+    try:
+        run(
+            proof_type=args.proof_type,
+            private_key=args.private_key,
+            payer_keyfile=args.payer_keyfile,
+            prover_to_challenge=args.prover,
+            challenger_count=args.challenger_count,
+            tolerance_count=args.tolerance_count,
+            project_name=args.project_name,
+            bandwidth_challenge_type=args.bandwidth_challenge_type,
+            network=args.network,
+            max_in_flight=args.max_in_flight,
+            batch_requests=args.batch_requests,
+        )
+    finally:
+        metrics_registry.stop(textfile)
+        if args.trace_file:
+            tracer.export(args.trace_file, args.trace_format)
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
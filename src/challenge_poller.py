@@ -0,0 +1,214 @@
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, Dict, Optional
+
+from custom_session import CustomSession
+from api import has_challenge_ended, CHALLENGE_END_STATES
+from poll_schedule import AdaptivePollSchedule
+from metrics import CHALLENGES_ENDED, CHALLENGES_IN_FLIGHT, CHALLENGE_DURATION_SECONDS
+from logger import Logger
+
+
+class _InFlightChallenge:
+    __slots__ = ("proof_type", "challenge_id", "prover_id", "schedule_key", "future",
+                 "started", "next_due", "polls", "status", "seen_states", "on_end")
+
+    def __init__(self, proof_type: str, challenge_id: str, prover_id: str,
+                 schedule_key: str, status: Optional[str],
+                 on_end: Optional[Callable[[Optional[str]], None]] = None):
+        self.proof_type = proof_type
+        self.challenge_id = challenge_id
+        self.prover_id = prover_id
+        self.schedule_key = schedule_key
+        self.future: Future = Future()
+        self.started = time.monotonic()
+        self.next_due = self.started
+        self.polls = 0
+        self.status = status
+        self.seen_states = {status} if status else set()
+        self.on_end = on_end
+
+
+class ChallengePoller:
+    """
+    Polls the status of every in-flight challenge from a single timed loop.
+
+    Challenges are registered once they have been triggered. The loop wakes at
+    the earliest due poll, fans out one status check per due challenge and
+    retires the ones that reached a CHALLENGE_END_STATES state (or passed the
+    schedule's deadline), resolving their futures with the last observed state.
+    When each challenge is next due is decided by the AdaptivePollSchedule.
+    """
+
+    def __init__(self, session: CustomSession, api_config: Dict[str, Any],
+                 schedule: Optional[AdaptivePollSchedule] = None,
+                 status_workers: Optional[int] = None):
+        self.session = session
+        self.api_config = api_config
+        self.schedule = schedule or AdaptivePollSchedule.from_api_config(api_config)
+        self.status_workers = status_workers or api_config.get("status_workers", 8)
+        self.status_requests = 0
+        self.logger = Logger()
+
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._stopped = threading.Event()
+        self._challenges: Dict[str, _InFlightChallenge] = {}
+        self._thread: Optional[threading.Thread] = None
+        self._pool: Optional[ThreadPoolExecutor] = None
+
+    @property
+    def in_flight(self) -> int:
+        with self._lock:
+            return len(self._challenges)
+
+    def register(self, proof_type: str, challenge_id: str, prover_id: str,
+                 status: Optional[str] = None, challenge_type: Optional[str] = None,
+                 on_end: Optional[Callable[[Optional[str]], None]] = None) -> Future:
+        """
+        Track a triggered challenge until it ends.
+
+        Args:
+            proof_type: Type of proof (pol/pob)
+            challenge_id: Challenge identifier returned by the API
+            prover_id: Prover the challenge was triggered for
+            status: Status reported when the challenge was triggered (optional)
+            challenge_type: PoB challenge type (downlink/uplink), None for PoL
+            on_end: Called with the final state once the challenge ends or polling gives up;
+                not called for challenges still in flight when the poller is stopped
+
+        Returns:
+            Future: Resolved with the last observed challenge state
+        """
+        key = AdaptivePollSchedule.key(proof_type, challenge_type)
+        entry = _InFlightChallenge(proof_type, challenge_id, prover_id, key, status, on_end)
+        entry.next_due += self.schedule.next_delay(key, 0, 0, status) or 0
+        with self._lock:
+            existing = self._challenges.get(challenge_id)
+            if existing:
+                return existing.future
+            self._challenges[challenge_id] = entry
+        CHALLENGES_IN_FLIGHT.labels(proof_type).inc()
+        self.start()
+        self._wakeup.set()
+        return entry.future
+
+    def start(self) -> None:
+        with self._lock:
+            if self._thread and self._thread.is_alive():
+                return
+            self._stopped.clear()
+            self._pool = ThreadPoolExecutor(max_workers=self.status_workers,
+                                            thread_name_prefix="challenge-status")
+            self._thread = threading.Thread(target=self._run, name="challenge-poller", daemon=True)
+            self._thread.start()
+
+    def stop(self) -> None:
+        """Stop polling; challenges still in flight resolve with their last state."""
+        self._stopped.set()
+        self._wakeup.set()
+        if self._thread:
+            self._thread.join()
+            self._thread = None
+        if self._pool:
+            self._pool.shutdown(wait=True)
+            self._pool = None
+        with self._lock:
+            remaining, self._challenges = list(self._challenges.values()), {}
+        for entry in remaining:
+            self._record_end(entry)
+            if not entry.future.done():
+                entry.future.set_result(entry.status)
+        self.schedule.save()
+
+    def _run(self) -> None:
+        while not self._stopped.is_set():
+            next_due = self._poll_due()
+            timeout = None if next_due is None else max(0.0, next_due - time.monotonic())
+            self._wakeup.wait(timeout)
+            self._wakeup.clear()
+
+    def _poll_due(self) -> Optional[float]:
+        """Poll every challenge that is due; return when the next one is due."""
+        now = time.monotonic()
+        with self._lock:
+            due = [entry for entry in self._challenges.values() if entry.next_due <= now]
+
+        checks = [
+            (entry, self._pool.submit(has_challenge_ended, self.session, self.api_config,
+                                      entry.proof_type, entry.challenge_id))
+            for entry in due
+        ]
+        self.status_requests += len(checks)
+
+        for entry, check in checks:
+            challenge_ended, status = check.result()
+            self._on_status(entry, challenge_ended, status)
+
+        with self._lock:
+            if not self._challenges:
+                return None
+            return min(entry.next_due for entry in self._challenges.values())
+
+    def _on_status(self, entry: _InFlightChallenge, challenge_ended: bool, status: Optional[str]) -> None:
+        now = time.monotonic()
+        elapsed = now - entry.started
+        entry.polls += 1
+        if status is None and not challenge_ended:
+            # Status unavailable (API error, open circuit): keep the last state, try again later
+            status = entry.status
+        elif status != entry.status:
+            # Log transitions only; a challenge is polled many times per state
+            self.logger.info(f'Status of challenge request for challenge_id : {entry.challenge_id} - {status}',
+                             challenge_id=entry.challenge_id, prover=entry.prover_id,
+                             state=status, previous_state=entry.status,
+                             elapsed_seconds=round(elapsed, 3), polls=entry.polls)
+        entry.status = status
+
+        # Only states reported by the API feed the schedule, not local failures
+        reported = status is not None and (status in CHALLENGE_END_STATES or not challenge_ended)
+        if reported and not challenge_ended:
+            entry.seen_states.add(status)
+
+        if challenge_ended:
+            if reported:
+                self.schedule.record_completion(entry.schedule_key, elapsed, entry.seen_states)
+            self._retire(entry)
+            return
+
+        delay = self.schedule.next_delay(entry.schedule_key, elapsed, entry.polls, status)
+        if delay is None:
+            self.logger.warning(f'Gave up polling challenge_id : {entry.challenge_id} '
+                                f'after {elapsed:.0f}s - last status {status}',
+                                challenge_id=entry.challenge_id, prover=entry.prover_id,
+                                state=status, elapsed_seconds=round(elapsed, 3), polls=entry.polls)
+            self._retire(entry)
+            return
+        entry.next_due = now + delay
+
+    def _retire(self, entry: _InFlightChallenge) -> None:
+        with self._lock:
+            self._challenges.pop(entry.challenge_id, None)
+        self._record_end(entry)
+        if entry.on_end:
+            try:
+                entry.on_end(entry.status)
+            except Exception as e:
+                self.logger.error(f'Error finishing challenge_id : {entry.challenge_id}: {e}')
+        entry.future.set_result(entry.status)
+
+    def _record_end(self, entry: _InFlightChallenge) -> None:
+        duration = time.monotonic() - entry.started
+        CHALLENGES_IN_FLIGHT.labels(entry.proof_type).dec()
+        CHALLENGES_ENDED.labels(entry.proof_type, entry.status or "UNKNOWN").inc()
+        CHALLENGE_DURATION_SECONDS.labels(entry.proof_type).observe(duration)
+        self.logger.info(f'Challenge {entry.challenge_id} finished - {entry.status}',
+                         challenge_id=entry.challenge_id, prover=entry.prover_id,
+                         state=entry.status, duration_seconds=round(duration, 3), polls=entry.polls)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.stop()
@@ -15,4 +15,31 @@ class Config:
         return self.config['proofs'][proof]
 
     def get_account_config(self):
-        return self.config['account']
\ No newline at end of file
+        return self.config['account']
+
+    def get_daemon_config(self):
+        return self.config.get('daemon', {})
+
+    def get_session_cache_config(self):
+        return self.config.get('session_cache', {})
+
+    def get_catalog_config(self):
+        return self.config.get('catalog', {})
+
+    def get_event_index_config(self):
+        return self.config.get('event_index', {})
+
+    def get_metrics_config(self):
+        return self.config.get('metrics', {})
+
+    def get_logging_config(self):
+        return self.config.get('logging', {})
+
+    def get_journal_config(self):
+        return self.config.get('journal', {})
+
+    def get_cooldown_config(self):
+        return self.config.get('cooldown', {})
+
+    def get_payers_config(self):
+        return self.config.get('payers', {})
@@ -0,0 +1,77 @@
+import json
+import os
+import threading
+import time
+import weakref
+from typing import Any, Dict, List, Tuple
+
+
+class ContractCache:
+    """
+    Process-wide cache of contract ABIs, contract instances and event objects.
+
+    Contracts are keyed by (address, ABI path) and built lazily, once per web3
+    connection. An ABI file is re-stat'ed at most every check_interval seconds
+    and everything built from it is dropped when its mtime changes.
+    """
+
+    def __init__(self, check_interval: float = 1.0):
+        self.check_interval = check_interval
+        self._lock = threading.RLock()
+        # abi path -> (mtime, last checked, abi)
+        self._abis: Dict[str, Tuple[float, float, List[Dict[str, Any]]]] = {}
+        # (address, abi path) -> {connection: contract}
+        self._contracts: Dict[Tuple[str, str], "weakref.WeakKeyDictionary"] = {}
+        # contract -> {event name: event}
+        self._events: "weakref.WeakKeyDictionary" = weakref.WeakKeyDictionary()
+
+    def get_abi(self, abi_file: str) -> List[Dict[str, Any]]:
+        abi_file = os.path.abspath(abi_file)
+        now = time.monotonic()
+        with self._lock:
+            cached = self._abis.get(abi_file)
+            if cached and now - cached[1] < self.check_interval:
+                return cached[2]
+
+            mtime = os.path.getmtime(abi_file)
+            if cached and cached[0] == mtime:
+                self._abis[abi_file] = (mtime, now, cached[2])
+                return cached[2]
+
+            with open(abi_file, "r") as file:
+                abi = json.load(file)
+            self._abis[abi_file] = (mtime, now, abi)
+            # The ABI changed: contracts built from the old one are stale
+            for key in [key for key in self._contracts if key[1] == abi_file]:
+                del self._contracts[key]
+            return abi
+
+    def get_contract(self, connection: Any, abi_file: str, address: str) -> Any:
+        abi = self.get_abi(abi_file)
+        key = (address.lower(), os.path.abspath(abi_file))
+        with self._lock:
+            contracts = self._contracts.setdefault(key, weakref.WeakKeyDictionary())
+            contract = contracts.get(connection)
+            if contract is None:
+                contract = contracts[connection] = connection.eth.contract(address=address, abi=abi)
+            return contract
+
+    def get_event(self, contract: Any, event_name: str) -> Any:
+        """Prepared event object, e.g. for process_receipt or get_logs."""
+        with self._lock:
+            events = self._events.get(contract)
+            if events is None:
+                events = self._events[contract] = {}
+            event = events.get(event_name)
+            if event is None:
+                event = events[event_name] = getattr(contract.events, event_name)()
+            return event
+
+    def invalidate(self) -> None:
+        with self._lock:
+            self._abis.clear()
+            self._contracts.clear()
+            self._events = weakref.WeakKeyDictionary()
+
+
+contract_cache = ContractCache()
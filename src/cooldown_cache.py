@@ -0,0 +1,153 @@
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, Optional, Set, Tuple
+
+from logger import Logger
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS cooldowns (
+    network      TEXT NOT NULL,
+    proof_type   TEXT NOT NULL,
+    address      TEXT NOT NULL,
+    triggered_at REAL NOT NULL,
+    until        REAL NOT NULL,
+    PRIMARY KEY (network, proof_type, address)
+);
+CREATE INDEX IF NOT EXISTS cooldowns_by_until ON cooldowns (until);
+CREATE INDEX IF NOT EXISTS cooldowns_by_triggered_at ON cooldowns (triggered_at);
+"""
+
+
+class CooldownCache:
+    """
+    Provers challenged recently, shared by every run through a SQLite file.
+
+    A successful trigger puts the prover's (network, proof_type, address) on
+    cooldown for cooldown_seconds, so overlapping scheduler jobs, cron runs and
+    manual runs don't challenge it again. At most every evict_seconds, a claim
+    drops expired entries and, past max_entries, the least recently triggered
+    ones, so the file can briefly hold a few more than max_entries.
+
+    Sweep-wide checks go through cooling(), a set of the addresses on cooldown
+    that is re-read at most every refresh_seconds. Right before a trigger,
+    claim() checks and starts the cooldown in one statement, so two runs can't
+    both challenge the prover; release() ends a claim whose trigger failed.
+    """
+
+    def __init__(self, path: str, cooldown_seconds: float = 3600,
+                 max_entries: int = 100000, refresh_seconds: float = 5,
+                 evict_seconds: float = 60):
+        self.path = path
+        self.cooldown_seconds = cooldown_seconds
+        self.max_entries = max_entries
+        self.refresh_seconds = refresh_seconds
+        self.evict_seconds = evict_seconds
+        self._evicted_at = 0.0
+        self.logger = Logger()
+        self._lock = threading.Lock()
+        self._snapshots: Dict[Tuple[str, str], Tuple[float, Set[str]]] = {}
+        self._db = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        with self._lock, self._db:
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.executescript(SCHEMA)
+
+    @classmethod
+    def from_config(cls, cooldown_config: Dict[str, Any]) -> Optional["CooldownCache"]:
+        """Open the cache configured under "cooldown", None when it has no path."""
+        if not cooldown_config.get("path"):
+            return None
+        return cls(
+            cooldown_config["path"],
+            cooldown_config.get("cooldown_seconds", 3600),
+            cooldown_config.get("max_entries", 100000),
+            cooldown_config.get("refresh_seconds", 5),
+            cooldown_config.get("evict_seconds", 60),
+        )
+
+    def close(self) -> None:
+        with self._lock:
+            self._db.close()
+
+    def cooling(self, network: str, proof_type: str) -> Set[str]:
+        """
+        Addresses (lowercase) on cooldown, from a snapshot at most refresh_seconds old.
+
+        Returns:
+            Set[str]: Shared snapshot; do not modify
+        """
+        key = (network, proof_type)
+        now = time.time()
+        with self._lock:
+            snapshot = self._snapshots.get(key)
+            if snapshot and now - snapshot[0] < self.refresh_seconds:
+                return snapshot[1]
+            rows = self._db.execute(
+                "SELECT address FROM cooldowns WHERE network = ? AND proof_type = ? AND until > ?",
+                (network, proof_type, now)
+            ).fetchall()
+            addresses = {row[0] for row in rows}
+            self._snapshots[key] = (now, addresses)
+            return addresses
+
+    def claim(self, network: str, proof_type: str, address: str) -> Optional[float]:
+        """
+        Start a prover's cooldown unless it is already cooling, atomically across processes.
+
+        Returns:
+            Optional[float]: Claim time to hand to release() if the challenge is
+            not triggered, None if the prover is cooling
+        """
+        address = address.lower()
+        now = time.time()
+        try:
+            with self._lock, self._db:
+                self._db.execute(
+                    """
+                    INSERT INTO cooldowns (network, proof_type, address, triggered_at, until)
+                    VALUES (?, ?, ?, ?, ?)
+                    ON CONFLICT (network, proof_type, address)
+                    DO UPDATE SET triggered_at = excluded.triggered_at, until = excluded.until
+                    WHERE cooldowns.until <= excluded.triggered_at
+                    """,
+                    (network, proof_type, address, now, now + self.cooldown_seconds)
+                )
+                if not self._db.execute("SELECT changes()").fetchone()[0]:
+                    return None
+                snapshot = self._snapshots.get((network, proof_type))
+                if snapshot:
+                    snapshot[1].add(address)
+                if now - self._evicted_at >= self.evict_seconds:
+                    self._evict(now)
+                return now
+        except sqlite3.Error as e:
+            # Without the cache the run behaves as if it had none
+            self.logger.error(f'Unable to claim cooldown for {address}: {e}')
+            return now
+
+    def release(self, network: str, proof_type: str, address: str, claimed_at: float) -> None:
+        """End a claim whose challenge was never triggered, unless another run has claimed since."""
+        address = address.lower()
+        try:
+            with self._lock, self._db:
+                self._db.execute(
+                    "DELETE FROM cooldowns WHERE network = ? AND proof_type = ? AND address = ? "
+                    "AND triggered_at = ?",
+                    (network, proof_type, address, claimed_at)
+                )
+                snapshot = self._snapshots.get((network, proof_type))
+                if snapshot:
+                    snapshot[1].discard(address)
+        except sqlite3.Error as e:
+            self.logger.error(f'Unable to release cooldown for {address}: {e}')
+
+    def _evict(self, now: float) -> None:
+        self._evicted_at = now
+        self._db.execute("DELETE FROM cooldowns WHERE until <= ?", (now,))
+        excess = self._db.execute("SELECT COUNT(*) FROM cooldowns").fetchone()[0] - self.max_entries
+        if excess > 0:
+            self._db.execute(
+                "DELETE FROM cooldowns WHERE rowid IN "
+                "(SELECT rowid FROM cooldowns ORDER BY triggered_at LIMIT ?)",
+                (excess,)
+            )
@@ -1,7 +1,20 @@
+import threading
 import requests
 from http.cookies import SimpleCookie
+from typing import Callable, Optional
+
+# Responses that mean the session cookie is missing, expired or revoked
+UNAUTHORIZED_STATUS_CODES = (401, 403)
 
 class CustomSession(requests.Session):
+    def __init__(self):
+        super().__init__()
+        # Called on a 401/403 to log in again; returns True when it succeeded
+        self.reauthenticate: Optional[Callable[[], bool]] = None
+        self._auth_lock = threading.Lock()
+        self._auth_generation = 0
+        self._local = threading.local()
+
     def get_cookie_header_value(self, header_value):
         cookies = {}
         if not header_value:
@@ -30,6 +43,31 @@ class CustomSession(requests.Session):
                 self.cookies.set(key, value)
 
     def send(self, request, **kwargs):
+        generation = self._auth_generation
         response = super().send(request, **kwargs)
         self.merge_cookies(response)
-        return response
\ No newline at end of file
+
+        if (response.status_code in UNAUTHORIZED_STATUS_CODES
+                and self.reauthenticate
+                and not getattr(self._local, "authenticating", False)
+                and self._refresh_login(generation)):
+            retry = request.copy()
+            retry.headers.pop('Cookie', None)
+            retry.prepare_cookies(self.cookies)
+            response = super().send(retry, **kwargs)
+            self.merge_cookies(response)
+        return response
+
+    def _refresh_login(self, generation: int) -> bool:
+        """Log in again unless another thread already did since generation."""
+        with self._auth_lock:
+            if generation != self._auth_generation:
+                return True
+            self._local.authenticating = True
+            try:
+                if not self.reauthenticate():
+                    return False
+            finally:
+                self._local.authenticating = False
+            self._auth_generation += 1
+            return True
@@ -0,0 +1,264 @@
+import json
+import sqlite3
+import threading
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import requests
+from eth_utils import event_abi_to_log_topic
+from hexbytes import HexBytes
+from web3._utils.events import get_event_data
+
+from contract_cache import contract_cache
+from logger import Logger
+
+# RequestHandler events the indexer stores
+INDEXED_EVENTS = ("RequestProcessed", "RequestCompleted", "RequestTimeout")
+
+# Request statuses after which its challenges can no longer be triggered
+ENDED_STATUSES = ("completed", "timeout")
+
+# Fragments of provider errors meaning an eth_getLogs range was too large
+RANGE_ERRORS = (
+    "block range",                    # geth/BSC "exceed maximum block range", Alchemy, QuickNode
+    "range is too wide",
+    "range too large",
+    "query returned more than",       # Infura, Nethermind: "query returned more than 10000 results"
+    "response size exceeded",         # Alchemy: "Log response size exceeded"
+    "logs matched by query exceeds",  # geth: "logs matched by query exceeds limit of 10000"
+)
+# ... and fragments of rate limiting, which a smaller range doesn't help with
+RATE_LIMIT_ERRORS = ("rate limit", "too many requests", "request rate", "compute units")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS requests (
+    contract        TEXT NOT NULL,
+    request_id      INTEGER NOT NULL,
+    tx_hash         TEXT,
+    processed_block INTEGER,
+    new_challenges  TEXT,
+    status          TEXT NOT NULL,
+    status_block    INTEGER,
+    PRIMARY KEY (contract, request_id)
+);
+CREATE INDEX IF NOT EXISTS requests_by_tx_hash ON requests (contract, tx_hash);
+CREATE TABLE IF NOT EXISTS checkpoints (
+    contract TEXT PRIMARY KEY,
+    block    INTEGER NOT NULL
+);
+"""
+
+
+def is_range_error(error: Exception) -> bool:
+    if isinstance(error, requests.exceptions.Timeout):
+        return True
+    response = getattr(error, "response", None)
+    if getattr(response, "status_code", None) == 429:
+        return False
+    message = str(error).lower()
+    if any(text in message for text in RATE_LIMIT_ERRORS):
+        return False
+    return any(text in message for text in RANGE_ERRORS)
+
+
+class EventIndexer:
+    """
+    Incremental local index of RequestHandler request events.
+
+    sync() walks eth_getLogs from the stored checkpoint to the latest block
+    minus confirmations. The block range grows while responses are small and
+    halves when the provider rejects it, never growing back past a rejected size.
+    Each range's events and the new checkpoint are committed together, so a
+    restart resumes where the last sync stopped.
+    """
+
+    def __init__(self, connection: Any, abi_file: str, address: str, path: str,
+                 start_block: int = 0, max_block_range: int = 2000,
+                 confirmations: int = 2, target_logs: int = 1000):
+        self.connection = connection
+        self.abi_file = abi_file
+        self.address = connection.to_checksum_address(address)
+        self.contract_key = self.address.lower()
+        self.start_block = start_block
+        self.max_block_range = max_block_range
+        self.confirmations = confirmations
+        self.target_logs = target_logs
+        self.block_range = max_block_range
+        # Largest range not yet rejected by the provider
+        self._range_ceiling = max_block_range
+        self.logger = Logger()
+
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.row_factory = sqlite3.Row
+        with self._lock, self._db:
+            self._db.executescript(SCHEMA)
+        self._events: Optional[Dict[bytes, Dict[str, Any]]] = None
+
+    @classmethod
+    def for_chain_config(cls, connection: Any, chain_config: Dict[str, Any], src_path: str,
+                         index_config: Dict[str, Any]) -> "EventIndexer":
+        return cls(
+            connection,
+            src_path + chain_config["request_handler"]["abi_file_name_with_path"],
+            chain_config["request_handler"]["proxy"],
+            index_config.get("path", "request_events.db"),
+            start_block=chain_config["request_handler"].get("start_block", 0),
+            max_block_range=index_config.get("max_block_range", 2000),
+            confirmations=index_config.get("confirmations", 2),
+        )
+
+    def close(self) -> None:
+        with self._lock:
+            self._db.close()
+
+    def checkpoint(self) -> Optional[int]:
+        """Last block fully indexed, None before the first sync."""
+        with self._lock:
+            row = self._db.execute(
+                "SELECT block FROM checkpoints WHERE contract = ?", (self.contract_key,)
+            ).fetchone()
+        return row["block"] if row else None
+
+    def _topics(self) -> Dict[bytes, Dict[str, Any]]:
+        # topic0 -> event ABI, built once from the cached ABI
+        if self._events is None:
+            self._events = {
+                event_abi_to_log_topic(abi): abi
+                for abi in contract_cache.get_abi(self.abi_file)
+                if abi.get("type") == "event" and abi["name"] in INDEXED_EVENTS
+            }
+        return self._events
+
+    def sync(self, to_block: Optional[int] = None) -> int:
+        """
+        Index events up to to_block (default: latest minus confirmations).
+
+        Returns:
+            int: Number of events stored
+        """
+        if to_block is None:
+            to_block = self.connection.eth.block_number - self.confirmations
+        checkpoint = self.checkpoint()
+        from_block = self.start_block if checkpoint is None else checkpoint + 1
+
+        stored = 0
+        while from_block <= to_block:
+            end_block = min(from_block + self.block_range - 1, to_block)
+            try:
+                logs = self._get_logs(from_block, end_block)
+            except Exception as e:
+                if not is_range_error(e) or end_block == from_block:
+                    raise
+                self._range_ceiling = end_block - from_block
+                self.block_range = max(1, (end_block - from_block + 1) // 2)
+                self.logger.warning(f'eth_getLogs {from_block}-{end_block} rejected, '
+                                    f'retrying with {self.block_range} blocks: {e}')
+                continue
+
+            stored += self._store(logs, end_block)
+            if len(logs) < self.target_logs // 2:
+                self.block_range = min(self._range_ceiling, self.block_range * 2)
+            from_block = end_block + 1
+
+        if stored:
+            self.logger.info(f'Indexed {stored} request events up to block {to_block}')
+        return stored
+
+    def _get_logs(self, from_block: int, to_block: int) -> List[Dict[str, Any]]:
+        return self.connection.eth.get_logs({
+            "address": self.address,
+            "fromBlock": from_block,
+            "toBlock": to_block,
+            "topics": [[HexBytes(topic).hex() for topic in self._topics()]],
+        })
+
+    def _decode(self, log: Dict[str, Any]) -> Optional[Any]:
+        event_abi = self._topics().get(bytes(log["topics"][0])) if log["topics"] else None
+        if event_abi is None:
+            return None
+        return get_event_data(self.connection.codec, event_abi, log)
+
+    def _store(self, logs: Iterable[Dict[str, Any]], checkpoint: int) -> int:
+        processed: List[Tuple] = []
+        finished: List[Tuple] = []
+        for log in logs:
+            event = self._decode(log)
+            if event is None:
+                continue
+            request_id = event["args"]["requestId"]
+            if event["event"] == "RequestProcessed":
+                processed.append((
+                    self.contract_key, request_id, HexBytes(event["transactionHash"]).hex(),
+                    event["blockNumber"], json.dumps(list(event["args"]["newChallenges"]))
+                ))
+            else:
+                status = "completed" if event["event"] == "RequestCompleted" else "timeout"
+                finished.append((self.contract_key, request_id, status, event["blockNumber"]))
+
+        with self._lock, self._db:
+            self._db.executemany(
+                "INSERT INTO requests (contract, request_id, tx_hash, processed_block, new_challenges, status) "
+                "VALUES (?, ?, ?, ?, ?, 'processed') "
+                "ON CONFLICT (contract, request_id) DO UPDATE SET tx_hash = excluded.tx_hash, "
+                "processed_block = excluded.processed_block, new_challenges = excluded.new_challenges",
+                processed
+            )
+            self._db.executemany(
+                "INSERT INTO requests (contract, request_id, status, status_block) VALUES (?, ?, ?, ?) "
+                "ON CONFLICT (contract, request_id) DO UPDATE SET status = excluded.status, "
+                "status_block = excluded.status_block",
+                finished
+            )
+            self._db.execute(
+                "INSERT OR REPLACE INTO checkpoints (contract, block) VALUES (?, ?)",
+                (self.contract_key, checkpoint)
+            )
+        return len(processed) + len(finished)
+
+    def summary(self) -> Dict[str, int]:
+        """Number of indexed requests per status."""
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT status, COUNT(*) AS count FROM requests WHERE contract = ? GROUP BY status",
+                (self.contract_key,)
+            ).fetchall()
+        return {row["status"]: row["count"] for row in rows}
+
+    def request_outcomes(self, request_ids: Iterable[int]) -> Dict[int, str]:
+        """
+        Status of requests: processed, completed or timeout.
+
+        Requests not seen on-chain (yet) are left out.
+        """
+        request_ids = [int(request_id) for request_id in request_ids]
+        outcomes: Dict[int, str] = {}
+        with self._lock:
+            for start in range(0, len(request_ids), 500):
+                chunk = request_ids[start:start + 500]
+                rows = self._db.execute(
+                    f"SELECT request_id, status FROM requests WHERE contract = ? "
+                    f"AND request_id IN ({','.join('?' * len(chunk))})",
+                    [self.contract_key, *chunk]
+                ).fetchall()
+                outcomes.update((row["request_id"], row["status"]) for row in rows)
+        return outcomes
+
+    def transaction_outcomes(self, tx_hashes: Iterable[Any]) -> Dict[str, Tuple[int, str]]:
+        """
+        Request id and status for our submitRequest transactions.
+
+        Returns:
+            Dict[str, Tuple[int, str]]: 0x-prefixed transaction hash to (request id, status)
+        """
+        tx_hashes = [HexBytes(tx_hash).hex() for tx_hash in tx_hashes]
+        outcomes: Dict[str, Tuple[int, str]] = {}
+        with self._lock:
+            for start in range(0, len(tx_hashes), 500):
+                chunk = tx_hashes[start:start + 500]
+                rows = self._db.execute(
+                    f"SELECT tx_hash, request_id, status FROM requests WHERE contract = ? "
+                    f"AND tx_hash IN ({','.join('?' * len(chunk))})",
+                    [self.contract_key, *chunk]
+                ).fetchall()
+                outcomes.update((row["tx_hash"], (row["request_id"], row["status"])) for row in rows)
+        return outcomes
@@ -1,9 +1,71 @@
+import atexit
+import json
 import logging
+import logging.handlers
 import os
+import queue
+import threading
+from datetime import datetime, timezone
+from typing import Any, Dict, Optional
+
+# Attributes every LogRecord has; anything else came in through extra=
+_RECORD_ATTRIBUTES = set(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {"message", "asctime"}
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line: time, level, logger, message and any structured fields."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry: Dict[str, Any] = {
+            "time": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "thread": record.threadName,
+            "message": record.getMessage(),
+        }
+        for key, value in vars(record).items():
+            if key not in _RECORD_ATTRIBUTES:
+                entry[key] = value
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+
+class _DroppingQueueHandler(logging.handlers.QueueHandler):
+    """Enqueue without ever blocking; when the queue is full the record is dropped and counted."""
+
+    dropped = 0
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            _DroppingQueueHandler.dropped += 1
+
+
+class _QueueListener(logging.handlers.QueueListener):
+    def enqueue_sentinel(self) -> None:
+        # Only stop() waits here, for the writer to drain a full queue
+        self.queue.put(self._sentinel)
+
 
 class Logger:
+    """
+    Process-wide logging pipeline.
+
+    Log calls only format the record and put it on a bounded queue; a
+    background QueueListener thread does the file I/O, so hot-path threads
+    never block on disk. Records are written as JSON lines (or the classic
+    text format) to a size- or time-rotated file. Keyword arguments to
+    info/warning/error/debug become structured fields of the record, e.g.
+    challenge_id, prover, state or duration.
+    """
+
     _instance = None
     _logger = None
+    _listener: Optional[logging.handlers.QueueListener] = None
+    _queue_handler: Optional[logging.Handler] = None
+    _lock = threading.Lock()
 
     def __new__(cls, log_path: str = "./", log_name: str = "pox_schedule.log"):
         # Singleton pattern to ensure only one logger instance
@@ -13,43 +75,92 @@ class Logger:
         return cls._instance
 
     @classmethod
-    def _setup_logger(cls, log_path: str, log_name: str) -> None:
+    def _setup_logger(cls, log_path: str, log_name: str, log_format: str = "json",
+                      max_bytes: int = 10 * 1024 * 1024, backup_count: int = 5,
+                      rotate_when: Optional[str] = None, queue_size: int = 50000,
+                      level: str = "INFO") -> None:
         """Set up the logger with specified configuration"""
-        cls._logger = logging.getLogger(__name__)
-        
-        # Configure logging
-        logging.basicConfig(
-            filename=os.path.join(log_path, log_name),
-            filemode='a',
-            level=logging.INFO,
-            format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-            datefmt='%Y-%m-%d %H:%M:%S'
+        filename = os.path.join(log_path, log_name)
+        if rotate_when:
+            file_handler: logging.Handler = logging.handlers.TimedRotatingFileHandler(
+                filename, when=rotate_when, backupCount=backup_count, encoding="utf-8", delay=True)
+        else:
+            file_handler = logging.handlers.RotatingFileHandler(
+                filename, maxBytes=max_bytes, backupCount=backup_count, encoding="utf-8", delay=True)
+        if log_format == "json":
+            file_handler.setFormatter(JsonFormatter())
+        else:
+            file_handler.setFormatter(logging.Formatter(
+                '%(asctime)s - %(name)s - %(levelname)s - %(message)s', datefmt='%Y-%m-%d %H:%M:%S'))
+
+        with cls._lock:
+            root = logging.getLogger()
+            if cls._listener:
+                cls._listener.stop()
+                root.removeHandler(cls._queue_handler)
+
+            log_queue: queue.Queue = queue.Queue(maxsize=queue_size)
+            cls._queue_handler = _DroppingQueueHandler(log_queue)
+            cls._listener = _QueueListener(log_queue, file_handler, respect_handler_level=True)
+            cls._listener.start()
+            root.addHandler(cls._queue_handler)
+            root.setLevel(level)
+            cls._logger = logging.getLogger(__name__)
+
+    @classmethod
+    def configure(cls, logging_config: Dict[str, Any]) -> None:
+        """Rebuild the pipeline from the "logging" section of the config file."""
+        cls()
+        cls._setup_logger(
+            logging_config.get("path", "./"),
+            logging_config.get("file", "pox_schedule.log"),
+            log_format=logging_config.get("format", "json"),
+            max_bytes=logging_config.get("max_bytes", 10 * 1024 * 1024),
+            backup_count=logging_config.get("backup_count", 5),
+            rotate_when=logging_config.get("rotate_when"),
+            queue_size=logging_config.get("queue_size", 50000),
+            level=logging_config.get("level", "INFO"),
         )
 
     @classmethod
-    def info(cls, message: str) -> None:
+    def shutdown(cls) -> None:
+        """Flush queued records to disk and stop the background writer."""
+        with cls._lock:
+            if not cls._listener:
+                return
+            if _DroppingQueueHandler.dropped:
+                cls._logger.warning(f'Dropped {_DroppingQueueHandler.dropped} log records; queue was full')
+            cls._listener.stop()
+            cls._listener = None
+            logging.getLogger().removeHandler(cls._queue_handler)
+
+    @classmethod
+    def info(cls, message: str, **fields: Any) -> None:
         """Log info level message"""
         if cls._logger is None:
             cls._setup_logger("./", "pox_schedule.log")
-        cls._logger.info(message)
+        cls._logger.info(message, extra=fields)
 
     @classmethod
-    def error(cls, message: str) -> None:
+    def error(cls, message: str, **fields: Any) -> None:
         """Log error level message"""
         if cls._logger is None:
             cls._setup_logger("./", "pox_schedule.log")
-        cls._logger.error(message)
+        cls._logger.error(message, extra=fields)
 
     @classmethod
-    def warning(cls, message: str) -> None:
+    def warning(cls, message: str, **fields: Any) -> None:
         """Log warning level message"""
         if cls._logger is None:
             cls._setup_logger("./", "pox_schedule.log")
-        cls._logger.warning(message)
+        cls._logger.warning(message, extra=fields)
 
     @classmethod
-    def debug(cls, message: str) -> None:
+    def debug(cls, message: str, **fields: Any) -> None:
         """Log debug level message"""
         if cls._logger is None:
             cls._setup_logger("./", "pox_schedule.log")
-        cls._logger.debug(message)
\ No newline at end of file
+        cls._logger.debug(message, extra=fields)
+
+
+atexit.register(Logger.shutdown)
@@ -0,0 +1,422 @@
+import bisect
+import os
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+
+from logger import Logger
+
+# Seconds; spans fast API calls up to slow block confirmations
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# How a gauge combines values from several processes in MetricsRegistry.merge:
+# summed (additive gauges such as in-flight counts), the highest, or the most
+# recently updated one (state such as health or a balance)
+SUM = "sum"
+MAX = "max"
+LATEST = "latest"
+MERGE_MODES = (SUM, MAX, LATEST)
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+class _Metric:
+    TYPE = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        self._children: Dict[Tuple[str, ...], object] = {}
+
+    def labels(self, *values: object):
+        if len(values) != len(self.labelnames):
+            raise ValueError(f"{self.name} expects labels {self.labelnames}, got {values}")
+        key = tuple(str(value) for value in values)
+        with self._lock:
+            child = self._children.get(key)
+            if child is None:
+                child = self._children[key] = self._new_child()
+            return child
+
+    def _new_child(self):
+        raise NotImplementedError
+
+    def _default(self):
+        return self.labels()
+
+    def snapshot(self) -> Dict[Tuple[str, ...], object]:
+        with self._lock:
+            children = list(self._children.items())
+        return {key: child.snapshot() for key, child in children}
+
+    def merge(self, values: Dict[Tuple[str, ...], object]) -> None:
+        for key, value in values.items():
+            self.labels(*key).merge(value)
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.TYPE}"]
+        with self._lock:
+            children = list(self._children.items())
+        for key, child in children:
+            lines.extend(child.render(self.name, self.labelnames, key))
+        return lines
+
+
+class _Value:
+    __slots__ = ("_lock", "value")
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.value = 0.0
+
+    def inc(self, amount: float = 1) -> None:
+        with self._lock:
+            self.value += amount
+
+    def dec(self, amount: float = 1) -> None:
+        with self._lock:
+            self.value -= amount
+
+    def set(self, value: float) -> None:
+        with self._lock:
+            self.value = value
+
+    def snapshot(self) -> float:
+        return self.value
+
+    def merge(self, value: float) -> None:
+        self.inc(value)
+
+    def render(self, name: str, labelnames: Sequence[str], key: Tuple[str, ...]) -> List[str]:
+        return [f"{name}{_format_labels(labelnames, key)} {_format_value(self.value)}"]
+
+
+class _GaugeValue(_Value):
+    __slots__ = ("mode", "updated")
+
+    def __init__(self, mode: str):
+        super().__init__()
+        self.mode = mode
+        # Wall-clock time of the last update, comparable across processes; None until then
+        self.updated: Optional[float] = None
+
+    def inc(self, amount: float = 1) -> None:
+        with self._lock:
+            self.value += amount
+            self.updated = time.time()
+
+    def dec(self, amount: float = 1) -> None:
+        self.inc(-amount)
+
+    def set(self, value: float) -> None:
+        with self._lock:
+            self.value = value
+            self.updated = time.time()
+
+    def snapshot(self) -> Tuple[float, Optional[float]]:
+        with self._lock:
+            return self.value, self.updated
+
+    def merge(self, value: Tuple[float, Optional[float]]) -> None:
+        value, updated = value
+        if updated is None:
+            return
+        with self._lock:
+            if self.mode == SUM:
+                self.value += value
+            elif self.updated is None:
+                self.value = value
+            elif self.mode == MAX:
+                self.value = max(self.value, value)
+            elif updated >= self.updated:
+                self.value = value
+            else:
+                return
+            self.updated = max(updated, self.updated or updated)
+
+
+class _HistogramValue:
+    __slots__ = ("_lock", "buckets", "counts", "sum")
+
+    def __init__(self, buckets: Sequence[float]):
+        self._lock = threading.Lock()
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+
+    def observe(self, value: float) -> None:
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            self.counts[index] += 1
+            self.sum += value
+
+    def snapshot(self) -> Tuple[List[int], float]:
+        with self._lock:
+            return list(self.counts), self.sum
+
+    def merge(self, value: Tuple[List[int], float]) -> None:
+        counts, total = value
+        with self._lock:
+            for index, count in enumerate(counts):
+                self.counts[index] += count
+            self.sum += total
+
+    @contextmanager
+    def time(self) -> Iterator[None]:
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started)
+
+    def render(self, name: str, labelnames: Sequence[str], key: Tuple[str, ...]) -> List[str]:
+        with self._lock:
+            counts, total = list(self.counts), self.sum
+        lines, cumulative = [], 0
+        for bound, count in zip(list(self.buckets) + [float("inf")], counts):
+            cumulative += count
+            le = f'le="{_format_value(bound)}"'
+            lines.append(f"{name}_bucket{_format_labels(labelnames, key, le)} {cumulative}")
+        lines.append(f"{name}_sum{_format_labels(labelnames, key)} {_format_value(total)}")
+        lines.append(f"{name}_count{_format_labels(labelnames, key)} {cumulative}")
+        return lines
+
+
+class Counter(_Metric):
+    TYPE = "counter"
+
+    def _new_child(self) -> _Value:
+        return _Value()
+
+    def inc(self, amount: float = 1) -> None:
+        self._default().inc(amount)
+
+
+class Gauge(_Metric):
+    TYPE = "gauge"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 merge: str = SUM):
+        if merge not in MERGE_MODES:
+            raise ValueError(f"Unknown merge mode {merge!r} for {name}, expected one of {MERGE_MODES}")
+        super().__init__(name, documentation, labelnames)
+        self.merge_mode = merge
+
+    def _new_child(self) -> _GaugeValue:
+        return _GaugeValue(self.merge_mode)
+
+    def inc(self, amount: float = 1) -> None:
+        self._default().inc(amount)
+
+    def dec(self, amount: float = 1) -> None:
+        self._default().dec(amount)
+
+    def set(self, value: float) -> None:
+        self._default().set(value)
+
+
+class Histogram(_Metric):
+    TYPE = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def _new_child(self) -> _HistogramValue:
+        return _HistogramValue(self.buckets)
+
+    def observe(self, value: float) -> None:
+        self._default().observe(value)
+
+
+class MetricsRegistry:
+    """
+    In-process metrics rendered in the Prometheus text exposition format.
+
+    Metrics are cheap to update from any thread. They can be scraped from a
+    local HTTP port (serve) and/or written periodically to a textfile for the
+    node_exporter textfile collector (write_textfile_every).
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._metrics: Dict[str, _Metric] = {}
+        self._server: Optional[ThreadingHTTPServer] = None
+        self._textfile_stop: Optional[threading.Event] = None
+        self.logger = Logger()
+
+    def _register(self, metric: _Metric) -> _Metric:
+        with self._lock:
+            if metric.name in self._metrics:
+                raise ValueError(f"Metric {metric.name} is already registered")
+            self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self._register(Counter(name, documentation, labelnames))
+
+    def gauge(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+              merge: str = SUM) -> Gauge:
+        return self._register(Gauge(name, documentation, labelnames, merge))
+
+    def histogram(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                  buckets: Sequence[float] = DEFAULT_BUCKETS) -> Histogram:
+        return self._register(Histogram(name, documentation, labelnames, buckets))
+
+    def render(self) -> str:
+        with self._lock:
+            metrics = list(self._metrics.values())
+        lines: List[str] = []
+        for metric in metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+    def snapshot(self) -> Dict[str, Dict[Tuple[str, ...], object]]:
+        """Picklable values of every metric, for merge() in another process."""
+        with self._lock:
+            metrics = list(self._metrics.values())
+        return {metric.name: metric.snapshot() for metric in metrics}
+
+    def merge(self, snapshot: Dict[str, Dict[Tuple[str, ...], object]]) -> None:
+        """
+        Add a snapshot taken in another process (e.g. a shard worker) to these metrics.
+
+        Counters and histograms are summed; gauges follow their merge mode.
+        """
+        with self._lock:
+            metrics = dict(self._metrics)
+        for name, values in snapshot.items():
+            if name in metrics:
+                metrics[name].merge(values)
+
+    def serve(self, port: int, address: str = "127.0.0.1") -> None:
+        """Expose /metrics over HTTP from a daemon thread."""
+        registry = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                body = registry.render().encode()
+                self.send_response(200)
+                self.send_header("Content-Type", CONTENT_TYPE)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        self._server = ThreadingHTTPServer((address, port), Handler)
+        threading.Thread(target=self._server.serve_forever, name="metrics-http", daemon=True).start()
+        self.logger.info(f'Serving metrics on http://{address}:{self._server.server_port}/metrics')
+
+    def write_textfile(self, path: str) -> None:
+        """Atomically replace path with the current metrics."""
+        directory = os.path.dirname(os.path.abspath(path))
+        fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".metrics-")
+        try:
+            with os.fdopen(fd, "w") as file:
+                file.write(self.render())
+            os.chmod(tmp_path, 0o644)
+            os.replace(tmp_path, path)
+        except Exception:
+            os.unlink(tmp_path)
+            raise
+
+    def write_textfile_every(self, path: str, interval_seconds: float = 15) -> None:
+        """Rewrite the textfile from a daemon thread until stop() is called."""
+        stop = self._textfile_stop = threading.Event()
+
+        def run():
+            while not stop.wait(interval_seconds):
+                try:
+                    self.write_textfile(path)
+                except Exception as e:
+                    self.logger.warning(f'Unable to write metrics to {path}: {e}')
+
+        threading.Thread(target=run, name="metrics-textfile", daemon=True).start()
+
+    def stop(self, textfile: Optional[str] = None) -> None:
+        """Stop exporting, writing the textfile one last time if given."""
+        if self._textfile_stop:
+            self._textfile_stop.set()
+        if textfile:
+            self.write_textfile(textfile)
+        if self._server:
+            self._server.shutdown()
+            self._server = None
+
+
+registry = MetricsRegistry()
+
+API_REQUEST_SECONDS = registry.histogram(
+    "pox_api_request_seconds", "Latency of proof API calls", ["endpoint"])
+API_ERRORS = registry.counter(
+    "pox_api_errors_total", "Proof API calls that failed, by HTTP status or exception", ["endpoint", "reason"])
+API_RETRIES = registry.counter(
+    "pox_api_retries_total", "Proof API calls retried after a network error or 5xx", ["endpoint", "reason"])
+API_THROTTLED = registry.counter(
+    "pox_api_throttled_total", "Proof API calls answered with 429 and retried after Retry-After", ["endpoint"])
+API_RATE_LIMIT_WAIT_SECONDS = registry.histogram(
+    "pox_api_rate_limit_wait_seconds", "Time calls waited for the client-side rate limiter", ["endpoint"],
+    buckets=(0, 0.01, 0.05, 0.1, 0.5, 1, 5, 10, 30, 60, 300))
+CHALLENGES_TRIGGERED = registry.counter(
+    "pox_challenges_triggered_total", "Challenges accepted by challenge-request", ["proof_type"])
+CHALLENGES_TRIGGER_FAILED = registry.counter(
+    "pox_challenges_trigger_failed_total", "Challenge requests the API rejected or that errored", ["proof_type"])
+CHALLENGES_ENDED = registry.counter(
+    "pox_challenges_ended_total", "Challenges no longer polled, by final state", ["proof_type", "state"])
+CHALLENGES_IN_FLIGHT = registry.gauge(
+    "pox_challenges_in_flight", "Challenges triggered and still being polled", ["proof_type"])
+CHALLENGE_DURATION_SECONDS = registry.histogram(
+    "pox_challenge_duration_seconds", "Time from trigger to final state", ["proof_type"],
+    buckets=(5, 10, 30, 60, 120, 300, 600, 900, 1800, 3600))
+TRANSACTION_RECEIPT_SECONDS = registry.histogram(
+    "pox_transaction_receipt_seconds", "Time from sending a transaction to its receipt", ["status"])
+PAYER_PENDING_TRANSACTIONS = registry.gauge(
+    "pox_payer_pending_transactions", "Transactions sent from a payer account and awaiting their receipt", ["account"])
+PAYER_HEALTHY = registry.gauge(
+    "pox_payer_healthy", "1 while a payer account is funded and its transactions are being mined", ["account"],
+    merge=LATEST)
+PAYER_BALANCE_WEI = registry.gauge(
+    "pox_payer_balance_wei", "Balance of a payer account at its last health check", ["account"],
+    merge=LATEST)
+
+
+def start_exporters(metrics_config: Dict, port: Optional[int] = None,
+                    textfile: Optional[str] = None) -> Optional[str]:
+    """
+    Start the exporters requested on the command line or in the metrics config.
+
+    Returns:
+        Optional[str]: Textfile path to hand to registry.stop() on exit
+    """
+    port = port if port is not None else metrics_config.get("port")
+    textfile = textfile or metrics_config.get("textfile")
+    if port is not None:
+        registry.serve(port, metrics_config.get("address", "127.0.0.1"))
+    if textfile:
+        registry.write_textfile_every(textfile, metrics_config.get("textfile_interval_seconds", 15))
+    return textfile
@@ -0,0 +1,96 @@
+import heapq
+import threading
+from typing import Any, Dict, List, Optional, Tuple
+
+from logger import Logger
+
+# JSON-RPC errors meaning our local nonce is behind the node's view of the account
+STALE_NONCE_ERRORS = ("nonce too low", "replacement transaction underpriced")
+# JSON-RPC errors meaning the node already holds this exact signed transaction
+ALREADY_KNOWN_ERRORS = ("already known", "known transaction")
+
+
+def is_stale_nonce_error(error: Exception) -> bool:
+    message = str(error).lower()
+    return any(text in message for text in STALE_NONCE_ERRORS)
+
+
+def is_already_known_error(error: Exception) -> bool:
+    message = str(error).lower()
+    return any(text in message for text in ALREADY_KNOWN_ERRORS)
+
+
+class NonceManager:
+    """
+    Hands out transaction nonces for one account without an RPC call per transaction.
+
+    The first reservation reads the pending transaction count; after that nonces
+    are assigned locally so signed transactions can be sent back-to-back.
+    Nonces whose transaction never reached the node are released and reused
+    first so they don't leave a gap that blocks every later transaction.
+    Reads go through the connection of the latest for_account caller, so the
+    manager follows the RPC pool's best endpoint rather than its first one.
+    """
+
+    _instances: Dict[Tuple[int, str], "NonceManager"] = {}
+    _instances_lock = threading.Lock()
+
+    def __init__(self, connection: Any, address: str):
+        self.connection = connection
+        self.address = address
+        self.logger = Logger()
+        self._lock = threading.Lock()
+        self._next: Optional[int] = None
+        self._released: List[int] = []
+        self.pending = 0
+
+    @classmethod
+    def for_account(cls, connection: Any, chain_id: int, address: str) -> "NonceManager":
+        """Process-wide nonce manager for an account, shared by all transaction managers."""
+        key = (chain_id, address.lower())
+        with cls._instances_lock:
+            manager = cls._instances.get(key)
+            if manager is None:
+                manager = cls._instances[key] = cls(connection, address)
+            else:
+                manager.connection = connection
+            return manager
+
+    def reserve(self) -> int:
+        with self._lock:
+            if self._released:
+                nonce = heapq.heappop(self._released)
+            else:
+                if self._next is None:
+                    self._next = self._chain_nonce()
+                nonce = self._next
+                self._next += 1
+            self.pending += 1
+            return nonce
+
+    def release(self, nonce: int) -> None:
+        """Return a nonce whose transaction was never accepted by the node."""
+        with self._lock:
+            self.pending -= 1
+            if self._next is not None and nonce == self._next - 1:
+                self._next -= 1
+            elif self._next is not None and nonce < self._next:
+                heapq.heappush(self._released, nonce)
+
+    def finish(self, nonce: int) -> None:
+        """Mark a nonce's transaction as done: mined, dropped or superseded."""
+        with self._lock:
+            self.pending = max(0, self.pending - 1)
+
+    def resync(self) -> int:
+        """Drop local state and restart from the node's pending transaction count."""
+        with self._lock:
+            chain_nonce = self._chain_nonce()
+            self.logger.warning(f'Resyncing nonce for {self.address}: local {self._next}, chain {chain_nonce}')
+            self._next = chain_nonce
+            self._released = [n for n in self._released if n >= chain_nonce]
+            heapq.heapify(self._released)
+            return chain_nonce
+
+    def _chain_nonce(self) -> int:
+        return self.connection.eth.get_transaction_count(self.address, 'pending')
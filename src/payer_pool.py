@@ -0,0 +1,218 @@
+import os
+import re
+import threading
+import time
+from typing import Any, Dict, List, Optional
+
+from chain import get_web3_account
+from nonce_manager import NonceManager
+from metrics import PAYER_BALANCE_WEI, PAYER_HEALTHY, PAYER_PENDING_TRANSACTIONS
+from logger import Logger
+
+# Extra payer keys, separated by commas or whitespace
+PAYER_KEYS_ENV = "PAYER_PRIVATE_KEYS"
+
+LEAST_PENDING = "least_pending"
+ROUND_ROBIN = "round_robin"
+STRATEGIES = (LEAST_PENDING, ROUND_ROBIN)
+
+
+class NoHealthyPayerError(RuntimeError):
+    """Raised when every payer account is short of funds or has stuck transactions."""
+
+
+def _split_keys(value: Optional[str]) -> List[str]:
+    return [key for key in re.split(r"[\s,]+", value or "") if key]
+
+
+def load_private_keys(private_key: Optional[str] = None, keyfile: Optional[str] = None,
+                      environ: Optional[Dict[str, str]] = None) -> List[str]:
+    """
+    Collect payer private keys from the command line, a keyfile and the environment.
+
+    Args:
+        private_key: One or more keys separated by commas (--private_key)
+        keyfile: File with one key per line; blank lines and # comments are skipped
+        environ: Environment to read PAYER_PRIVATE_KEYS from (default: os.environ)
+
+    Returns:
+        List[str]: Keys in that order without duplicates; the first one is the primary payer
+    """
+    environ = os.environ if environ is None else environ
+    keys = _split_keys(private_key)
+    if keyfile:
+        with open(keyfile) as f:
+            for line in f:
+                keys.extend(_split_keys(line.split("#", 1)[0]))
+    keys.extend(_split_keys(environ.get(PAYER_KEYS_ENV)))
+    if not keys:
+        raise ValueError(f"No payer private key given (--private_key, keyfile or ${PAYER_KEYS_ENV})")
+    return list(dict.fromkeys(keys))
+
+
+class _Payer:
+    __slots__ = ("account", "pending", "healthy", "reason", "balance",
+                 "confirmed_nonce", "progress_at", "checked_at")
+
+    def __init__(self, account: Any):
+        self.account = account
+        # Transactions acquired for this account whose receipt hasn't resolved
+        self.pending = 0
+        self.healthy = True
+        self.reason: Optional[str] = None
+        self.balance: Optional[int] = None
+        self.confirmed_nonce: Optional[int] = None
+        self.progress_at = time.monotonic()
+        self.checked_at = float("-inf")
+
+
+class PayerPool:
+    """
+    Several payer accounts that submitRequest transactions are spread across.
+
+    Each account has its own nonce sequence (NonceManager.for_account), so
+    transactions from different accounts don't queue behind each other and
+    on-chain submission scales with the number of accounts. acquire() picks the
+    healthy account with the fewest pending transactions (least_pending) or the
+    next one in turn (round_robin); release() is called once the transaction's
+    receipt resolves or its submission fails.
+
+    Every health_check_seconds an account's balance and confirmed nonce are read
+    from the node. An account is skipped while its balance is below
+    min_balance_wei, or while it has pending transactions and its confirmed
+    nonce hasn't moved for stuck_seconds; a stuck account's nonce manager is
+    resynced so a dropped transaction's nonce is reused. The first account is
+    the primary one, used to log in to the API.
+    """
+
+    def __init__(self, accounts: List[Any], chain_config: Dict[str, Any],
+                 strategy: str = LEAST_PENDING, min_balance_wei: int = 0,
+                 stuck_seconds: float = 300, health_check_seconds: float = 30):
+        if not accounts:
+            raise ValueError("A payer pool needs at least one account")
+        if strategy not in STRATEGIES:
+            raise ValueError(f"Unknown payer strategy {strategy!r}, expected one of {STRATEGIES}")
+        self.chain_id = chain_config.get("chain_id")
+        self.strategy = strategy
+        self.min_balance_wei = int(min_balance_wei)
+        self.stuck_seconds = stuck_seconds
+        self.health_check_seconds = health_check_seconds
+        self.logger = Logger()
+        self._lock = threading.Lock()
+        self._payers = [_Payer(account) for account in accounts]
+        self._by_address = {payer.account.address.lower(): payer for payer in self._payers}
+        self._turn = 0
+
+    @classmethod
+    def from_config(cls, private_keys: List[str], chain_config: Dict[str, Any],
+                    payers_config: Dict[str, Any]) -> "PayerPool":
+        """Build the pool from loaded keys and the settings under "payers"."""
+        return cls(
+            [get_web3_account(key) for key in private_keys],
+            chain_config,
+            payers_config.get("strategy", LEAST_PENDING),
+            payers_config.get("min_balance_wei", 0),
+            payers_config.get("stuck_seconds", 300),
+            payers_config.get("health_check_seconds", 30),
+        )
+
+    @property
+    def primary(self) -> Any:
+        return self._payers[0].account
+
+    def __len__(self) -> int:
+        return len(self._payers)
+
+    def acquire(self, connection: Any) -> Any:
+        """
+        Pick the account the next transaction is sent from and count it as pending.
+
+        Args:
+            connection: RPC connection used for due health checks
+
+        Returns:
+            Any: Web3 account; hand it back with release()
+        """
+        self._check_due(connection)
+        with self._lock:
+            healthy = [payer for payer in self._payers if payer.healthy]
+            if not healthy:
+                raise NoHealthyPayerError(
+                    "No healthy payer account: " + ", ".join(
+                        f'{payer.account.address} ({payer.reason})' for payer in self._payers))
+            start = self._turn % len(healthy)
+            self._turn += 1
+            if self.strategy == ROUND_ROBIN:
+                payer = healthy[start]
+            else:
+                # Rotating the start spreads ties instead of always filling the first account
+                payer = min(healthy[start:] + healthy[:start], key=lambda p: p.pending)
+            payer.pending += 1
+            PAYER_PENDING_TRANSACTIONS.labels(payer.account.address).set(payer.pending)
+            return payer.account
+
+    def release(self, account: Any) -> None:
+        """Mark a transaction from account as done: mined, reverted, dropped or never sent."""
+        with self._lock:
+            payer = self._by_address.get(account.address.lower())
+            if payer is None:
+                return
+            payer.pending = max(0, payer.pending - 1)
+            PAYER_PENDING_TRANSACTIONS.labels(payer.account.address).set(payer.pending)
+
+    def _check_due(self, connection: Any) -> None:
+        now = time.monotonic()
+        with self._lock:
+            due = [payer for payer in self._payers
+                   if now - payer.checked_at >= self.health_check_seconds]
+            # Claimed under the lock so concurrent acquirers don't check the same account
+            for payer in due:
+                payer.checked_at = now
+        for payer in due:
+            self.check(connection, payer)
+
+    def check(self, connection: Any, payer: _Payer) -> None:
+        """Read an account's balance and confirmed nonce and update its health."""
+        address = payer.account.address
+        try:
+            balance = connection.eth.get_balance(address)
+            confirmed_nonce = connection.eth.get_transaction_count(address, "latest")
+        except Exception as e:
+            self.logger.warning(f'Health check of payer {address} failed: {e}')
+            return
+
+        now = time.monotonic()
+        with self._lock:
+            payer.balance = balance
+            if confirmed_nonce != payer.confirmed_nonce or payer.pending == 0:
+                payer.confirmed_nonce = confirmed_nonce
+                payer.progress_at = now
+            if balance < self.min_balance_wei:
+                reason = "low balance"
+            elif payer.pending and now - payer.progress_at >= self.stuck_seconds:
+                reason = "stuck"
+            else:
+                reason = None
+            was_healthy, payer.healthy, payer.reason = payer.healthy, reason is None, reason
+            pending = payer.pending
+
+        PAYER_BALANCE_WEI.labels(address).set(balance)
+        PAYER_HEALTHY.labels(address).set(1 if reason is None else 0)
+        if reason == "stuck" and was_healthy:
+            self.logger.warning(f'Payer {address} has {pending} pending transactions and no confirmed '
+                                f'nonce change in {self.stuck_seconds}s, pausing it',
+                                payer=address, pending=pending, confirmed_nonce=confirmed_nonce)
+            if self.chain_id is not None:
+                NonceManager.for_account(connection, self.chain_id, address).resync()
+        elif reason and was_healthy:
+            self.logger.warning(f'Payer {address} balance {balance} is below {self.min_balance_wei}, pausing it',
+                                payer=address, balance=balance)
+        elif reason is None and not was_healthy:
+            self.logger.info(f'Payer {address} is healthy again', payer=address)
+
+    def status(self) -> List[Dict[str, Any]]:
+        """Pending transactions and health of every account, primary first."""
+        with self._lock:
+            return [{"address": payer.account.address, "pending": payer.pending,
+                     "healthy": payer.healthy, "reason": payer.reason, "balance": payer.balance}
+                    for payer in self._payers]
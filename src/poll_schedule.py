@@ -0,0 +1,161 @@
+import bisect
+import json
+import os
+import random
+import tempfile
+import threading
+from collections import deque
+from typing import Any, Deque, Dict, Hashable, Iterable, List, Optional, Tuple
+
+from logger import Logger
+
+# Completion quantiles we aim polls at once enough samples have been seen
+POLL_QUANTILES = (0.1, 0.25, 0.5, 0.75, 0.9, 0.95, 0.99)
+
+
+class AdaptivePollSchedule:
+    """
+    Picks the next status poll for a challenge from observed challenge durations.
+
+    Completion times are kept per (proof_type, challenge_type) key, and per key
+    and state for the challenges that went through that state. With enough
+    completions, polls are aimed at the next completion quantile after the time
+    already elapsed, taken from the challenges that were in the same state as
+    the one polled when there are enough of those; otherwise (and past the
+    slowest quantile) the delay grows exponentially from min_seconds. Every
+    delay is jittered, capped at max_seconds and cut off at deadline_seconds.
+    """
+
+    def __init__(self, min_seconds: float, max_seconds: float, deadline_seconds: float,
+                 backoff: float = 2.0, jitter: float = 0.2, min_samples: int = 5,
+                 max_samples: int = 500, stats_file: Optional[str] = None):
+        self.min_seconds = min_seconds
+        self.max_seconds = max(max_seconds, min_seconds)
+        self.deadline_seconds = deadline_seconds
+        self.backoff = backoff
+        self.jitter = jitter
+        self.min_samples = min_samples
+        self.max_samples = max_samples
+        self.stats_file = stats_file
+        self.logger = Logger()
+
+        self._lock = threading.Lock()
+        self._completions: Dict[str, Deque[float]] = {}
+        self._state_completions: Dict[Tuple[str, str], Deque[float]] = {}
+        self._sorted_completions: Dict[Hashable, List[float]] = {}
+        self.load()
+
+    @classmethod
+    def from_api_config(cls, api_config: Dict[str, Any]) -> "AdaptivePollSchedule":
+        poll_seconds = api_config["poll_seconds"]
+        return cls(
+            min_seconds=api_config.get("poll_min_seconds", poll_seconds),
+            max_seconds=api_config.get("poll_max_seconds", poll_seconds),
+            deadline_seconds=api_config.get("poll_deadline_seconds",
+                                            poll_seconds * api_config["retries"]),
+            backoff=api_config.get("poll_backoff", 2.0),
+            jitter=api_config.get("poll_jitter", 0.2),
+            stats_file=api_config.get("poll_stats_file"),
+        )
+
+    @staticmethod
+    def key(proof_type: str, challenge_type: Optional[str] = None) -> str:
+        return f'{proof_type}/{challenge_type}' if challenge_type else proof_type
+
+    def record_completion(self, key: str, elapsed: float, states: Iterable[str] = ()) -> None:
+        """Record the time a challenge took to reach an end state, and the states it went through."""
+        with self._lock:
+            self._add(self._completions, key, elapsed)
+            for state in states:
+                self._add(self._state_completions, (key, state), elapsed)
+
+    def _add(self, table: Dict[Any, Deque[float]], key: Hashable, elapsed: float) -> None:
+        table.setdefault(key, deque(maxlen=self.max_samples)).append(elapsed)
+        self._sorted_completions.pop(key, None)
+
+    def next_delay(self, key: str, elapsed: float, attempt: int,
+                   state: Optional[str] = None) -> Optional[float]:
+        """
+        Seconds to wait before the next status poll.
+
+        Args:
+            key: Schedule key from AdaptivePollSchedule.key
+            elapsed: Seconds since the challenge was triggered
+            attempt: Number of polls made so far
+            state: Last state reported for the challenge (optional)
+
+        Returns:
+            Optional[float]: Delay in seconds, None once the deadline has passed
+        """
+        remaining = self.deadline_seconds - elapsed
+        if remaining <= 0:
+            return None
+
+        delay = None
+        if state:
+            delay = self._quantile_delay(self._state_completions, (key, state), elapsed)
+        if delay is None:
+            delay = self._quantile_delay(self._completions, key, elapsed)
+        if delay is None:
+            delay = self.min_seconds * (self.backoff ** attempt)
+
+        delay = min(max(delay, self.min_seconds), self.max_seconds)
+        if self.jitter:
+            delay *= random.uniform(1 - self.jitter, 1 + self.jitter)
+        return min(delay, remaining)
+
+    def _quantile_delay(self, table: Dict[Any, Deque[float]], key: Hashable,
+                        elapsed: float) -> Optional[float]:
+        with self._lock:
+            completions = self._sorted_completions.get(key)
+            if completions is None:
+                samples = table.get(key, ())
+                if len(samples) < self.min_samples:
+                    return None
+                completions = self._sorted_completions[key] = sorted(samples)
+
+        for quantile in POLL_QUANTILES:
+            target = completions[min(int(quantile * len(completions)), len(completions) - 1)]
+            if target > elapsed:
+                return target - elapsed
+        return None
+
+    def load(self) -> None:
+        if not self.stats_file or not os.path.exists(self.stats_file):
+            return
+        try:
+            with open(self.stats_file, 'r') as file:
+                stats = json.load(file)
+            with self._lock:
+                for key, samples in stats.get("completions", {}).items():
+                    self._completions[key] = deque(samples, maxlen=self.max_samples)
+                for key, states in stats.get("state_completions", {}).items():
+                    for state, samples in states.items():
+                        self._state_completions[(key, state)] = deque(samples, maxlen=self.max_samples)
+        except (OSError, ValueError) as e:
+            self.logger.warning(f'Ignoring unreadable poll stats {self.stats_file}: {e}')
+
+    def save(self) -> None:
+        if not self.stats_file:
+            return
+        with self._lock:
+            states: Dict[str, Dict[str, List[float]]] = {}
+            for (key, state), samples in self._state_completions.items():
+                states.setdefault(key, {})[state] = list(samples)
+            stats = {
+                "completions": {key: list(samples) for key, samples in self._completions.items()},
+                "state_completions": states,
+            }
+        tmp_file = None
+        try:
+            # A temp file per writer, so processes saving at the same time don't clobber each other
+            directory, name = os.path.split(os.path.abspath(self.stats_file))
+            with tempfile.NamedTemporaryFile('w', dir=directory, prefix=name + ".",
+                                             suffix=".tmp", delete=False) as file:
+                tmp_file = file.name
+                json.dump(stats, file)
+            os.replace(tmp_file, self.stats_file)
+        except OSError as e:
+            self.logger.warning(f'Unable to save poll stats to {self.stats_file}: {e}')
+            if tmp_file and os.path.exists(tmp_file):
+                os.remove(tmp_file)
@@ -0,0 +1,185 @@
+import json
+import sqlite3
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, Iterable, Iterator, List, Optional
+
+from logger import Logger
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS provers (
+    network      TEXT NOT NULL,
+    proof_type   TEXT NOT NULL,
+    address      TEXT NOT NULL,
+    ip_family    TEXT NOT NULL,
+    project_name TEXT NOT NULL,
+    last_alive   REAL,
+    data         TEXT NOT NULL,
+    synced_at    REAL NOT NULL,
+    PRIMARY KEY (network, proof_type, ip_family, address)
+);
+CREATE INDEX IF NOT EXISTS provers_by_address ON provers (network, proof_type, address);
+CREATE INDEX IF NOT EXISTS provers_by_ip_family ON provers (network, proof_type, ip_family);
+CREATE INDEX IF NOT EXISTS provers_by_project ON provers (network, proof_type, project_name);
+CREATE INDEX IF NOT EXISTS provers_by_last_alive ON provers (network, proof_type, last_alive);
+CREATE TABLE IF NOT EXISTS sync_state (
+    network    TEXT NOT NULL,
+    proof_type TEXT NOT NULL,
+    synced_at  REAL NOT NULL,
+    PRIMARY KEY (network, proof_type)
+);
+"""
+
+
+def parse_last_alive(last_alive: Optional[str]) -> Optional[float]:
+    """Convert an API last_alive timestamp to epoch seconds."""
+    if not last_alive:
+        return None
+    date_obj = datetime.fromisoformat(last_alive.replace('Z', '+00:00'))
+    if date_obj.tzinfo is None:
+        date_obj = date_obj.astimezone()
+    return date_obj.timestamp()
+
+
+class ProverCatalog:
+    """
+    Local SQLite copy of the prover list, indexed for selection queries.
+
+    Rows are upserted from the API as pages arrive; a sync only happens when
+    the last one is older than sync_interval_seconds, and rows not seen in a
+    completed sync are dropped.
+
+    The sync is not incremental: the provers API pages by skip/limit only and
+    has no updated-since filter or cursor, so each sync downloads the full list
+    again. Between syncs, selection (and a single known prover, refreshed with
+    one /prover call) is answered from the catalog without any download.
+    """
+
+    def __init__(self, path: str, sync_interval_seconds: int = 300):
+        self.path = path
+        self.sync_interval_seconds = sync_interval_seconds
+        self.logger = Logger()
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.row_factory = sqlite3.Row
+        with self._lock, self._db:
+            self._db.executescript(SCHEMA)
+
+    def close(self) -> None:
+        with self._lock:
+            self._db.close()
+
+    def last_synced(self, network: str, proof_type: str) -> Optional[float]:
+        with self._lock:
+            row = self._db.execute(
+                "SELECT synced_at FROM sync_state WHERE network = ? AND proof_type = ?",
+                (network, proof_type)
+            ).fetchone()
+        return row["synced_at"] if row else None
+
+    def is_stale(self, network: str, proof_type: str) -> bool:
+        synced_at = self.last_synced(network, proof_type)
+        return synced_at is None or time.time() - synced_at > self.sync_interval_seconds
+
+    def upsert(self, network: str, proof_type: str, provers: Iterable[Dict[str, Any]],
+               synced_at: Optional[float] = None) -> int:
+        """
+        Insert or refresh provers.
+
+        Malformed provers (no IPv4/IPv6-prefixed id, a last_alive that isn't a
+        timestamp, ...) are logged and skipped, so one bad row never fails a sync.
+
+        Returns:
+            int: Number of provers written
+        """
+        synced_at = synced_at or time.time()
+        rows = []
+        for prover in provers:
+            try:
+                ip_family, address = prover["id"].split("/", 1)
+                rows.append((
+                    network, proof_type, address.lower(), ip_family,
+                    (prover.get("projectName") or "").lower(),
+                    parse_last_alive(prover.get("last_alive")),
+                    json.dumps(prover), synced_at
+                ))
+            except (KeyError, TypeError, ValueError, AttributeError) as e:
+                self.logger.error(f'Skipping malformed prover {prover!r} in the {proof_type} catalog: {e!r}')
+        with self._lock, self._db:
+            self._db.executemany(
+                "INSERT OR REPLACE INTO provers "
+                "(network, proof_type, address, ip_family, project_name, last_alive, data, synced_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                rows
+            )
+        return len(rows)
+
+    def sync(self, network: str, proof_type: str,
+             provers: Iterable[Dict[str, Any]]) -> Iterator[Dict[str, Any]]:
+        """
+        Store provers streamed from the API, passing each one through.
+
+        Rows missing from the stream are removed once it is fully consumed, so
+        an interrupted sync only ever adds or refreshes rows. The whole list is
+        streamed every time; see the class docstring.
+        """
+        started = time.time()
+        batch: List[Dict[str, Any]] = []
+        for prover in provers:
+            batch.append(prover)
+            if len(batch) >= 500:
+                self.upsert(network, proof_type, batch, started)
+                batch = []
+            yield prover
+        self.upsert(network, proof_type, batch, started)
+
+        with self._lock, self._db:
+            self._db.execute(
+                "DELETE FROM provers WHERE network = ? AND proof_type = ? AND synced_at < ?",
+                (network, proof_type, started)
+            )
+            self._db.execute(
+                "INSERT OR REPLACE INTO sync_state (network, proof_type, synced_at) VALUES (?, ?, ?)",
+                (network, proof_type, started)
+            )
+        self.logger.info(f'Synced {proof_type} prover catalog for {network}')
+
+    def select(self, network: str, proof_type: str,
+               address: Optional[str] = None,
+               project_name: Optional[str] = None,
+               ip_family: Optional[str] = None,
+               alive_within_minutes: Optional[int] = None) -> List[Dict[str, Any]]:
+        """
+        Query provers, e.g. alive within N minutes in project X.
+
+        Args:
+            network: Network the provers were synced from
+            proof_type: Type of proof (pol/pob)
+            address: Prover address (optional)
+            project_name: Project name or project name prefix (optional)
+            ip_family: IPv4 or IPv6 (optional)
+            alive_within_minutes: Only provers alive within this window (optional)
+
+        Returns:
+            List of prover dictionaries as returned by the API
+        """
+        query = "SELECT data FROM provers WHERE network = ? AND proof_type = ?"
+        params: List[Any] = [network, proof_type]
+        if address:
+            query += " AND address = ?"
+            params.append(address.lower())
+        if project_name:
+            query += " AND project_name >= ? AND project_name < ?"
+            params += [project_name.lower(), project_name.lower() + "\uffff"]
+        if ip_family:
+            query += " AND ip_family = ?"
+            params.append(ip_family)
+        if alive_within_minutes:
+            cutoff = datetime.now(timezone.utc) - timedelta(minutes=alive_within_minutes)
+            query += " AND last_alive > ?"
+            params.append(cutoff.timestamp())
+
+        with self._lock:
+            rows = self._db.execute(query, params).fetchall()
+        return [json.loads(row["data"]) for row in rows]
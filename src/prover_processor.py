@@ -1,22 +1,68 @@
-from typing import Dict, List, Any, Optional, Tuple
+import threading
+from concurrent.futures import Future
+from itertools import islice
+from typing import Dict, List, Any, Iterable, Iterator, Optional, Set, Tuple
 import requests
+from hexbytes import HexBytes
 
 from logger import Logger
+from tracing import tracer
 from challenge_handler import ChallengeHandler
-from challenge import PoBChallenge
+from challenge_poller import ChallengePoller
+from challenge_journal import ChallengeJournal, ABANDONED, REQUESTED, SUBMITTED
+from cooldown_cache import CooldownCache
+from payer_pool import PayerPool
+from challenge import BaseChallenge, PoBChallenge
 from challenge_factory import ChallengeFactory
+from chain_connector import ChainConnector
+from event_indexer import ENDED_STATUSES, EventIndexer
 from api import is_alive_yet
+from prover_selection import select_provers
+
+
+class TransactionUnconfirmed(RuntimeError):
+    """A request transaction was sent but its receipt couldn't be collected; resume picks it up."""
+
+
+def all_of(futures: List[Future]) -> Optional[Future]:
+    """A future resolved with every result once all futures are done, None for no futures."""
+    if len(futures) <= 1:
+        return futures[0] if futures else None
+    combined: Future = Future()
+    remaining = [len(futures)]
+    lock = threading.Lock()
+    def on_done(_: Future) -> None:
+        with lock:
+            remaining[0] -= 1
+            if remaining[0]:
+                return
+        combined.set_result([future.result() for future in futures])
+    for future in futures:
+        future.add_done_callback(on_done)
+    return combined
 
 class ProverProcessor:
     def __init__(self, session: requests.Session, api_config: Dict[str, Any],
                  chain_config: Dict[str, Any], proof_config: Dict[str, Any],
-                 src_path: str):
+                 src_path: str, poller: Optional[ChallengePoller] = None,
+                 chain_connector: Optional[ChainConnector] = None,
+                 journal: Optional[ChallengeJournal] = None,
+                 cooldowns: Optional[CooldownCache] = None,
+                 payers: Optional[PayerPool] = None,
+                 indexer: Optional[EventIndexer] = None):
         self.session = session
         self.api_config = api_config
         self.chain_config = chain_config
         self.proof_config = proof_config
         self.src_path = src_path
-        self.challenge_handler = ChallengeHandler(session, api_config)
+        self.chain_connector = chain_connector
+        self.journal = journal
+        self.cooldowns = cooldowns
+        self.payers = payers
+        self.indexer = indexer
+        self._challenges: Dict[str, BaseChallenge] = {}
+        self._challenges_lock = threading.Lock()
+        self.challenge_handler = ChallengeHandler(session, api_config, poller, journal)
         self.logger = Logger()
 
     def should_run_for_prover(self, prover: Dict[str, Any], prover_id: str,
@@ -85,15 +131,80 @@ class ProverProcessor:
                 self.logger.info(f'Prover {prover_id} is not alive within the required time window')
                 return False
 
+            # Check if prover was challenged recently by this or another run
+            if (self.cooldowns and kwargs.get('network')
+                    and prover_id.lower() in self.cooldowns.cooling(kwargs['network'], proof_type)):
+                self.logger.info(f'Prover {prover_id} is on cooldown')
+                return False
+
             return True
 
         except KeyError as e:
-            self.logger.error(f'Missing required key in prover data: {e}')
+            self.logger.error(f'Skipping prover {prover_id}, missing required key in prover data: {e}',
+                              prover=prover_id)
             return False
         except Exception as e:
-            self.logger.error(f'Error validating prover {prover_id}: {e}')
+            self.logger.error(f'Skipping prover {prover_id}, error validating it: {e}', prover=prover_id)
             return False
 
+    def _validate_row(self, proof_type: str, prover: Any, **kwargs) -> bool:
+        """_validate_prover for a row that may not even carry a usable id."""
+        try:
+            prover_id = prover["id"].split("/")[-1]
+        except (KeyError, IndexError, TypeError, AttributeError) as e:
+            self.logger.error(f'Skipping prover without a valid id: {prover!r} ({e!r})')
+            return False
+        return self._validate_prover(proof_type, prover, prover_id, **kwargs)
+
+    def iter_selected(self, proof_type: str, provers: Iterable[Dict], batch_size: int = 1000,
+                      **kwargs) -> Iterator[Dict]:
+        """
+        Batch selection stage: yield the provers _validate_prover would accept.
+
+        Provers are taken in batches of batch_size and the project, prover-id and
+        alive-window checks run over each batch at once (see select_provers).
+        Provers on cooldown are left out.
+
+        Args:
+            proof_type: Type of proof (pol/pob)
+            provers: Provers to select from, consumed lazily
+            batch_size: Number of provers evaluated per batch
+            **kwargs: Additional arguments including project_name and prover_to_challenge
+
+        Returns:
+            Iterator over the selected provers
+        """
+        if proof_type not in ['pol', 'pob']:
+            self.logger.info(f'Invalid proof type: {proof_type}')
+            return
+
+        provers = iter(provers)
+        while True:
+            batch = list(islice(provers, batch_size))
+            if not batch:
+                return
+            try:
+                decisions = select_provers(
+                    batch,
+                    self.proof_config["alive_check_minutes"],
+                    kwargs.get('project_name'),
+                    kwargs.get('prover_to_challenge')
+                )
+            except (KeyError, IndexError, AttributeError, TypeError, ValueError) as e:
+                # A malformed row (a missing id, a last_alive that isn't a timestamp)
+                # only costs that prover, never the rest of the sweep
+                self.logger.error(f'Malformed prover data, validating one by one: {e}')
+                decisions = [self._validate_row(proof_type, prover, **kwargs) for prover in batch]
+
+            selected = [prover for prover, decision in zip(batch, decisions) if decision]
+            if self.cooldowns and kwargs.get('network'):
+                cooling = self.cooldowns.cooling(kwargs['network'], proof_type)
+                if cooling:
+                    selected = [prover for prover in selected
+                                if prover["id"].split("/")[1].lower() not in cooling]
+            self.logger.info(f'Selected {len(selected)} of {len(batch)} provers')
+            yield from selected
+
     def _prepare_challenge_params(self, proof_type: str, prover: Dict, is_ipv6: bool, **kwargs) -> Dict:
         """
         Prepare challenge parameters based on proof type.
@@ -131,7 +242,8 @@ class ProverProcessor:
             }
 
     def _handle_challenge(self, proof_type: str, prover: Dict, challenge_id: str,
-                         request_id: str, **kwargs) -> None:
+                         request_id: str, journal_entry: Optional[str] = None,
+                         **kwargs) -> Optional[Future]:
         """
         Handle a specific challenge for a prover.
 
@@ -140,59 +252,358 @@ class ProverProcessor:
             prover: Prover information dictionary
             challenge_id: Unique challenge identifier
             request_id: Request identifier
+            journal_entry: Journal entry of this challenge (optional)
             **kwargs: Additional parameters
+
+        Returns:
+            Optional[Future]: Resolved with the final challenge state, None if not triggered
         """
         self.logger.info(
             f'Triggering {proof_type} challenge for Prover: {prover["id"]} '
-            f'last alive at {prover["last_alive"]} with challenge_id: {challenge_id} '
+            f'last alive at {prover.get("last_alive")} with challenge_id: {challenge_id} '
             f'and on-chain Request ID: {request_id}'
         )
 
-        challenge_type = (PoBChallenge.CHALLENGE_TYPES[kwargs.get('bandwidth_challenge_type', 0)]
-                         if proof_type == 'pob' else None)
+        challenge_type = self._challenge_type(proof_type, **kwargs)
 
-        self.challenge_handler.handle_challenge(
+        return self.challenge_handler.handle_challenge(
             proof_type=proof_type,
             challenge_id=challenge_id,
             prover_id=prover["id"],
             request_id=request_id,
-            poll_seconds=self.api_config["poll_seconds"],
             challenge_type=challenge_type,
-            challenger_count = kwargs.get('challenger_count', 1)
+            challenger_count = kwargs.get('challenger_count', 1),
+            journal_entry=journal_entry
         )
 
-    def process_prover(self, proof_type: str, prover: Dict, **kwargs) -> None:
-        try:
-            prover_id = prover["id"].split("/")[1]
-            is_ipv6 = prover["id"].split("/")[0] == "IPv6"
+    def _get_challenge(self, proof_type: str) -> BaseChallenge:
+        with self._challenges_lock:
+            if proof_type not in self._challenges:
+                self._challenges[proof_type] = ChallengeFactory.create_challenge(
+                    proof_type,
+                    self.chain_config,
+                    self.proof_config,
+                    self.src_path,
+                    self.chain_connector,
+                    self.payers
+                )
+            return self._challenges[proof_type]
 
-            if not self._validate_prover(proof_type, prover, prover_id, **kwargs):
-                return
+    def _request_on_chain(self, proof_type: str, prover: Dict, prover_id: str, is_ipv6: bool,
+                          journal_entry: Optional[str] = None, **kwargs) -> Optional[Future]:
+        """
+        Send a submitRequest for a prover and trigger the challenges it created.
 
-            '''
-            challenge = ChallengeFactory.create_challenge(
-                proof_type,
-                self.chain_config,
-                self.proof_config,
-                self.src_path
-            )
+        Args:
+            proof_type: Type of proof (pol/pob)
+            prover: Prover information dictionary
+            prover_id: Prover's address
+            is_ipv6: Whether the prover is reached over IPv6
+            journal_entry: Journal entry of this challenge (optional)
+            **kwargs: Run arguments, including the paying account
+
+        Returns:
+            Optional[Future]: Resolved once every created challenge has ended,
+            None if the transaction reverted or nothing was triggered
+        """
+        challenge = self._get_challenge(proof_type)
+        challenge_params = self._prepare_challenge_params(proof_type, prover, is_ipv6, **kwargs)
+        sent: List[str] = []
+
+        def on_sent(tx_hash: str) -> None:
+            # Journaled before the receipt is awaited: after a crash, resume reads the
+            # request back from this transaction instead of paying for a new one
+            sent.append(tx_hash)
+            if journal_entry:
+                self.journal.record(journal_entry, SUBMITTED, tx_hash=tx_hash)
 
-            challenge_params = self._prepare_challenge_params(proof_type, prover, is_ipv6, **kwargs)
+        try:
             receipt, contract = challenge.prepare_and_submit_request(
                 kwargs['account'],
-                challenge.encode_challenge(prover_id, **challenge_params)
+                challenge.encode_challenge(prover_id, **challenge_params),
+                on_sent
             )
-            
+        except Exception as e:
+            if sent:
+                raise TransactionUnconfirmed(f'No receipt for transaction {sent[0]}: {e}') from e
+            raise
 
-            if receipt.get("status") != 1:
-                self.logger.error(f'Challenge for Prover: {prover_id} failed. '
-                                f'Txn Hash: {receipt["transactionHash"]}')
-                return
+        tx_hash = HexBytes(receipt["transactionHash"]).hex()
+        if receipt.get("status") != 1:
+            self.logger.error(f'Challenge for Prover: {prover_id} failed. '
+                            f'Txn Hash: {tx_hash}')
+            if journal_entry:
+                self.journal.record(journal_entry, ABANDONED, state="REVERTED")
+            return None
+
+        request_id, challenges = challenge.process_logs(receipt, contract)
+        return self._trigger_requested(proof_type, prover, request_id, challenges, journal_entry, **kwargs)
+
+    def _trigger_requested(self, proof_type: str, prover: Dict, request_id: int,
+                           challenge_ids: List[int], journal_entry: Optional[str] = None,
+                           **kwargs) -> Optional[Future]:
+        """
+        Trigger the challenges an on-chain request created for a prover.
+
+        The first challenge is journaled under journal_entry; any further ones
+        get entries of their own.
+
+        Returns:
+            Optional[Future]: Resolved once every triggered challenge has ended, None if none was
+        """
+        challenge_ids = [challenge_id for challenge_id in challenge_ids if challenge_id]
+        if not challenge_ids:
+            self.logger.error(f'Request {request_id} created no challenges for Prover: {prover["id"]}')
+            if journal_entry:
+                self.journal.record(journal_entry, ABANDONED, state="NO_CHALLENGES")
+            return None
 
-            request_id, challenges = challenge.process_logs(receipt, contract)
-            '''
+        futures = []
+        for index, challenge_id in enumerate(challenge_ids):
+            entry = journal_entry
+            if index and journal_entry:
+                entry = self.journal.open_entry(kwargs.get('network'), proof_type, prover["id"],
+                                                self._challenge_type(proof_type, **kwargs),
+                                                kwargs.get('challenger_count'))
+            if entry:
+                self.journal.record(entry, REQUESTED, request_id=str(request_id),
+                                    challenge_id=str(challenge_id))
+            future = self._handle_challenge(proof_type, prover, challenge_id, request_id, entry, **kwargs)
+            if future:
+                futures.append(future)
+        return all_of(futures)
+
+    def resume_submitted(self, proof_type: str, entry: Dict[str, Any], **kwargs) -> Optional[Future]:
+        """
+        Finish a journaled challenge whose submitRequest was sent but never seen processed.
+
+        The request and challenge ids are read back from the journaled
+        transaction (find_request) and the challenges triggered, so the prover
+        is not paid for twice. A reverted or dropped transaction abandons the
+        entry; one still pending leaves it for a later run. With an event
+        index, a request it has seen complete or time out is abandoned too,
+        without triggering challenges that can no longer run.
+
+        Args:
+            proof_type: Type of proof (pol/pob)
+            entry: Entry from ChallengeJournal.unfinished, with a tx_hash
+            **kwargs: Run arguments (network, ...)
+
+        Returns:
+            Optional[Future]: Resolved once every triggered challenge has ended, None if none was
+        """
+        entry_id, prover_id, tx_hash = entry["entry_id"], entry["prover"], entry["tx_hash"]
+        indexed = (self.indexer.transaction_outcomes([tx_hash]).get(HexBytes(tx_hash).hex())
+                   if self.indexer else None)
+        if indexed and indexed[1] in ENDED_STATUSES:
+            state = indexed[1].upper()
+        else:
+            state, request_id, challenge_ids = self._get_challenge(proof_type).find_request(
+                tx_hash, prover_id.split("/")[-1])
+            if state is None and self.indexer:
+                ended = self.indexer.request_outcomes([request_id]).get(request_id)
+                state = ended.upper() if ended in ENDED_STATUSES else None
+        if state == "PENDING":
+            self.logger.info(f'Journaled transaction {tx_hash} for Prover {prover_id} is not mined yet',
+                             tx_hash=tx_hash, prover=prover_id)
+            return None
+        if state:
+            self.logger.warning(f'Journaled transaction {tx_hash} for Prover {prover_id}: {state}',
+                                tx_hash=tx_hash, prover=prover_id, state=state)
+            self.journal.record(entry_id, ABANDONED, state=state)
+            return None
+
+        self.logger.info(f'Recovered request {request_id} from journaled transaction {tx_hash} '
+                         f'for Prover {prover_id}', tx_hash=tx_hash, request_id=request_id, prover=prover_id)
+        challenge_types = {name: code for code, name in PoBChallenge.CHALLENGE_TYPES.items()}
+        return self._trigger_requested(
+            proof_type, {"id": prover_id}, request_id, challenge_ids, entry_id,
+            **{**kwargs,
+               "challenger_count": entry.get("challenger_count") or kwargs.get("challenger_count"),
+               "bandwidth_challenge_type": challenge_types.get(entry.get("challenge_type"), 0)}
+        )
 
-            self._handle_challenge(proof_type, prover, None, None, **kwargs)
+    @staticmethod
+    def _challenge_type(proof_type: str, **kwargs) -> Optional[str]:
+        return (PoBChallenge.CHALLENGE_TYPES[kwargs.get('bandwidth_challenge_type', 0)]
+                if proof_type == 'pob' else None)
 
+    def process_prover(self, proof_type: str, prover: Dict, **kwargs) -> Optional[Future]:
+        with tracer.span("process_prover", prover=prover.get("id"), proof_type=proof_type):
+            return self._process_prover(proof_type, prover, **kwargs)
+
+    def _admit(self, proof_type: str, prover: Dict, prover_id: str, **kwargs) -> Optional[float]:
+        """
+        Last checks before a prover is challenged: validation unless pre-selected,
+        then an atomic cooldown claim.
+
+        Returns:
+            Optional[float]: Cooldown claim to release if the challenge isn't
+            triggered (0 without a cooldown cache), None to skip the prover
+        """
+        if (not kwargs.get('selected')
+                and not self._validate_prover(proof_type, prover, prover_id, **kwargs)):
+            return None
+
+        if not (self.cooldowns and kwargs.get('network')):
+            return 0
+        claimed_at = self.cooldowns.claim(kwargs['network'], proof_type, prover_id)
+        if claimed_at is None:
+            self.logger.info(f'Prover {prover_id} was challenged by another run, skipping')
+        return claimed_at
+
+    def _release(self, proof_type: str, prover_id: str, claimed_at: Optional[float], **kwargs) -> None:
+        if claimed_at:
+            self.cooldowns.release(kwargs['network'], proof_type, prover_id, claimed_at)
+
+    def _open_entry(self, proof_type: str, prover: Dict, **kwargs) -> Optional[str]:
+        if not self.journal:
+            return None
+        return self.journal.open_entry(kwargs.get('network'), proof_type, prover["id"],
+                                       self._challenge_type(proof_type, **kwargs),
+                                       kwargs.get('challenger_count'))
+
+    def _process_prover(self, proof_type: str, prover: Dict, **kwargs) -> Optional[Future]:
+        journal_entry = None
+        claimed_at = None
+        try:
+            prover_id = prover["id"].split("/")[1]
+            is_ipv6 = prover["id"].split("/")[0] == "IPv6"
+
+            claimed_at = self._admit(proof_type, prover, prover_id, **kwargs)
+            if claimed_at is None:
+                return None
+
+            journal_entry = self._open_entry(proof_type, prover, **kwargs)
+
+            if self.chain_config.get("submit_on_chain"):
+                future = self._request_on_chain(proof_type, prover, prover_id, is_ipv6,
+                                                journal_entry, **kwargs)
+            else:
+                future = self._handle_challenge(proof_type, prover, None, None, journal_entry, **kwargs)
+            if not future:
+                self._release(proof_type, prover_id, claimed_at, **kwargs)
+            return future
+
+        except TransactionUnconfirmed as e:
+            # The request may still be mined; the entry and cooldown stay for resume
+            self.logger.error(f'Leaving challenge for Prover {prover["id"]} to be resumed: {e}')
+            return None
         except Exception as e:
             self.logger.error(f"Error processing prover {prover}: {e}")
+            if journal_entry:
+                self.journal.record(journal_entry, ABANDONED, state="ERROR")
+            self._release(proof_type, prover["id"].split("/")[-1], claimed_at, **kwargs)
+            return None
+
+    def process_batch(self, proof_type: str, provers: List[Dict], **kwargs) -> Optional[Future]:
+        """
+        Request challenges for many provers in as few submitRequest transactions as gas_limit allows.
+
+        The admitted provers' challenges are encoded together and sent with
+        submit_batch. Each receipt's newChallenges are mapped back to the
+        provers of its transaction (process_logs(provers=...)) and triggered.
+
+        Args:
+            proof_type: Type of proof (pol/pob)
+            provers: Provers to challenge
+            **kwargs: Run arguments, including the paying account
+
+        Returns:
+            Optional[Future]: Resolved once every triggered challenge has ended, None if none was
+        """
+        with tracer.span("process_batch", provers=len(provers), proof_type=proof_type):
+            return self._process_batch(proof_type, provers, **kwargs)
+
+    def _process_batch(self, proof_type: str, provers: List[Dict], **kwargs) -> Optional[Future]:
+        admitted: Dict[str, Dict] = {}
+        entries: Dict[str, Optional[str]] = {}
+        claims: Dict[str, float] = {}
+        submitted: Set[str] = set()
+        try:
+            challenge = self._get_challenge(proof_type)
+            challenges = []
+            for prover in provers:
+                claimed_at = None
+                try:
+                    prover_id = prover["id"].split("/")[1]
+                    claimed_at = self._admit(proof_type, prover, prover_id, **kwargs)
+                    if claimed_at is None:
+                        continue
+                    is_ipv6 = prover["id"].split("/")[0] == "IPv6"
+                    challenges.append((prover_id, self._prepare_challenge_params(proof_type, prover, is_ipv6,
+                                                                                 **kwargs)))
+                except Exception as e:
+                    self.logger.error(f"Error processing prover {prover}: {e}")
+                    self._release(proof_type, prover["id"].split("/")[-1], claimed_at, **kwargs)
+                    continue
+                claims[prover["id"]] = claimed_at
+                admitted[prover["id"]] = prover
+                entries[prover["id"]] = self._open_entry(proof_type, prover, **kwargs)
+            if not admitted:
+                return None
+
+            def on_sent(tx_hash: str, keys: List[str]) -> None:
+                # Journaled before the receipt is awaited, so resume can read the request back
+                submitted.update(keys)
+                if self.journal:
+                    for key in keys:
+                        self.journal.record(entries[key], SUBMITTED, tx_hash=tx_hash)
+
+            sent = challenge.submit_batch(kwargs['account'],
+                                          list(zip(admitted, challenge.encode_challenges(challenges))),
+                                          on_sent)
+        except Exception as e:
+            self.logger.error(f"Error processing batch of {len(provers)} provers: {e}")
+            self._abandon(entries, entries, "ERROR")
+            self._release_all(proof_type, claims, claims, **kwargs)
+            return None
+
+        futures = []
+        for tx_future, batch in sent:
+            try:
+                receipt, contract = tx_future.result()
+            except Exception as e:
+                if submitted.issuperset(batch):
+                    # The request may still be mined; the entries and cooldowns stay for resume
+                    self.logger.error(f'No receipt for the batched request of {len(batch)} provers, '
+                                      f'leaving it to be resumed: {e}')
+                    continue
+                self.logger.error(f'Batched request for {len(batch)} provers failed: {e}')
+                self._abandon(entries, batch, "ERROR")
+                self._release_all(proof_type, claims, batch, **kwargs)
+                continue
+
+            tx_hash = HexBytes(receipt["transactionHash"]).hex()
+            if receipt.get("status") != 1:
+                self.logger.error(f'Batched request for {len(batch)} provers failed. Txn Hash: {tx_hash}')
+                self._abandon(entries, batch, "REVERTED")
+                self._release_all(proof_type, claims, batch, **kwargs)
+                continue
+
+            request_id, challenge_ids = challenge.process_logs(receipt, contract, provers=batch)
+            for key in batch:
+                prover = admitted[key]
+                try:
+                    future = self._trigger_requested(proof_type, prover, request_id,
+                                                     challenge_ids.get(key, []), entries[key], **kwargs)
+                except Exception as e:
+                    self.logger.error(f"Error processing prover {prover}: {e}")
+                    self._abandon(entries, [key], "ERROR")
+                    future = None
+                if future:
+                    futures.append(future)
+                else:
+                    self._release_all(proof_type, claims, [key], **kwargs)
+        return all_of(futures)
+
+    def _release_all(self, proof_type: str, claims: Dict[str, float], keys: Iterable[str], **kwargs) -> None:
+        for key in list(keys):
+            self._release(proof_type, key.split("/")[1], claims.get(key), **kwargs)
+
+    def _abandon(self, entries: Dict[str, Optional[str]], keys: Iterable[str], state: str) -> None:
+        if not self.journal:
+            return
+        for key in keys:
+            if entries.get(key):
+                self.journal.record(entries[key], ABANDONED, state=state)
@@ -0,0 +1,138 @@
+import hashlib
+import time
+from typing import Any, Dict, List, Optional, Sequence
+
+try:
+    import numpy as np
+except ImportError:  # selection falls back to the per-prover checks
+    np = None
+
+from api import is_alive_yet
+from prover_catalog import parse_last_alive
+
+
+class ProverColumns:
+    """
+    Columnar view of a prover list for batch selection.
+
+    Project names are interned: each distinct name is lowercased and matched
+    once, and provers carry an integer code into that table. Addresses and
+    last_alive (parsed into a datetime64[us] UTC array, NaT when missing) are
+    only built for the rows a predicate still needs.
+    """
+
+    def __init__(self, provers: Sequence[Dict[str, Any]]):
+        self.provers = provers
+        self.size = len(provers)
+        interned: Dict[Optional[str], int] = {}
+        self.project_codes = np.fromiter(
+            (interned.setdefault(p.get("projectName"), len(interned)) for p in provers),
+            dtype=np.int64, count=self.size
+        )
+        self.projects = list(interned)
+
+    def project_mask(self, prefix: str):
+        prefix = prefix.lower()
+        matches = np.array([name is not None and name.lower().startswith(prefix)
+                            for name in self.projects], dtype=bool)
+        return matches[self.project_codes]
+
+    def address_mask(self, address: str):
+        address = address.lower()
+        return np.fromiter((p["id"].split("/")[1].lower() == address for p in self.provers),
+                           dtype=bool, count=self.size)
+
+    def last_alive(self, rows):
+        """Parsed last_alive for the given row indices."""
+        values = [self.provers[i].get("last_alive") for i in rows]
+        parsed = np.full(len(values), np.datetime64("NaT"), dtype="datetime64[us]")
+        utc_index = [i for i, v in enumerate(values) if v and v[-1] == "Z"]
+        try:
+            parsed[utc_index] = np.array([values[i][:-1] for i in utc_index], dtype="datetime64[us]")
+            scalar_index = [i for i, v in enumerate(values) if v and v[-1] != "Z"]
+        except ValueError:
+            scalar_index = [i for i, v in enumerate(values) if v]
+
+        # Offsets and naive (local time) stamps are rare; parse them one by one
+        for i in scalar_index:
+            try:
+                parsed[i] = np.datetime64(int(parse_last_alive(values[i]) * 1_000_000), "us")
+            except ValueError:
+                pass
+        return parsed
+
+
+def select_provers(provers: Sequence[Dict[str, Any]],
+                   alive_check_minutes: int,
+                   project_name: Optional[str] = None,
+                   prover_to_challenge: Optional[str] = None,
+                   now: Optional[float] = None) -> List[bool]:
+    """
+    Decide which provers to challenge, matching ProverProcessor.should_run_for_prover
+    combined with api.is_alive_yet, in one vectorized pass.
+
+    Args:
+        provers: Prover dictionaries as returned by the API
+        alive_check_minutes: Window in which the prover must have been alive
+        project_name: Project name (or prefix) to filter by (optional)
+        prover_to_challenge: Specific prover to challenge or 'all' (optional)
+        now: Epoch seconds to evaluate liveness at (default: current time)
+
+    Returns:
+        List[bool]: One decision per prover
+    """
+    if not provers:
+        return []
+    if np is None:
+        return _select_provers_scalar(provers, alive_check_minutes, project_name, prover_to_challenge)
+
+    columns = ProverColumns(provers)
+
+    if project_name:
+        mask = columns.project_mask(project_name)
+    elif prover_to_challenge and prover_to_challenge.lower() == 'all':
+        mask = np.ones(columns.size, dtype=bool)
+    elif prover_to_challenge:
+        mask = columns.address_mask(prover_to_challenge)
+    else:
+        return [False] * columns.size
+
+    rows = np.flatnonzero(mask)
+    now_us = np.datetime64(int((time.time() if now is None else now) * 1_000_000), "us")
+    window = np.timedelta64(int(alive_check_minutes * 60 * 1_000_000), "us")
+    last_alive = columns.last_alive(rows)
+    mask[rows] = ~np.isnat(last_alive) & ((now_us - last_alive) < window)
+    return mask.tolist()
+
+
+def _select_provers_scalar(provers: Sequence[Dict[str, Any]],
+                           alive_check_minutes: int,
+                           project_name: Optional[str],
+                           prover_to_challenge: Optional[str]) -> List[bool]:
+    decisions = []
+    for prover in provers:
+        prover_id = prover["id"].split("/")[1]
+        if project_name:
+            name = prover.get("projectName")
+            selected = name is not None and name.lower().startswith(project_name.lower())
+        elif prover_to_challenge:
+            selected = prover_to_challenge.lower() in ('all', prover_id.lower())
+        else:
+            selected = False
+        try:
+            decisions.append(selected and is_alive_yet(prover.get("last_alive"), alive_check_minutes))
+        except ValueError:
+            decisions.append(False)
+    return decisions
+
+
+def shard_of(prover_id: str, shards: int) -> int:
+    """
+    Stable shard index for a prover, from a hash of its address.
+
+    The same prover lands on the same shard in every run and every process,
+    whatever its IP family prefix or address case.
+    """
+    address = prover_id.rsplit("/", 1)[-1].lower()
+    digest = hashlib.blake2b(address.encode(), digest_size=8).digest()
+    return int.from_bytes(digest, "big") % shards
@@ -0,0 +1,148 @@
+import threading
+import time
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from typing import Any, Dict, Optional, Tuple
+from urllib.parse import urlsplit
+
+from logger import Logger
+
+# Pause used when a 429 comes without a usable Retry-After header
+DEFAULT_RETRY_AFTER_SECONDS = 5.0
+MAX_RETRY_AFTER_SECONDS = 300.0
+
+
+def endpoint_key(url: str) -> Tuple[str, str]:
+    """(host, endpoint) of an API URL: its netloc and last path segment."""
+    parts = urlsplit(url)
+    return parts.netloc, parts.path.rsplit("/", 1)[-1]
+
+
+def parse_retry_after(value: Optional[str], default: float = DEFAULT_RETRY_AFTER_SECONDS) -> float:
+    """Seconds to wait from a Retry-After header (delay-seconds or HTTP-date)."""
+    if not value:
+        return default
+    try:
+        seconds = float(value)
+    except ValueError:
+        try:
+            retry_at = parsedate_to_datetime(value)
+        except (TypeError, ValueError):
+            return default
+        if retry_at.tzinfo is None:
+            retry_at = retry_at.replace(tzinfo=timezone.utc)
+        seconds = (retry_at - datetime.now(timezone.utc)).total_seconds()
+    return min(max(seconds, 0.0), MAX_RETRY_AFTER_SECONDS)
+
+
+class TokenBucket:
+    """
+    Token bucket that queues callers instead of rejecting them.
+
+    Each acquire() reserves the next free slot under a lock and sleeps until
+    it, so waiting threads are served in arrival order at rate_per_second after
+    an initial burst. A burst of 0 holds even the first call for one interval.
+    Without a rate the bucket only enforces pauses.
+    """
+
+    def __init__(self, rate_per_second: Optional[float] = None, burst: int = 1):
+        self.interval = 1.0 / rate_per_second if rate_per_second else 0.0
+        self.burst = max(0, int(burst))
+        self._lock = threading.Lock()
+        self._next_slot = time.monotonic()
+        self._paused_until = 0.0
+
+    def acquire(self) -> float:
+        """
+        Wait for a token.
+
+        Returns:
+            float: Seconds spent waiting
+        """
+        waited = 0.0
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                start = max(now, self._paused_until)
+                self._next_slot = max(self._next_slot, start)
+                ready_at = max(start, self._next_slot - (self.burst - 1) * self.interval)
+                self._next_slot += self.interval
+            delay = ready_at - now
+            if delay > 0:
+                time.sleep(delay)
+                waited += delay
+            # A pause that started while we slept sends us back to the queue
+            with self._lock:
+                if self._paused_until <= time.monotonic():
+                    return waited
+
+    def pause(self, seconds: float) -> None:
+        """Hold every caller for seconds, then resume at the steady rate without a burst."""
+        with self._lock:
+            until = time.monotonic() + seconds
+            if until > self._paused_until:
+                self._paused_until = until
+                self._next_slot = max(self._next_slot, until + (self.burst - 1) * self.interval)
+
+
+class RateLimiter:
+    """
+    Client-side rate limits for the proof API, shared by every thread in the process.
+
+    Limits are set per endpoint (the last path segment, e.g. challenge-status)
+    of each API host, with a "default" entry for endpoints not listed:
+
+        "rate_limits": {
+            "default": {"rate_per_second": 10, "burst": 20},
+            "challenge-status": {"rate_per_second": 20, "burst": 40}
+        }
+
+    A 429 pauses the endpoint's bucket for the response's Retry-After, so all
+    workers back off together rather than each hammering the API in turn.
+    """
+
+    def __init__(self):
+        self.logger = Logger()
+        self._lock = threading.Lock()
+        self._limits: Dict[str, Dict[str, Any]] = {}
+        self._buckets: Dict[Tuple[str, str], TokenBucket] = {}
+
+    def configure(self, api_url: str, rate_limits: Dict[str, Any]) -> None:
+        """Set the limits for an API host; a no-op when they are unchanged."""
+        host = urlsplit(api_url).netloc
+        with self._lock:
+            if self._limits.get(host) == rate_limits:
+                return
+            self._limits[host] = dict(rate_limits)
+            self._buckets = {key: bucket for key, bucket in self._buckets.items() if key[0] != host}
+
+    def bucket(self, url: str) -> TokenBucket:
+        key = endpoint_key(url)
+        with self._lock:
+            bucket = self._buckets.get(key)
+            if bucket is None:
+                limits = self._limits.get(key[0], {})
+                limit = limits.get(key[1], limits.get("default", {}))
+                bucket = self._buckets[key] = TokenBucket(limit.get("rate_per_second"),
+                                                          limit.get("burst", 1))
+            return bucket
+
+    def acquire(self, url: str) -> float:
+        """Wait until a request to url may be sent; returns the seconds waited."""
+        return self.bucket(url).acquire()
+
+    def throttled(self, url: str, retry_after: Optional[str]) -> float:
+        """
+        Pause url's endpoint after a 429.
+
+        Returns:
+            float: Seconds the endpoint is paused for
+        """
+        seconds = parse_retry_after(retry_after)
+        self.bucket(url).pause(seconds)
+        self.logger.warning(f'Rate limited by {url}, pausing for {seconds:.1f}s',
+                            endpoint=endpoint_key(url)[1], retry_after=seconds)
+        return seconds
+
+
+rate_limiter = RateLimiter()
@@ -0,0 +1,249 @@
+import itertools
+import threading
+import time
+from concurrent.futures import Future
+from typing import Any, Dict, List, Optional
+
+import requests
+from eth_utils import to_checksum_address
+from hexbytes import HexBytes
+from web3.datastructures import AttributeDict
+
+from logger import Logger
+from rpc_pool import TRANSPORT_ERRORS, RpcPool
+
+
+class ReceiptTimeout(TimeoutError):
+    pass
+
+
+# Receipt and log fields that web3 turns into ints, bytes and checksum addresses
+_QUANTITY_FIELDS = frozenset((
+    "blockNumber", "transactionIndex", "cumulativeGasUsed", "gasUsed", "effectiveGasPrice",
+    "status", "type", "logIndex", "blobGasUsed", "blobGasPrice",
+))
+_BYTES_FIELDS = frozenset(("blockHash", "transactionHash", "logsBloom", "root", "data"))
+_ADDRESS_FIELDS = frozenset(("from", "to", "contractAddress", "address"))
+
+
+def _format_field(key: str, value: Any) -> Any:
+    if value is None:
+        return None
+    if key in _QUANTITY_FIELDS:
+        return int(value, 16) if isinstance(value, str) else value
+    if key in _BYTES_FIELDS:
+        return HexBytes(value)
+    if key in _ADDRESS_FIELDS:
+        return to_checksum_address(value)
+    if key == "topics":
+        return [HexBytes(topic) for topic in value]
+    if key == "logs":
+        return [format_receipt(log) for log in value]
+    return value
+
+
+def format_receipt(raw_receipt: Dict) -> AttributeDict:
+    """Raw JSON-RPC receipt (or log) as w3.eth.get_transaction_receipt returns it."""
+    return AttributeDict({key: _format_field(key, value) for key, value in raw_receipt.items()})
+
+
+class _PendingTransaction:
+    __slots__ = ("tx_hash", "future", "deadline", "checked")
+
+    def __init__(self, tx_hash: str, deadline: float):
+        self.tx_hash = tx_hash
+        self.future: Future = Future()
+        self.deadline = deadline
+        # Looked up by hash at least once; later blocks cover it from then on
+        self.checked = False
+
+
+class ReceiptWatcher:
+    """
+    Resolves transaction receipts for many pending transactions once per block.
+
+    A background thread watches eth_blockNumber. Newly watched hashes are looked
+    up once by hash; after that, each new block is covered with
+    eth_getBlockReceipts (when the node supports it and few blocks were missed)
+    or else with batched eth_getTransactionReceipt JSON-RPC requests for every
+    pending hash. The cost is a few RPC calls per block, however many
+    transactions are pending.
+    It talks plain JSON-RPC over HTTP, so any JSON-RPC endpoint works, including
+    a local stand-in. With an RpcPool, every poll goes to the pool's best
+    endpoint at that moment and feeds its health stats.
+    """
+
+    _instances: Dict[Any, "ReceiptWatcher"] = {}
+    _instances_lock = threading.Lock()
+
+    def __init__(self, rpc_url: Optional[str] = None, poll_interval: float = 1.0, timeout: float = 120,
+                 batch_size: int = 100, session: Optional[requests.Session] = None,
+                 pool: Optional[RpcPool] = None):
+        if not (rpc_url or pool):
+            raise ValueError("A receipt watcher needs an RPC URL or an RPC pool")
+        self.rpc_url = rpc_url
+        self.pool = pool
+        self.poll_interval = poll_interval
+        self.timeout = timeout
+        self.batch_size = batch_size
+        self.session = session or requests.Session()
+        self.rpc_calls = 0
+        self.logger = Logger()
+
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._pending: Dict[str, _PendingTransaction] = {}
+        self._last_block: Optional[int] = None
+        self._block_receipts_supported = True
+        self._thread: Optional[threading.Thread] = None
+
+    @classmethod
+    def for_endpoint(cls, rpc_url: str) -> "ReceiptWatcher":
+        """Process-wide watcher for an RPC endpoint."""
+        with cls._instances_lock:
+            watcher = cls._instances.get(rpc_url)
+            if watcher is None:
+                watcher = cls._instances[rpc_url] = cls(rpc_url)
+            return watcher
+
+    @classmethod
+    def for_pool(cls, pool: RpcPool) -> "ReceiptWatcher":
+        """Process-wide watcher for an RPC pool."""
+        key = tuple(endpoint.url for endpoint in pool.endpoints)
+        with cls._instances_lock:
+            watcher = cls._instances.get(key)
+            if watcher is None:
+                watcher = cls._instances[key] = cls(pool=pool)
+            return watcher
+
+    @property
+    def pending(self) -> int:
+        with self._lock:
+            return len(self._pending)
+
+    def watch(self, tx_hash: Any, timeout: Optional[float] = None) -> Future:
+        """
+        Track a sent transaction.
+
+        Args:
+            tx_hash: Transaction hash (bytes or 0x-prefixed hex)
+            timeout: Seconds to wait for the receipt (default: watcher timeout)
+
+        Returns:
+            Future: Resolved with the web3-formatted receipt, or ReceiptTimeout
+        """
+        tx_hash = HexBytes(tx_hash).hex()
+        deadline = time.monotonic() + (timeout or self.timeout)
+        with self._lock:
+            entry = self._pending.get(tx_hash)
+            if entry is None:
+                entry = self._pending[tx_hash] = _PendingTransaction(tx_hash, deadline)
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="receipt-watcher", daemon=True)
+                self._thread.start()
+        self._wakeup.set()
+        return entry.future
+
+    def _run(self) -> None:
+        while True:
+            with self._lock:
+                if not self._pending:
+                    self._thread = None
+                    return
+            try:
+                self._poll()
+            except Exception as e:
+                self.logger.warning(f'Receipt watcher poll failed: {e}')
+            self._expire()
+            self._wakeup.wait(self.poll_interval)
+            self._wakeup.clear()
+
+    def _poll(self) -> None:
+        block = int(self._call("eth_blockNumber", []), 16)
+        new_block = self._last_block is None or block > self._last_block
+
+        with self._lock:
+            entries = list(self._pending.values())
+        fresh = [entry.tx_hash for entry in entries if not entry.checked]
+
+        receipts = None
+        if (new_block and self._last_block is not None and self._block_receipts_supported
+                and block - self._last_block <= 3):
+            receipts = self._block_receipts(self._last_block + 1, block)
+            if receipts is not None:
+                receipts += self._transaction_receipts(fresh)
+        if receipts is None:
+            receipts = self._transaction_receipts(
+                [entry.tx_hash for entry in entries] if new_block else fresh)
+
+        for entry in entries:
+            entry.checked = True
+        for receipt in receipts:
+            self._resolve(receipt)
+        self._last_block = block
+
+    def _block_receipts(self, first_block: int, last_block: int) -> Optional[List[Dict]]:
+        receipts: List[Dict] = []
+        for number in range(first_block, last_block + 1):
+            response = self._batch([("eth_getBlockReceipts", [hex(number)])])[0]
+            if "error" in response:
+                # Not every node implements it; fall back to per-hash lookups for good
+                self._block_receipts_supported = False
+                return None
+            receipts.extend(response.get("result") or [])
+        return receipts
+
+    def _transaction_receipts(self, hashes: List[str]) -> List[Dict]:
+        receipts: List[Dict] = []
+        for start in range(0, len(hashes), self.batch_size):
+            chunk = hashes[start:start + self.batch_size]
+            responses = self._batch([("eth_getTransactionReceipt", [tx_hash]) for tx_hash in chunk])
+            receipts.extend(response["result"] for response in responses if response.get("result"))
+        return receipts
+
+    def _resolve(self, raw_receipt: Dict) -> None:
+        with self._lock:
+            entry = self._pending.pop(raw_receipt["transactionHash"].lower(), None)
+        if entry and not entry.future.done():
+            entry.future.set_result(format_receipt(raw_receipt))
+
+    def _expire(self) -> None:
+        now = time.monotonic()
+        with self._lock:
+            expired = [entry for entry in self._pending.values() if entry.deadline <= now]
+            for entry in expired:
+                del self._pending[entry.tx_hash]
+        for entry in expired:
+            entry.future.set_exception(ReceiptTimeout(
+                f'Transaction {entry.tx_hash} is not in the chain after {self.timeout} seconds'))
+
+    def _call(self, method: str, params: List[Any]) -> Any:
+        response = self._batch([(method, params)])[0]
+        if "error" in response:
+            raise ValueError(response["error"])
+        return response["result"]
+
+    def _batch(self, calls: List[Any]) -> List[Dict]:
+        payload = [
+            {"jsonrpc": "2.0", "id": next(self._ids), "method": method, "params": params}
+            for method, params in calls
+        ]
+        self.rpc_calls += 1
+        endpoint = self.pool.ranked()[0] if self.pool else None
+        started = time.perf_counter()
+        try:
+            response = self.session.post(endpoint.url if endpoint else self.rpc_url, json=payload, timeout=30)
+        except TRANSPORT_ERRORS:
+            if endpoint:
+                endpoint.record(False)
+            raise
+        if endpoint:
+            endpoint.record(True, time.perf_counter() - started)
+        response.raise_for_status()
+        results = response.json()
+        if isinstance(results, dict):
+            # Some servers answer a rejected batch with a single error object
+            return [results] * len(payload)
+        by_id = {result.get("id"): result for result in results}
+        return [by_id.get(call["id"], {"error": "missing response"}) for call in payload]
@@ -0,0 +1,171 @@
+import random
+import threading
+import time
+from typing import Any, Dict, Optional, Tuple
+from urllib.parse import urlsplit
+
+import requests
+
+from logger import Logger
+from rate_limiter import endpoint_key
+
+# Statuses that mean the request was not handled and may succeed if sent again
+RETRY_STATUS_CODES = (408, 500, 502, 503, 504)
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class CircuitOpenError(requests.exceptions.RequestException):
+    """Raised instead of calling an endpoint whose circuit breaker is open."""
+
+
+def _never_sent(error: Exception) -> bool:
+    """Whether a request failed before any of it could have reached the API."""
+    if isinstance(error, (requests.exceptions.ConnectTimeout, CircuitOpenError)):
+        return True
+    if isinstance(error, requests.exceptions.ConnectionError):
+        # Connection refused / DNS failures surface as NewConnectionError
+        reason = getattr(error.args[0], "reason", None) if error.args else None
+        return type(reason).__name__ in ("NewConnectionError", "NameResolutionError")
+    return False
+
+
+class RetryPolicy:
+    """
+    How many times, how long apart and for which failures a call is retried.
+
+    Idempotent calls (status reads, prover lookups) are retried after any
+    network error or RETRY_STATUS_CODES response. Other calls (challenge
+    triggers, login) are only retried when the request was never sent: the
+    connection could not be opened. Once the body may have reached the API,
+    whatever the answer, they are not sent again.
+    Delays grow exponentially from backoff_seconds with full jitter.
+    """
+
+    def __init__(self, attempts: int = 4, backoff_seconds: float = 0.5,
+                 max_backoff_seconds: float = 10, connect_timeout_seconds: float = 5,
+                 read_timeout_seconds: float = 30):
+        self.attempts = max(1, attempts)
+        self.backoff_seconds = backoff_seconds
+        self.max_backoff_seconds = max_backoff_seconds
+        self.timeout: Tuple[float, float] = (connect_timeout_seconds, read_timeout_seconds)
+
+    @classmethod
+    def from_config(cls, retry_config: Dict[str, Any]) -> "RetryPolicy":
+        return cls(**{key: retry_config[key] for key in (
+            "attempts", "backoff_seconds", "max_backoff_seconds",
+            "connect_timeout_seconds", "read_timeout_seconds") if key in retry_config})
+
+    def retry_error(self, error: Exception, idempotent: bool, attempt: int) -> bool:
+        if attempt + 1 >= self.attempts or isinstance(error, CircuitOpenError):
+            return False
+        return idempotent or _never_sent(error)
+
+    def retry_status(self, status_code: int, idempotent: bool, attempt: int) -> bool:
+        if attempt + 1 >= self.attempts:
+            return False
+        return idempotent and status_code in RETRY_STATUS_CODES
+
+    def backoff(self, attempt: int) -> float:
+        return random.uniform(0, min(self.max_backoff_seconds, self.backoff_seconds * 2 ** attempt))
+
+
+class CircuitBreaker:
+    """
+    Stops calling an endpoint after failure_threshold failures in a row.
+
+    While open, calls fail at once with CircuitOpenError. After reset_seconds a
+    single probe call is let through (half-open): success closes the circuit,
+    failure opens it for another reset_seconds.
+    """
+
+    def __init__(self, name: str, failure_threshold: int = 5, reset_seconds: float = 30):
+        self.name = name
+        self.failure_threshold = max(1, failure_threshold)
+        self.reset_seconds = reset_seconds
+        self.state = CLOSED
+        self.logger = Logger()
+        self._lock = threading.Lock()
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probing = False
+
+    def allow(self) -> bool:
+        with self._lock:
+            if self.state == CLOSED:
+                return True
+            if self.state == OPEN and time.monotonic() - self._opened_at >= self.reset_seconds:
+                self.state = HALF_OPEN
+                self._probing = False
+            if self.state == HALF_OPEN and not self._probing:
+                self._probing = True
+                return True
+            return False
+
+    def record_success(self) -> None:
+        with self._lock:
+            if self.state != CLOSED:
+                self.logger.info(f'Circuit for {self.name} closed', endpoint=self.name)
+            self.state = CLOSED
+            self._failures = 0
+            self._probing = False
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self._failures += 1
+            if self.state == HALF_OPEN or (self.state == CLOSED and self._failures >= self.failure_threshold):
+                self.logger.warning(f'Circuit for {self.name} opened after {self._failures} failures',
+                                    endpoint=self.name, failures=self._failures)
+                self.state = OPEN
+                self._opened_at = time.monotonic()
+                self._probing = False
+
+
+class Resilience:
+    """
+    Retry policies and circuit breakers for the proof API, per API host.
+
+    Each endpoint (last path segment) of each host, and so of each network, has
+    its own circuit breaker. Settings come from the "retry" and
+    "circuit_breaker" entries of the api config.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._configs: Dict[str, Tuple[Dict[str, Any], Dict[str, Any]]] = {}
+        self._policies: Dict[str, RetryPolicy] = {}
+        self._breakers: Dict[Tuple[str, str], CircuitBreaker] = {}
+
+    def configure(self, api_url: str, retry_config: Dict[str, Any],
+                  breaker_config: Dict[str, Any]) -> None:
+        """Set the policy and breaker settings for an API host; a no-op when unchanged."""
+        host = urlsplit(api_url).netloc
+        with self._lock:
+            if self._configs.get(host) == (retry_config, breaker_config):
+                return
+            self._configs[host] = (dict(retry_config), dict(breaker_config))
+            self._policies[host] = RetryPolicy.from_config(retry_config)
+            self._breakers = {key: breaker for key, breaker in self._breakers.items() if key[0] != host}
+
+    def policy(self, url: str) -> Optional[RetryPolicy]:
+        """Policy for url's host, None when the host was never configured."""
+        with self._lock:
+            return self._policies.get(endpoint_key(url)[0])
+
+    def breaker(self, url: str) -> CircuitBreaker:
+        key = endpoint_key(url)
+        with self._lock:
+            breaker = self._breakers.get(key)
+            if breaker is None:
+                breaker_config = self._configs.get(key[0], ({}, {}))[1]
+                breaker = self._breakers[key] = CircuitBreaker(
+                    f'{key[0]}/{key[1]}',
+                    breaker_config.get("failure_threshold", 5),
+                    breaker_config.get("reset_seconds", 30),
+                )
+            return breaker
+
+
+resilience = Resilience()
@@ -0,0 +1,130 @@
+import threading
+import time
+from collections import deque
+from typing import Any, Callable, Deque, Dict, List, Optional, Tuple, TypeVar
+
+import requests
+from requests.adapters import HTTPAdapter
+from web3 import Web3
+
+from logger import Logger
+
+T = TypeVar("T")
+
+# Errors that say the endpoint (not the request) is the problem
+TRANSPORT_ERRORS = (requests.exceptions.ConnectionError, requests.exceptions.Timeout, ConnectionError)
+
+
+class RpcEndpoint:
+    """One RPC endpoint with a keep-alive session and rolling health stats."""
+
+    def __init__(self, url: str, pool_size: int = 32, window: int = 50,
+                 latency_alpha: float = 0.2, timeout: float = 30):
+        self.url = url
+        self.latency_alpha = latency_alpha
+        self.latency: Optional[float] = None
+        self.outcomes: Deque[bool] = deque(maxlen=window)
+        self.down_until = 0.0
+        self._lock = threading.Lock()
+
+        session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+        session.mount("http://", adapter)
+        session.mount("https://", adapter)
+        self.web3 = Web3(Web3.HTTPProvider(url, session=session, request_kwargs={"timeout": timeout}))
+        self.web3.middleware_onion.add(self._measure, name="rpc_pool_measure")
+
+    def _measure(self, make_request: Callable, w3: Web3) -> Callable:
+        def middleware(method: str, params: Any) -> Any:
+            started = time.perf_counter()
+            try:
+                response = make_request(method, params)
+            except TRANSPORT_ERRORS:
+                self.record(False)
+                raise
+            self.record(True, time.perf_counter() - started)
+            return response
+        return middleware
+
+    def record(self, ok: bool, latency: Optional[float] = None) -> None:
+        with self._lock:
+            self.outcomes.append(ok)
+            if latency is not None:
+                self.latency = (latency if self.latency is None
+                                else self.latency_alpha * latency + (1 - self.latency_alpha) * self.latency)
+            if not ok:
+                # Back off harder the more of the recent window has failed
+                self.down_until = time.monotonic() + min(60.0, 2.0 * self.failures)
+
+    @property
+    def failures(self) -> int:
+        return sum(1 for ok in self.outcomes if not ok)
+
+    @property
+    def error_rate(self) -> float:
+        return self.failures / len(self.outcomes) if self.outcomes else 0.0
+
+    @property
+    def healthy(self) -> bool:
+        return time.monotonic() >= self.down_until
+
+    def score(self) -> float:
+        """Lower is better: expected latency inflated by the recent error rate."""
+        latency = self.latency if self.latency is not None else 0.0
+        return latency * (1 + 10 * self.error_rate) + self.error_rate
+
+
+class RpcPool:
+    """
+    Process-wide pool of RPC endpoints for a chain.
+
+    Reads go to the healthy endpoint with the lowest score (rolling latency
+    inflated by error rate); writes go through send_with_failover, which tries
+    endpoints in score order until one accepts the request. Every call made
+    through an endpoint's web3 instance updates its stats.
+    """
+
+    _instances: Dict[Tuple[str, ...], "RpcPool"] = {}
+    _instances_lock = threading.Lock()
+
+    def __init__(self, urls: List[str]):
+        if not urls:
+            raise ConnectionError("No RPC endpoints configured")
+        self.endpoints = [RpcEndpoint(url) for url in urls]
+        self.logger = Logger()
+
+    @classmethod
+    def for_chain_config(cls, chain_config: Dict[str, Any]) -> "RpcPool":
+        urls = chain_config.get("rpc_urls") or [chain_config["rpc_url"]]
+        key = tuple(urls)
+        with cls._instances_lock:
+            pool = cls._instances.get(key)
+            if pool is None:
+                pool = cls._instances[key] = cls(list(urls))
+            return pool
+
+    def ranked(self) -> List[RpcEndpoint]:
+        """Endpoints best first; endpoints in back-off come last."""
+        return sorted(self.endpoints, key=lambda e: (not e.healthy, e.score()))
+
+    def reader(self) -> Web3:
+        return self.ranked()[0].web3
+
+    def send_with_failover(self, send: Callable[[Web3], T]) -> T:
+        """
+        Run a write against the best endpoint, failing over on transport errors.
+
+        Args:
+            send: Callable performing the write with a web3 instance
+
+        Returns:
+            Whatever send returns for the first endpoint that accepts it
+        """
+        last_error: Optional[Exception] = None
+        for endpoint in self.ranked():
+            try:
+                return send(endpoint.web3)
+            except TRANSPORT_ERRORS as e:
+                self.logger.warning(f'RPC endpoint {endpoint.url} failed, failing over: {e}')
+                last_error = e
+        raise ConnectionError(f'All RPC endpoints failed: {last_error}')
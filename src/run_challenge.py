@@ -8,23 +8,17 @@ from config.config import Config
 from api import *
 from proof_validations import *
 from hexbytes import HexBytes
+from challenge_encoding import POL_ENCODER, POB_ENCODER
+from payer_pool import PayerPool, load_private_keys, PAYER_KEYS_ENV
+from transaction_manager import TransactionManager
+from challenge_executor import ChallengeExecutor
 
-import logging
+from logger import Logger
 import time
 
 import random
 
-LOGPATH = "./"
-
-LOGNAME = LOGPATH+"pox_schedule.log"
-
-# Configure the logging
-logging.basicConfig(filename=LOGNAME,
-                    filemode='a',
-                    level=logging.INFO,
-                    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-                    datefmt='%Y-%m-%d %H:%M:%S')
-logger = logging.getLogger(__name__)
+logger = Logger()
 
 full_path = os.path.abspath(__file__)
 SRC_PATH=os.path.dirname(full_path)+"/"
@@ -51,8 +45,7 @@ def get_pol_encoding(
             latitude,
             longitude
     ):
-    return eth_abi.encode (
-        ["address","address","bool","uint256","uint256","int256","int256"],
+    return POL_ENCODER.encode (
         [
             chain_config["prover_registry"]["proxy"],
             prover,
@@ -74,8 +67,7 @@ def get_pob_encoding (
             bandwidth_challenge_type,
             bandwidth
     ):
-    return eth_abi.encode (
-        ["address","address","uint","bool","uint256","uint256","uint256"],
+    return POB_ENCODER.encode (
         [
             chain_config["prover_registry"]["proxy"],
             prover,
@@ -92,20 +84,18 @@ def prepare_and_submit_request_transaction (
                         proof_config,
                         connection_to_rpc,
                         account,
-                        challenge_info
+                        challenge_info,
+                        transaction_manager=None
                         ):
-        receipt,contract = submit_transaction(
-                                            chain_config["chain_id"],
+        # Nonces are assigned locally, so requests from concurrent provers don't wait on each other;
+        # with a payer pool each request is paid by the pool's next healthy account
+        transaction_manager = transaction_manager or TransactionManager(chain_config, SRC_PATH)
+        receipt,contract = transaction_manager.submit_request_transaction_async(
+                                            proof_config,
                                             connection_to_rpc,
-                                            chain_config["gas_limit"],
                                             account,
-                                            chain_config["request_handler"]["proxy"],
-                                            SRC_PATH+chain_config["request_handler"]["abi_file_name_with_path"],
-                                            "submitRequest",
-                                            proof_config["challenge_timeout_secs_minimum_default"],
-                                            proof_config["attribute_ids"],
-                                            [challenge_info]
-                                        )
+                                            challenge_info
+                                        ).result()
         return (receipt,contract)
 
 
@@ -131,7 +121,8 @@ def submit_on_chain_request_for_pol_challenge(
                                           challengers_count,
                                           tolerance,
                                           latitude,
-                                          longitude
+                                          longitude,
+                                          transaction_manager=None
                                         ):
     # Get RPC Connection
     connection_to_rpc = get_rpc(chain_config)
@@ -154,7 +145,8 @@ def submit_on_chain_request_for_pol_challenge(
                                                                 proof_config,
                                                                 connection_to_rpc,
                                                                 account,
-                                                                challenge_info
+                                                                challenge_info,
+                                                                transaction_manager
                                                             )
 
     # Processes the event logs to extract Request and Challenge Information
@@ -172,7 +164,8 @@ def submit_on_chain_request_for_pob_challenge(
                                           challengers_count,
                                           tolerance_count,
                                           bandwidth_challenge_type,
-                                          bandwidth
+                                          bandwidth,
+                                          transaction_manager=None
                                         ):
 
     # Get RPC Connection
@@ -197,7 +190,8 @@ def submit_on_chain_request_for_pob_challenge(
                                                                 proof_config,
                                                                 connection_to_rpc,
                                                                 account,
-                                                                challenge_info
+                                                                challenge_info,
+                                                                transaction_manager
                                                             )
     print(receipt["status"])
     if receipt["status"] != 1:
@@ -238,13 +232,18 @@ def handle_challenge(session, api_config, proof_type, challenge_id, prover_id, r
     logger.info(f'Challenge {challenge_id} for Prover {prover_id} (Request ID: {request_id}) - Status: {response["result"]["challenge_status"]}')
 
     retries = 0
+    last_status = response["result"]["challenge_status"]
 
     # Poll for challenge completion, respecting the configured retry limit
     while retries < api_config["retries"]:
         # Check if the challenge has been completed
         challenge_ended, status = has_challenge_ended(session, api_config, proof_type, challenge_id)
 
-        logger.info(f'Status of challenge request for challenge_id : {challenge_id} - {status}')
+        # Log transitions only, not every poll; None means the status was unavailable
+        if status is not None and status != last_status:
+            logger.info(f'Status of challenge request for challenge_id : {challenge_id} - {status}',
+                        challenge_id=challenge_id, prover=prover_id, state=status)
+            last_status = status
 
         if challenge_ended:
             return  # Exit the polling loop if the challenge is complete
@@ -265,7 +264,8 @@ def process_prover( proof_type,
                     tolerance_count,
                     poll_seconds,
                     last_alive,
-                    bandwidth_challenge_type):
+                    bandwidth_challenge_type,
+                    transaction_manager=None):
     try:
         prover_id = prover["id"].split("/")[1]
         is_ipv6 = prover["id"].split("/")[0] == "IPv6"
@@ -291,7 +291,8 @@ def process_prover( proof_type,
                                                                                 challenger_count,
                                                                                 tolerance_count,
                                                                                 latitude,
-                                                                                longitude
+                                                                                longitude,
+                                                                                transaction_manager
             )
         elif proof_type == 'pob':
             bandwidth = prover["claims"]["uplink_bandwidth"] if bandwidth_challenge_type else prover["claims"]["downlink_bandwidth"]
@@ -304,7 +305,8 @@ def process_prover( proof_type,
                                                                                 challenger_count,
                                                                                 tolerance_count,
                                                                                 bandwidth_challenge_type,
-                                                                                bandwidth
+                                                                                bandwidth,
+                                                                                transaction_manager
                                                                                 )
         else:
             return None
@@ -316,7 +318,7 @@ def process_prover( proof_type,
     except Exception as e:
         logger.error(f"Error triggering for {prover}: {e}")
 
-def main(config_file, proof_type,private_key,prover_to_challenge,challenger_count=1,tolerance_count=0,project_name='',bandwidth_challenge_type=0):
+def main(config_file, proof_type,private_key,prover_to_challenge,challenger_count=1,tolerance_count=0,project_name='',bandwidth_challenge_type=0,payer_keyfile=None,max_in_flight=None):
 
     config = Config(config_file)
 
@@ -331,7 +333,12 @@ def main(config_file, proof_type,private_key,prover_to_challenge,challenger_coun
 
     validate_inputs(proof_config)
 
-    account = get_web3_account(private_key)
+    payers_config = config.get_payers_config()
+    private_keys = load_private_keys(private_key, payer_keyfile or payers_config.get("keyfile"))
+    payers = PayerPool.from_config(private_keys, chain_config, payers_config)
+    account = payers.primary
+    # One transaction manager for the whole run, shared by every prover's request
+    transaction_manager = TransactionManager(chain_config, SRC_PATH, payers)
 
     with requests.Session() as session:
         session.headers.update(api_config["content_type_json"])
@@ -370,9 +377,14 @@ def main(config_file, proof_type,private_key,prover_to_challenge,challenger_coun
         # Step 5: Request challenge for each prover
         matching_provers = list(filter(lambda p: p["id"].split("/")[1] == prover_to_challenge, provers)) if prover_to_challenge != 'all' else provers
 
-        for prover in matching_provers:
-            process_prover(proof_type, prover, prover_to_challenge, project_name, session, api_config, account, chain_config, proof_config,
-                        challenger_count, tolerance_count, poll_seconds, LAST_ALIVE,bandwidth_challenge_type)
+        # Several provers run at once, each request paid by the next healthy payer account
+        max_in_flight = max_in_flight or api_config.get("max_in_flight_challenges", 1)
+        with ChallengeExecutor(max_in_flight) as executor:
+            executor.run_all(
+                lambda prover: process_prover(proof_type, prover, prover_to_challenge, project_name, session, api_config, account, chain_config, proof_config,
+                                              challenger_count, tolerance_count, poll_seconds, LAST_ALIVE,bandwidth_challenge_type, transaction_manager),
+                matching_provers
+            )
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(description='Pass configuration file , proof type, number of challengers and tolerance level')
@@ -380,7 +392,9 @@ if __name__ == "__main__":
     parser.add_argument('--proof_type', type=str, help='The type of proof to run: pol / pob (default: pol)')
     parser.add_argument('--challenger_count', type=int, default=2, help='Total # of challengers that should participate : (default: 6)')
     parser.add_argument('--tolerance_count', type=int, default=1,help='Minimum # of challengers that should participate : (default: 1)')
-    parser.add_argument('--private_key', type=str, help='Private key of the payer : ')
+    parser.add_argument('--private_key', type=str, help='Private key of the payer, or several separated by commas : ')
+    parser.add_argument('--payer_keyfile', type=str, help='File with one payer private key per line : ')
+    parser.add_argument('--max_in_flight', type=int, default=None, help='Max # of provers challenged at once (default: max_in_flight_challenges from config) : ')
     parser.add_argument('--prover', type=str, default='all', help='Prover''s address to challenge : (default: all )')
     parser.add_argument('--project_name', type=str, default='', help='Prover''s project name : ')
     parser.add_argument('--bandwidth_challenge_type', type=int, default=0, help='Bandwidth CHallenge Type (Downlink: 0 (default), Uplink: 1) : ')
@@ -397,7 +411,7 @@ if __name__ == "__main__":
         args.tolerance_count = int(input('Min # of challengers that can choose not to respond: (Default 1)').strip())
         if args.tolerance_count == None:
             args.tolerance_count = 1
-    if not args.private_key:
+    if not args.private_key and not args.payer_keyfile and not os.environ.get(PAYER_KEYS_ENV):
         args.private_key = input('Please enter the private key of the payer: ').strip() or None
     if not args.prover:
         args.prover = input('Please enter the prover to challenge: ').strip() or None
@@ -408,4 +422,4 @@ if __name__ == "__main__":
 
 
 
-    main(args.config_file, args.proof_type,args.private_key,args.prover,args.challenger_count,args.tolerance_count,args.project_name,args.bandwidth_challenge_type)
+    main(args.config_file, args.proof_type,args.private_key,args.prover,args.challenger_count,args.tolerance_count,args.project_name,args.bandwidth_challenge_type,args.payer_keyfile,args.max_in_flight)
@@ -1,43 +1,52 @@
-from apscheduler.schedulers.blocking import BlockingScheduler
-import subprocess
+import os
+import argparse
 
-# Function to execute the second script
-def execute_challenge_script(
-                config_file='config/config.json',
-                proof_type='pob',
-                challenger_count=2,
-                private_key='',
-                prover=''
-    ):
-    print("Called script")
-    try:
-        # Run the second script using subprocess
-        subprocess.run(
-                        ["python", "run_challenge.py",
-                        "--config_file",config_file,
-                        "--proof_type",proof_type,
-                        "--challenger_count",challenger_count,
-                        "--private_key",private_key,
-                        "--prover",prover,
-                        ], check=True)
-    except subprocess.CalledProcessError as e:
-        print(f"Error executing script: {e}")
+from challenge_daemon import ChallengeDaemon
+from metrics import registry as metrics_registry, start_exporters
+from payer_pool import PAYER_KEYS_ENV
 
-# Create a scheduler
-scheduler = BlockingScheduler()
+# Runs the jobs declared under "daemon" in the config file in-process.
+#
+#   "daemon": {
+#       "provers_cache_seconds": 300,
+#       "jobs": [
+#           {"proof_type": "pol", "network": "testnet", "prover": "0x...", "interval_minutes": 5}
+#       ]
+#   }
+#
+# A job may also set project_name, challenger_count, tolerance_count,
+# bandwidth_challenge_type, max_in_flight and batch_requests.
 
-# Schedule the job to run every minute or any schedule you prefer
-config_file,proof_type,challenger_count,private_key,prover = ['config/config.json','pol',"2",'0xdf4caa61d929f89e824e3cebb7ef62891acecbb0e12b4c22beee7c91a34a7e9c','']
+def main():
+    parser = argparse.ArgumentParser(description='Run the configured challenge jobs on a schedule')
+    parser.add_argument('--config_file', type=str, default='config/config.json',
+                      help='The path to the configuration file (default: config/config.json) ')
+    parser.add_argument('--private_key', type=str, default=os.environ.get('PRIVATE_KEY'),
+                      help='Private key of the payer, or several separated by commas (default: $PRIVATE_KEY)')
+    parser.add_argument('--payer_keyfile', type=str, default=None,
+                      help=f'File with one payer private key per line, added to --private_key and ${PAYER_KEYS_ENV} (default: payers.keyfile from config)')
+    parser.add_argument('--metrics_port', type=int, default=None,
+                      help='Serve Prometheus metrics on this local port (default: metrics.port from config)')
+    parser.add_argument('--metrics_textfile', type=str, default=None,
+                      help='Write Prometheus metrics to this file (default: metrics.textfile from config)')
+    args = parser.parse_args()
 
-provers = [
-]
-for prover in provers:
-    scheduler.add_job(execute_challenge_script, 'interval', minutes=5,args=[config_file,proof_type,challenger_count,private_key,prover])
+    if not args.private_key and not args.payer_keyfile and not os.environ.get(PAYER_KEYS_ENV):
+        args.private_key = input('Please enter the private key of the payer: ').strip()
 
-# Start the scheduler
-if __name__ == "__main__":
+    full_path = os.path.abspath(__file__)
+    src_path = os.path.dirname(full_path) + "/"
+
+    daemon = ChallengeDaemon(args.config_file, src_path, args.private_key, args.payer_keyfile)
+    textfile = start_exporters(daemon.config.get_metrics_config(),
+                               args.metrics_port, args.metrics_textfile)
     try:
-        print("Scheduler started. Running script every 5 minutes...")
-        scheduler.start()
+        print("Scheduler started. Running configured jobs...")
+        daemon.start()
     except (KeyboardInterrupt, SystemExit):
         pass
+    finally:
+        metrics_registry.stop(textfile)
+
+if __name__ == "__main__":
+    main()
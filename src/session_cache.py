@@ -0,0 +1,84 @@
+import json
+import os
+import threading
+import time
+from typing import Dict, Optional
+
+from logger import Logger
+
+
+class SessionCache:
+    """
+    Persists API session cookies between runs so logins can be skipped.
+
+    Entries are keyed by account address, network and proof type and expire
+    after ttl_seconds. The file holds live credentials, so it is written with
+    owner-only permissions.
+    """
+
+    def __init__(self, cache_file: Optional[str], ttl_seconds: int = 3600):
+        self.cache_file = cache_file
+        self.ttl_seconds = ttl_seconds
+        self.logger = Logger()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def key(address: str, network: str, proof_type: str) -> str:
+        return f'{address.lower()}/{network}/{proof_type}'
+
+    def load(self, key: str) -> Optional[Dict[str, str]]:
+        """
+        Get the cookies cached for key.
+
+        Returns:
+            Optional[Dict[str, str]]: Cookies, None if missing or expired
+        """
+        if not self.cache_file:
+            return None
+        with self._lock:
+            entry = self._read().get(key)
+        if not entry or entry.get("expires_at", 0) <= time.time():
+            return None
+        return entry.get("cookies") or None
+
+    def store(self, key: str, cookies: Dict[str, str]) -> None:
+        if not self.cache_file or not cookies:
+            return
+        with self._lock:
+            entries = self._read()
+            now = time.time()
+            entries = {k: v for k, v in entries.items() if v.get("expires_at", 0) > now}
+            entries[key] = {
+                "cookies": cookies,
+                "expires_at": now + self.ttl_seconds
+            }
+            self._write(entries)
+
+    def invalidate(self, key: str) -> None:
+        if not self.cache_file:
+            return
+        with self._lock:
+            entries = self._read()
+            if entries.pop(key, None) is not None:
+                self._write(entries)
+
+    def _read(self) -> Dict[str, Dict]:
+        if not os.path.exists(self.cache_file):
+            return {}
+        try:
+            with open(self.cache_file, 'r') as file:
+                return json.load(file)
+        except (OSError, ValueError) as e:
+            self.logger.warning(f'Ignoring unreadable session cache {self.cache_file}: {e}')
+            return {}
+
+    def _write(self, entries: Dict[str, Dict]) -> None:
+        # Per-process temp file: shard workers may write the cache concurrently
+        tmp_file = f'{self.cache_file}.{os.getpid()}.tmp'
+        try:
+            fd = os.open(tmp_file, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+            with os.fdopen(fd, 'w') as file:
+                json.dump(entries, file)
+            os.replace(tmp_file, self.cache_file)
+        except OSError as e:
+            self.logger.warning(f'Unable to write session cache {self.cache_file}: {e}')
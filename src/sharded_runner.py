@@ -0,0 +1,270 @@
+import multiprocessing
+import os
+import queue
+import time
+from collections import Counter
+from typing import Any, Dict, Iterator, List, Optional
+
+from chain import get_web3_account
+from chain_connector import ChainConnector
+from challenge_network import ChallengeNetwork
+from prover_processor import ProverProcessor
+from prover_selection import shard_of
+from proof_validations import validate_inputs
+from metrics import registry as metrics_registry
+from logger import Logger
+
+# Batches of provers buffered per shard before the parent waits for the worker
+QUEUE_BATCHES = 8
+
+
+def shard_log_name(log_name: str, index: int) -> str:
+    """pox_schedule.log -> pox_schedule.shard-0.log"""
+    stem, ext = os.path.splitext(log_name)
+    return f'{stem}.shard-{index}{ext}'
+
+
+def _scaled_rate_limits(rate_limits: Dict[str, Any], shards: int, index: int) -> Dict[str, Any]:
+    """
+    Shard index's share of each endpoint's limits, so the shards' sum stays within them.
+
+    The rate is split evenly. The burst is split as evenly as whole calls allow,
+    the first burst % shards shards taking one more; with fewer burst calls than
+    shards, the rest get a burst of 0 and wait for their first call.
+    """
+    scaled = {}
+    for endpoint, limit in rate_limits.items():
+        limit = dict(limit)
+        if limit.get("rate_per_second"):
+            limit["rate_per_second"] /= shards
+        burst = int(limit.get("burst", 1))
+        limit["burst"] = burst // shards + (1 if index < burst % shards else 0)
+        scaled[endpoint] = limit
+    return scaled
+
+
+def _iter_batches(provers_queue: Any) -> Iterator[Dict[str, Any]]:
+    for batch in iter(provers_queue.get, None):
+        yield from batch
+
+
+def _shard_main(index: int, shards: int, config_file: str, src_path: str, private_key: str,
+                payer_keys: List[str], proof_type: str, run_kwargs: Dict[str, Any],
+                provers_queue: Any, results_queue: Any) -> None:
+    """Worker process: authenticate its own session and challenge the provers of one shard."""
+    challenge_network = ChallengeNetwork(config_file, src_path)
+    config = challenge_network.config
+    logging_config = config.get_logging_config()
+    Logger.configure({**logging_config,
+                      "file": shard_log_name(logging_config.get("file", "pox_schedule.log"), index)})
+    logger = Logger()
+
+    network = run_kwargs["network"]
+    api_config = config.get_api_config(network)
+    api_config["rate_limits"] = _scaled_rate_limits(api_config.get("rate_limits", {}), shards, index)
+
+    routed = 0
+    error = None
+    provers = _iter_batches(provers_queue)
+    try:
+        account = get_web3_account(private_key)
+        payers = challenge_network.payer_pool(network, payer_keys)
+        session = challenge_network.open_session(network, proof_type, account)
+        if not session:
+            error = "authentication failed"
+        else:
+            def counted() -> Iterator[Dict[str, Any]]:
+                nonlocal routed
+                for prover in provers:
+                    routed += 1
+                    yield prover
+
+            with session:
+                challenge_network.run_sweep(
+                    session, proof_type, account,
+                    provers=counted(),
+                    chain_connector=ChainConnector(config.get_chain_config(network)),
+                    shard=(index, shards),
+                    payers=payers,
+                    **run_kwargs
+                )
+    except Exception as e:
+        logger.error(f'Shard {index} failed: {e}')
+        error = str(e)
+    finally:
+        # Drain what the parent still sends so it never blocks on a full queue
+        for _ in provers:
+            pass
+        results_queue.put({"shard": index, "provers": routed, "error": error,
+                           "metrics": metrics_registry.snapshot()})
+        Logger.shutdown()
+
+
+class ShardedRunner:
+    """
+    Runs one sweep across several worker processes.
+
+    The parent authenticates once, lists and selects the provers and routes
+    each to a shard by a stable hash of its address (prover_selection.shard_of).
+    Every shard is a separate process with its own authenticated session,
+    chain connector, poller and log file (pox_schedule.shard-<n>.log), and a
+    1/shards share of each API rate limit. With at least as many payer keys as
+    shards, each shard pays from its own keys so no two processes share a nonce
+    sequence. When the shards finish, their metrics are merged into the
+    parent's registry and a summary is logged.
+    """
+
+    def __init__(self, challenge_network: ChallengeNetwork, config_file: str, src_path: str,
+                 shards: int, batch_size: int = 500):
+        self.challenge_network = challenge_network
+        self.config = challenge_network.config
+        self.config_file = config_file
+        self.src_path = src_path
+        self.shards = shards
+        self.batch_size = batch_size
+        self.logger = Logger()
+
+    def run(self, proof_type: str, private_key: str, payer_keyfile: Optional[str] = None,
+            **kwargs) -> Optional[Dict[str, Any]]:
+        """
+        Challenge the selected provers with one worker process per shard.
+
+        Args:
+            proof_type: Type of proof being requested
+            private_key: Private key of the payer, or several separated by commas
+            payer_keyfile: File of further payer keys (optional)
+            **kwargs: Run arguments, as for ChallengeNetwork.run
+
+        Returns:
+            Optional[Dict[str, Any]]: Summary per shard and in total, None if authentication failed
+        """
+        network = kwargs["network"]
+        if network not in ["testnet", "mainnet"]:
+            raise Exception("invalid value for network", network)
+        proof_config = self.config.get_proof_config(proof_type)
+        validate_inputs(proof_config)
+        payer_keys = self.challenge_network.payer_keys(private_key, payer_keyfile)
+        account = get_web3_account(payer_keys[0])
+        if len(payer_keys) >= self.shards:
+            shard_keys = [payer_keys[index::self.shards] for index in range(self.shards)]
+        else:
+            if len(payer_keys) > 1:
+                self.logger.warning(f'{len(payer_keys)} payer keys for {self.shards} shards; '
+                                    f'shards share payer accounts and may collide on nonces')
+            shard_keys = [payer_keys] * self.shards
+
+        # Logging in here first leaves cookies in the session cache for the workers
+        session = self.challenge_network.open_session(network, proof_type, account)
+        if not session:
+            return None
+
+        context = multiprocessing.get_context("spawn")
+        queues = [context.Queue(maxsize=QUEUE_BATCHES) for _ in range(self.shards)]
+        results_queue = context.Queue()
+        workers = [
+            context.Process(
+                target=_shard_main,
+                name=f'shard-{index}',
+                args=(index, self.shards, self.config_file, self.src_path, payer_keys[0],
+                      shard_keys[index], proof_type, kwargs, queues[index], results_queue),
+            )
+            for index in range(self.shards)
+        ]
+        for worker in workers:
+            worker.start()
+        self.logger.info(f'Started {self.shards} shard workers for {proof_type} on {network}')
+
+        try:
+            with session:
+                self._route(session, proof_type, queues, workers, **kwargs)
+        finally:
+            # Every shard has its end marker by now; let them finish what they were routed
+            results = self._collect(results_queue, workers)
+            for worker in workers:
+                worker.join()
+        return self._summarize(results)
+
+    def _route(self, session: Any, proof_type: str, queues: List[Any],
+               workers: List[Any], **kwargs) -> None:
+        network = kwargs["network"]
+        api_config = self.config.get_api_config(network)
+        processor = ProverProcessor(session, api_config, self.config.get_chain_config(network),
+                                    self.config.get_proof_config(proof_type), self.src_path,
+                                    cooldowns=self.challenge_network.cooldowns)
+        provers = self.challenge_network._get_provers(
+            session, api_config, proof_type, kwargs.get('prover_to_challenge', 'all'),
+            network, kwargs.get('project_name'))
+
+        batches: List[List[Dict[str, Any]]] = [[] for _ in range(self.shards)]
+        routed = 0
+        try:
+            for prover in processor.iter_selected(proof_type, provers,
+                                                  api_config.get("provers_page_size", 500), **kwargs):
+                index = shard_of(prover["id"], self.shards)
+                batches[index].append(prover)
+                routed += 1
+                if len(batches[index]) >= self.batch_size:
+                    self._put(queues[index], batches[index], workers[index])
+                    batches[index] = []
+        finally:
+            for index, batch in enumerate(batches):
+                if batch:
+                    self._put(queues[index], batch, workers[index])
+                self._put(queues[index], None, workers[index])
+        self.logger.info(f'Routed {routed} provers to {self.shards} shards')
+
+    def _put(self, shard_queue: Any, item: Any, worker: Any) -> None:
+        while True:
+            try:
+                shard_queue.put(item, timeout=1)
+                return
+            except queue.Full:
+                if not worker.is_alive():
+                    self.logger.error(f'{worker.name} exited; dropping its remaining provers')
+                    return
+
+    def _collect(self, results_queue: Any, workers: List[Any]) -> List[Dict[str, Any]]:
+        results: Dict[int, Dict[str, Any]] = {}
+        exited: Dict[int, float] = {}
+        while len(results) < len(workers):
+            try:
+                result = results_queue.get(timeout=1)
+                results[result["shard"]] = result
+                continue
+            except queue.Empty:
+                pass
+            now = time.monotonic()
+            for index, worker in enumerate(workers):
+                if index in results or worker.is_alive():
+                    continue
+                # A result sent just before exiting may still be in the pipe
+                if now - exited.setdefault(index, now) >= 5:
+                    results[index] = {"shard": index, "provers": 0, "metrics": {},
+                                      "error": f'exited with code {worker.exitcode}'}
+        return [results[index] for index in sorted(results)]
+
+    def _summarize(self, results: List[Dict[str, Any]]) -> Dict[str, Any]:
+        for result in results:
+            metrics_registry.merge(result.pop("metrics"))
+
+        snapshot = metrics_registry.snapshot()
+        ended: Counter = Counter()
+        for (_, state), count in snapshot.get("pox_challenges_ended_total", {}).items():
+            ended[state] += int(count)
+        summary = {
+            "shards": results,
+            "provers": sum(result["provers"] for result in results),
+            "triggered": int(sum(snapshot.get("pox_challenges_triggered_total", {}).values())),
+            "trigger_failed": int(sum(snapshot.get("pox_challenges_trigger_failed_total", {}).values())),
+            "ended": dict(ended),
+        }
+        failed = [result for result in results if result["error"]]
+        for result in failed:
+            self.logger.error(f'Shard {result["shard"]} failed: {result["error"]}')
+        self.logger.info(f'Sharded run finished: {summary["provers"]} provers, '
+                         f'{summary["triggered"]} challenges triggered, {summary["trigger_failed"]} failed to trigger, '
+                         f'final states {summary["ended"]}',
+                         provers=summary["provers"], triggered=summary["triggered"],
+                         trigger_failed=summary["trigger_failed"], ended=summary["ended"],
+                         failed_shards=len(failed))
+        return summary
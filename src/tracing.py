@@ -0,0 +1,196 @@
+import contextvars
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+from logger import Logger
+
+SERVICE_NAME = "pox-challenge-scheduler"
+
+_current_span: contextvars.ContextVar = contextvars.ContextVar("pox_current_span", default=None)
+
+
+class Span:
+    """A timed operation; async spans may start and end on different threads."""
+
+    __slots__ = ("tracer", "name", "span_id", "parent_id", "start_ns", "end_ns",
+                 "attributes", "thread_id", "thread_name", "is_async")
+
+    def __init__(self, tracer: "Tracer", name: str, parent: Optional["Span"],
+                 attributes: Dict[str, Any], is_async: bool):
+        self.tracer = tracer
+        self.name = name
+        self.span_id = os.urandom(8).hex()
+        self.parent_id = parent.span_id if parent else None
+        self.attributes = attributes
+        self.is_async = is_async
+        self.thread_id = threading.get_ident()
+        self.thread_name = threading.current_thread().name
+        self.start_ns = time.time_ns()
+        self.end_ns: Optional[int] = None
+
+    def set(self, **attributes: Any) -> None:
+        self.attributes.update(attributes)
+
+    def end(self, **attributes: Any) -> None:
+        if self.end_ns is not None:
+            return
+        self.attributes.update(attributes)
+        self.end_ns = time.time_ns()
+        self.tracer._record(self)
+
+
+class _NoopSpan:
+    def set(self, **attributes: Any) -> None:
+        pass
+
+    def end(self, **attributes: Any) -> None:
+        pass
+
+
+NOOP_SPAN = _NoopSpan()
+
+
+class Tracer:
+    """
+    Collects spans for one run and exports them as a trace file.
+
+    Disabled by default, in which case span() and start_span() cost one
+    attribute check. Spans nest through a context variable, so work handed to
+    another thread through bind() shows up under the span that scheduled it. Finished spans are kept in memory until export().
+    """
+
+    def __init__(self, max_spans: int = 1_000_000):
+        self.enabled = False
+        self.max_spans = max_spans
+        self.dropped = 0
+        self.trace_id = os.urandom(16).hex()
+        self.started_ns = time.time_ns()
+        self.logger = Logger()
+        self._lock = threading.Lock()
+        self._spans: List[Span] = []
+
+    def enable(self) -> None:
+        self.enabled = True
+        self.started_ns = time.time_ns()
+
+    @contextmanager
+    def span(self, name: str, **attributes: Any) -> Iterator[Any]:
+        """Time the enclosed block as a child of the current span."""
+        if not self.enabled:
+            yield NOOP_SPAN
+            return
+        span = Span(self, name, _current_span.get(), attributes, is_async=False)
+        token = _current_span.set(span)
+        try:
+            yield span
+        except BaseException as e:
+            span.set(error=f'{type(e).__name__}: {e}')
+            raise
+        finally:
+            _current_span.reset(token)
+            span.end()
+
+    def start_span(self, name: str, **attributes: Any) -> Any:
+        """Start an async span; call end() on it from wherever the operation finishes."""
+        if not self.enabled:
+            return NOOP_SPAN
+        return Span(self, name, _current_span.get(), attributes, is_async=True)
+
+    def bind(self, fn: Callable[..., Any]) -> Callable[..., Any]:
+        """Run fn, on whatever thread, as a child of the current span."""
+        if not self.enabled:
+            return fn
+        context = contextvars.copy_context()
+        return lambda *args, **kwargs: context.run(fn, *args, **kwargs)
+
+    def _record(self, span: Span) -> None:
+        with self._lock:
+            if len(self._spans) < self.max_spans:
+                self._spans.append(span)
+            else:
+                self.dropped += 1
+
+    def spans(self) -> List[Span]:
+        with self._lock:
+            return list(self._spans)
+
+    def chrome_trace(self) -> Dict[str, Any]:
+        """Chrome trace-event format, for chrome://tracing or Perfetto."""
+        pid = os.getpid()
+        events: List[Dict[str, Any]] = []
+        threads: Dict[int, str] = {}
+        for span in self.spans():
+            threads[span.thread_id] = span.thread_name
+            ts = (span.start_ns - self.started_ns) / 1000
+            args = {**span.attributes, "span_id": span.span_id, "parent_id": span.parent_id}
+            if span.is_async:
+                common = {"name": span.name, "cat": "async", "id": span.span_id,
+                          "pid": pid, "tid": span.thread_id}
+                events.append({**common, "ph": "b", "ts": ts, "args": args})
+                events.append({**common, "ph": "e", "ts": (span.end_ns - self.started_ns) / 1000})
+            else:
+                events.append({"name": span.name, "cat": "sync", "ph": "X", "ts": ts,
+                               "dur": (span.end_ns - span.start_ns) / 1000,
+                               "pid": pid, "tid": span.thread_id, "args": args})
+        events.extend({"name": "thread_name", "ph": "M", "pid": pid, "tid": tid, "args": {"name": name}}
+                      for tid, name in threads.items())
+        events.append({"name": "process_name", "ph": "M", "pid": pid, "args": {"name": SERVICE_NAME}})
+        return {"traceEvents": events, "displayTimeUnit": "ms"}
+
+    def otlp_trace(self) -> Dict[str, Any]:
+        """OTLP/JSON ExportTraceServiceRequest, for collectors and viewers that ingest OTLP files."""
+        def attribute(key: str, value: Any) -> Dict[str, Any]:
+            if isinstance(value, bool):
+                typed = {"boolValue": value}
+            elif isinstance(value, int):
+                typed = {"intValue": str(value)}
+            elif isinstance(value, float):
+                typed = {"doubleValue": value}
+            else:
+                typed = {"stringValue": str(value)}
+            return {"key": key, "value": typed}
+
+        spans = []
+        for span in self.spans():
+            attributes = {**span.attributes, "thread.id": span.thread_id, "thread.name": span.thread_name}
+            entry = {
+                "traceId": self.trace_id,
+                "spanId": span.span_id,
+                "name": span.name,
+                "kind": 1,
+                "startTimeUnixNano": str(span.start_ns),
+                "endTimeUnixNano": str(span.end_ns),
+                "attributes": [attribute(key, value) for key, value in attributes.items()
+                               if value is not None],
+            }
+            if span.parent_id:
+                entry["parentSpanId"] = span.parent_id
+            if "error" in span.attributes:
+                entry["status"] = {"code": 2, "message": str(span.attributes["error"])}
+            spans.append(entry)
+        return {"resourceSpans": [{
+            "resource": {"attributes": [attribute("service.name", SERVICE_NAME)]},
+            "scopeSpans": [{"scope": {"name": "pox.tracing"}, "spans": spans}],
+        }]}
+
+    def export(self, path: str, trace_format: Optional[str] = None) -> None:
+        """
+        Write the collected spans to path.
+
+        Args:
+            path: Output file
+            trace_format: "chrome" or "otlp" (default: otlp for *.otlp.json, chrome otherwise)
+        """
+        trace_format = trace_format or ("otlp" if path.endswith(".otlp.json") else "chrome")
+        trace = self.otlp_trace() if trace_format == "otlp" else self.chrome_trace()
+        with open(path, "w") as file:
+            json.dump(trace, file, default=str)
+        dropped = f', dropped {self.dropped}' if self.dropped else ''
+        self.logger.info(f'Wrote {len(self._spans)} spans to {path} ({trace_format}{dropped})')
+
+
+tracer = Tracer()
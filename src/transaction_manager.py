@@ -1,49 +1,356 @@
-from typing import Dict, List, Any, Optional, Tuple
-from chain import submit_transaction
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from hexbytes import HexBytes
+from typing import Callable, Dict, List, Any, Optional, Tuple
+from chain import get_contract_with_abi, sign_contract_transaction, send_signed_transaction
+from nonce_manager import NonceManager, is_already_known_error, is_stale_nonce_error
+from payer_pool import PayerPool
+from receipt_watcher import ReceiptWatcher
+from rpc_pool import RpcPool
+from metrics import TRANSACTION_RECEIPT_SECONDS
+from tracing import tracer
 from logger import Logger
 
+# Receipts are awaited off the submitting thread; shared by all transaction managers and
+# only started by the first receipt awaited without a ReceiptWatcher
+_receipt_pool: Optional[ThreadPoolExecutor] = None
+_receipt_pool_lock = threading.Lock()
+
+
+def _get_receipt_pool() -> ThreadPoolExecutor:
+    global _receipt_pool
+    with _receipt_pool_lock:
+        if _receipt_pool is None:
+            _receipt_pool = ThreadPoolExecutor(max_workers=16, thread_name_prefix="tx-receipt")
+        return _receipt_pool
+
+# Share of gas_limit a batched submitRequest is sized to use
+BATCH_GAS_HEADROOM = 0.9
+
 class TransactionManager:
     """Handles blockchain transaction preparation and submission."""
-    
-    def __init__(self, chain_config: Dict[str, Any], src_path: str):
+
+    def __init__(self, chain_config: Dict[str, Any], src_path: str,
+                 payers: Optional[PayerPool] = None):
         self.chain_config = chain_config
         self.src_path = src_path
+        self.payers = payers
         self.logger = Logger()
+        self._batch_size: Optional[int] = None
 
-    def prepare_and_submit_request_transaction(
+    def request_handler(self, connection_to_rpc: Any) -> Any:
+        return get_contract_with_abi(
+            connection_to_rpc,
+            self.src_path + self.chain_config["request_handler"]["abi_file_name_with_path"],
+            self.chain_config["request_handler"]["proxy"]
+        )
+
+    def submit_request_transaction(
+            self,
+            proof_config: Dict[str, Any],
+            connection_to_rpc: Any,
+            account: Any,
+            challenge_infos: List[bytes]
+    ) -> Tuple[bytes, int, Any]:
+        """
+        Sign and send a submitRequest transaction without waiting for it to be mined.
+
+        The nonce comes from the account's NonceManager, so many transactions can
+        be sent back-to-back. A stale nonce ("nonce too low") resyncs the manager
+        from the node and the transaction is re-signed and sent once more. A node
+        that already has the signed transaction ("already known") counts as sent,
+        so the challenge is never requested twice.
+
+        Args:
+            proof_config: Configuration for the proof type
+            connection_to_rpc: RPC connection to the blockchain
+            account: Account to submit the transaction from
+            challenge_infos: Encoded challenge information, one per challenge
+
+        Returns:
+            Tuple[bytes, int, Any]: Transaction hash, nonce used and contract instance
+        """
+        contract = self.request_handler(connection_to_rpc)
+        nonce_manager = NonceManager.for_account(self._reader(connection_to_rpc), self.chain_config["chain_id"],
+                                                 account.address)
+
+        for attempt in range(2):
+            nonce = nonce_manager.reserve()
+            signed_transaction = None
+            try:
+                with tracer.span("sign_transaction", nonce=nonce, challenges=len(challenge_infos)):
+                    signed_transaction = sign_contract_transaction(
+                        self.chain_config["chain_id"],
+                        contract,
+                        self.chain_config["gas_limit"],
+                        account,
+                        nonce,
+                        "submitRequest",
+                        proof_config["challenge_timeout_secs_minimum_default"],
+                        proof_config["attribute_ids"],
+                        challenge_infos
+                    )
+                with tracer.span("send_transaction", nonce=nonce):
+                    tx_hash = self._send(connection_to_rpc, signed_transaction)
+                return tx_hash, nonce, contract
+            except Exception as e:
+                if signed_transaction is not None and is_already_known_error(e):
+                    return signed_transaction.hash, nonce, contract
+                if attempt == 0 and is_stale_nonce_error(e):
+                    nonce_manager.finish(nonce)
+                    nonce_manager.resync()
+                    continue
+                nonce_manager.release(nonce)
+                self.logger.error(f"Error submitting transaction: {e}")
+                raise
+
+    def _pool(self) -> Optional[RpcPool]:
+        """The chain's RPC pool, None when the chain config names no endpoint."""
+        if not (self.chain_config.get("rpc_urls") or self.chain_config.get("rpc_url")):
+            return None
+        return RpcPool.for_chain_config(self.chain_config)
+
+    def _reader(self, connection_to_rpc: Any) -> Any:
+        """The pool's best endpoint right now, for nonce reads; else the given connection."""
+        pool = self._pool()
+        return pool.reader() if pool else connection_to_rpc
+
+    def _send(self, connection_to_rpc: Any, signed_transaction: Any) -> bytes:
+        """Broadcast a signed transaction, failing over across the configured RPC endpoints."""
+        pool = self._pool()
+        if not pool:
+            return send_signed_transaction(connection_to_rpc, signed_transaction)
+
+        attempts = 0
+        def send(connection: Any) -> bytes:
+            nonlocal attempts
+            attempts += 1
+            try:
+                return send_signed_transaction(connection, signed_transaction)
+            except ValueError as e:
+                # A failed-over resend of a transaction the first endpoint did accept
+                if attempts > 1 and is_already_known_error(e):
+                    return signed_transaction.hash
+                raise
+        return pool.send_with_failover(send)
+
+    def wait_for_receipt(self, connection_to_rpc: Any, account: Any, tx_hash: bytes,
+                         nonce: int) -> Future:
+        """
+        Collect a transaction receipt in the background.
+
+        Receipts come from one block-driven ReceiptWatcher per RPC pool, which
+        polls whichever endpoint ranks best at the time, or else per HTTP
+        endpoint; other providers fall back to wait_for_transaction_receipt
+        on a worker thread.
+
+        Returns:
+            Future: Resolved with the transaction receipt
+        """
+        nonce_manager = NonceManager.for_account(self._reader(connection_to_rpc), self.chain_config["chain_id"],
+                                                 account.address)
+
+        pool = self._pool()
+        rpc_url = getattr(connection_to_rpc.provider, "endpoint_uri", None)
+        watcher = (ReceiptWatcher.for_pool(pool) if pool
+                   else ReceiptWatcher.for_endpoint(rpc_url) if rpc_url else None)
+        if watcher:
+            receipt_future = watcher.watch(tx_hash)
+            receipt_future.add_done_callback(lambda _: nonce_manager.finish(nonce))
+            return receipt_future
+
+        def wait() -> Dict:
+            try:
+                return connection_to_rpc.eth.wait_for_transaction_receipt(tx_hash)
+            finally:
+                nonce_manager.finish(nonce)
+
+        return _get_receipt_pool().submit(wait)
+
+    def max_batch_size(
             self,
             proof_config: Dict[str, Any],
             connection_to_rpc: Any,
             account: Any,
             challenge_info: bytes
+    ) -> int:
+        """
+        Number of challenges that fit in one submitRequest under gas_limit.
+
+        The per-challenge gas comes from gas_per_challenge in the chain config,
+        or else from estimating one- and two-challenge requests. The result is
+        capped at max_batch_size and computed once per transaction manager.
+
+        Args:
+            proof_config: Configuration for the proof type
+            connection_to_rpc: RPC connection to the blockchain
+            account: Account the transactions are sent from
+            challenge_info: A representative encoded challenge
+
+        Returns:
+            int: Batch size, at least 1
+        """
+        if self._batch_size is not None:
+            return self._batch_size
+
+        gas_limit = self.chain_config["gas_limit"] * BATCH_GAS_HEADROOM
+        try:
+            if "gas_per_challenge" in self.chain_config:
+                per_challenge = self.chain_config["gas_per_challenge"]
+                base = self.chain_config.get("gas_per_request", 0)
+            else:
+                contract = self.request_handler(connection_to_rpc)
+                def estimate(count: int) -> int:
+                    return contract.functions.submitRequest(
+                        proof_config["challenge_timeout_secs_minimum_default"],
+                        proof_config["attribute_ids"],
+                        [challenge_info] * count
+                    ).estimate_gas({"from": account.address, "gasPrice": 0})
+                one, two = estimate(1), estimate(2)
+                per_challenge = max(two - one, 1)
+                base = one - per_challenge
+            fits = int((gas_limit - base) // per_challenge)
+        except Exception as e:
+            self.logger.warning(f"Unable to size submitRequest batches, sending one challenge each: {e}")
+            fits = 1
+
+        self._batch_size = max(1, min(fits, self.chain_config.get("max_batch_size", 50)))
+        self.logger.info(f"Batching up to {self._batch_size} challenges per submitRequest")
+        return self._batch_size
+
+    def submit_request_transaction_async(
+            self,
+            proof_config: Dict[str, Any],
+            connection_to_rpc: Any,
+            account: Any,
+            challenge_info: bytes,
+            on_sent: Optional[Callable[[str], None]] = None
+    ) -> Future:
+        """
+        Send a challenge request transaction and return without waiting for the receipt.
+
+        Args:
+            on_sent: Called with the 0x-prefixed transaction hash as soon as the
+                node has accepted the transaction, before its receipt is awaited (optional)
+
+        Returns:
+            Future: Resolved with (receipt, contract)
+        """
+        return self._submit_async(proof_config, connection_to_rpc, account, [challenge_info], on_sent)
+
+    def submit_batch_request_transactions_async(
+            self,
+            proof_config: Dict[str, Any],
+            connection_to_rpc: Any,
+            account: Any,
+            challenge_infos: List[bytes],
+            on_sent: Optional[Callable[[str, range], None]] = None
+    ) -> List[Tuple[Future, range]]:
+        """
+        Pack many encoded challenges into as few submitRequest transactions as fit under gas_limit.
+
+        With a payer pool, each transaction is sent from the account the pool
+        picks, so the batches go out on several nonce sequences at once.
+
+        Args:
+            proof_config: Configuration for the proof type
+            connection_to_rpc: RPC connection to the blockchain
+            account: Account to submit the transactions from, or to size batches with a payer pool
+            challenge_infos: Encoded challenge information, one per prover
+            on_sent: Called with each transaction's hash and the indices it carries
+                as soon as it is sent, before its receipt is awaited (optional)
+
+        Returns:
+            List[Tuple[Future, range]]: Per transaction, a future resolved with
+            (receipt, contract) and the indices into challenge_infos it carries;
+            a transaction that could not be sent has a future holding the error
+        """
+        if not challenge_infos:
+            return []
+        batch_size = self.max_batch_size(proof_config, connection_to_rpc, account, challenge_infos[0])
+        batches = []
+        for start in range(0, len(challenge_infos), batch_size):
+            indices = range(start, min(start + batch_size, len(challenge_infos)))
+            try:
+                future = self._submit_async(
+                    proof_config, connection_to_rpc, account, challenge_infos[indices.start:indices.stop],
+                    on_sent and (lambda tx_hash, indices=indices: on_sent(tx_hash, indices)))
+            except Exception as e:
+                # Keep the batches already sent so their challenges are still triggered
+                future = Future()
+                future.set_exception(e)
+            batches.append((future, indices))
+        return batches
+
+    def _submit_async(
+            self,
+            proof_config: Dict[str, Any],
+            connection_to_rpc: Any,
+            account: Any,
+            challenge_infos: List[bytes],
+            on_sent: Optional[Callable[[str], None]] = None
+    ) -> Future:
+        sent = time.perf_counter()
+        if self.payers:
+            account = self.payers.acquire(connection_to_rpc)
+        try:
+            tx_hash, nonce, contract = self.submit_request_transaction(
+                proof_config, connection_to_rpc, account, challenge_infos)
+        except Exception:
+            if self.payers:
+                self.payers.release(account)
+            raise
+        if on_sent:
+            try:
+                on_sent(HexBytes(tx_hash).hex())
+            except Exception as e:
+                self.logger.error(f"Error recording sent transaction {HexBytes(tx_hash).hex()}: {e}")
+        receipt_future = self.wait_for_receipt(connection_to_rpc, account, tx_hash, nonce)
+        span = tracer.start_span("transaction_receipt", tx_hash=HexBytes(tx_hash).hex(), nonce=nonce,
+                                 payer=account.address)
+
+        result: Future = Future()
+        def on_receipt(done: Future) -> None:
+            if self.payers:
+                self.payers.release(account)
+            if done.exception():
+                span.end(error=str(done.exception()))
+                TRANSACTION_RECEIPT_SECONDS.labels("error").observe(time.perf_counter() - sent)
+                result.set_exception(done.exception())
+            else:
+                status = "success" if done.result().get("status") == 1 else "reverted"
+                span.end(status=status)
+                TRANSACTION_RECEIPT_SECONDS.labels(status).observe(time.perf_counter() - sent)
+                result.set_result((done.result(), contract))
+        receipt_future.add_done_callback(on_receipt)
+        return result
+
+    def prepare_and_submit_request_transaction(
+            self,
+            proof_config: Dict[str, Any],
+            connection_to_rpc: Any,
+            account: Any,
+            challenge_info: bytes,
+            on_sent: Optional[Callable[[str], None]] = None
     ) -> Tuple[Dict, Any]:
         """
         Prepare and submit a blockchain transaction for a challenge request.
-        
+
         Args:
             proof_config: Configuration for the proof type
             connection_to_rpc: RPC connection to the blockchain
             account: Account to submit the transaction from
             challenge_info: Encoded challenge information
-            
+            on_sent: Called with the transaction hash once sent, before the receipt is awaited (optional)
+
         Returns:
             Tuple[Dict, Any]: Transaction receipt and contract instance
         """
-        try:
-            receipt, contract = submit_transaction(
-                self.chain_config["chain_id"],
-                connection_to_rpc,
-                self.chain_config["gas_limit"],
-                account,
-                self.chain_config["request_handler"]["proxy"],
-                self.src_path + self.chain_config["request_handler"]["abi_file_name_with_path"],
-                "submitRequest",
-                proof_config["challenge_timeout_secs_minimum_default"],
-                proof_config["attribute_ids"],
-                [challenge_info]
-            )
-            return receipt, contract
-            
-        except Exception as e:
-            self.logger.error(f"Error submitting transaction: {e}")
-            raise
\ No newline at end of file
+        return self.submit_request_transaction_async(
+            proof_config,
+            connection_to_rpc,
+            account,
+            challenge_info,
+            on_sent
+        ).result()
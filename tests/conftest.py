@@ -0,0 +1,20 @@
+import os
+import sys
+import tempfile
+
+import pytest
+
+# Modules in src/ import each other top-level, as when run from that directory
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src"))
+
+from logger import Logger  # noqa: E402
+
+# Set up before any test module imports one that logs at import time (api), so the
+# process-wide Logger writes to a temporary directory instead of the working one
+Logger(tempfile.mkdtemp(prefix="pox-test-logs-"))
+
+
+@pytest.fixture(autouse=True, scope="session")
+def logger():
+    yield Logger()
+    Logger.shutdown()
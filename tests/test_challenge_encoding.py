@@ -0,0 +1,97 @@
+import random
+
+import eth_abi
+import pytest
+from eth_abi.exceptions import EncodingTypeError, ValueOutOfBounds
+from eth_utils import to_checksum_address
+
+from challenge_encoding import POB_ENCODER, POL_ENCODER, StaticTupleEncoder
+
+ENCODERS = {"pol": POL_ENCODER, "pob": POB_ENCODER}
+CHECKS = 2_000
+
+
+def random_values(rng, types):
+    """Random values for a layout, biased towards the edges of each type's range."""
+    values = []
+    for abi_type in types:
+        if abi_type == "address":
+            address = f'0x{rng.getrandbits(160):040x}'
+            values.append(rng.choice([address, address.upper().replace("0X", "0x"),
+                                      to_checksum_address(address), bytes.fromhex(address[2:])]))
+        elif abi_type == "bool":
+            values.append(rng.random() < 0.5)
+        elif abi_type.startswith("uint"):
+            values.append(rng.choice([0, 1, 2**63, 2**64 - 1, 2**64, 2**256 - 1,
+                                      rng.getrandbits(rng.randint(1, 256))]))
+        else:
+            values.append(rng.choice([0, -1, 2**63 - 1, 2**63, -2**63, -2**63 - 1, 2**255 - 1, -2**255,
+                                      rng.getrandbits(rng.randint(1, 255)) * rng.choice([1, -1])]))
+    return values
+
+
+@pytest.mark.parametrize("name", sorted(ENCODERS))
+def test_encode_matches_eth_abi(name):
+    encoder = ENCODERS[name]
+    types = list(encoder.types)
+    rng = random.Random(name)
+    for _ in range(CHECKS):
+        values = random_values(rng, types)
+        assert encoder.encode(values) == eth_abi.encode(types, values), values
+
+
+@pytest.mark.parametrize("name", sorted(ENCODERS))
+def test_encode_into_writes_at_offset(name):
+    encoder = ENCODERS[name]
+    types = list(encoder.types)
+    values = random_values(random.Random(name), types)
+    buffer = bytearray(b"\xaa" * (encoder.size + 64))
+    encoder.encode_into(buffer, 32, values)
+    assert buffer[:32] == b"\xaa" * 32
+    assert buffer[32:32 + encoder.size] == eth_abi.encode(types, values)
+    assert buffer[32 + encoder.size:] == b"\xaa" * 32
+
+
+@pytest.mark.parametrize("name", sorted(ENCODERS))
+def test_encode_many_matches_eth_abi(name):
+    encoder = ENCODERS[name]
+    types = list(encoder.types)
+    rng = random.Random(name)
+    rows = [random_values(rng, types) for _ in range(200)]
+    assert encoder.encode_many(rows) == [eth_abi.encode(types, values) for values in rows]
+    assert encoder.encode_many(iter(rows)) == encoder.encode_many(rows)
+    assert encoder.encode_many([]) == []
+
+
+@pytest.mark.parametrize("abi_type, value", [
+    ("address", "0x1234"),
+    ("address", "0x" + "zz" * 20),
+    ("address", "0x" + "aB" * 20),
+    ("address", b"\x00" * 19),
+    ("address", 1),
+    ("bool", 1),
+    ("bool", None),
+    ("uint256", True),
+    ("uint256", 1.0),
+    ("uint256", "1"),
+    ("uint256", -1),
+    ("uint256", 2**256),
+    ("int256", 2**255),
+    ("int256", -2**255 - 1),
+    ("int256", None),
+])
+def test_rejects_what_eth_abi_rejects(abi_type, value):
+    with pytest.raises((EncodingTypeError, ValueOutOfBounds)):
+        eth_abi.encode([abi_type], [value])
+    with pytest.raises((EncodingTypeError, ValueOutOfBounds)):
+        StaticTupleEncoder([abi_type]).encode([value])
+
+
+def test_rejects_wrong_value_count():
+    with pytest.raises(EncodingTypeError):
+        POL_ENCODER.encode([0] * (len(POL_ENCODER.types) - 1))
+
+
+def test_rejects_dynamic_types():
+    with pytest.raises(ValueError):
+        StaticTupleEncoder(["address", "bytes"])
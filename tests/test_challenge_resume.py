@@ -0,0 +1,293 @@
+import json
+import multiprocessing
+import os
+import sqlite3
+from concurrent.futures import Future
+
+import eth_abi
+import pytest
+from eth_account import Account
+from eth_utils import event_abi_to_log_topic
+from hexbytes import HexBytes
+from web3 import Web3
+from web3.datastructures import AttributeDict
+from web3.exceptions import TransactionNotFound
+
+import challenge_handler
+from challenge_journal import ChallengeJournal
+from event_indexer import EventIndexer
+from prover_processor import ProverProcessor
+
+SRC_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src") + "/"
+PROXY = Web3.to_checksum_address("0x" + "11" * 20)
+TX_HASH = "0x" + "ab" * 32
+ACCOUNT = Account.from_key("0x" + "01" * 32)
+
+CHAIN_CONFIG = {
+    "submit_on_chain": True,
+    "chain_id": 1,
+    "gas_limit": 10_000_000,
+    "request_handler": {"abi_file_name_with_path": "abi/request_handler.abi", "proxy": PROXY},
+    "prover_registry": {"proxy": "0x" + "22" * 20},
+}
+PROOF_CONFIG = {
+    "number_challengers_default": 2,
+    "challengers_tolerance_default": 0,
+    "challenge_timeout_secs_minimum_default": 1000000000,
+    "attribute_ids": ["pol-v1.witnesschain.com"],
+    "alive_check_minutes": 240,
+}
+RUN = {"network": "testnet", "account": ACCOUNT, "selected": True}
+
+
+def prover(index):
+    return {"id": f"IPv4/0x{index:040x}", "projectName": "x", "last_alive": None,
+            "claims": {"latitude": 1.5, "longitude": -2.5}}
+
+
+class Node:
+    """Stand-in chain connection: transactions and receipts by hash."""
+
+    def __init__(self):
+        self.w3 = Web3()
+        self.transactions, self.receipts = {}, {}
+        self.w3.eth.get_transaction = lambda tx_hash: self._find(self.transactions, tx_hash)
+        self.w3.eth.get_transaction_receipt = lambda tx_hash: self._find(self.receipts, tx_hash)
+
+    @staticmethod
+    def _find(table, tx_hash):
+        found = table.get(HexBytes(tx_hash).hex())
+        if found is None:
+            raise TransactionNotFound(f"{tx_hash} not found")
+        return found
+
+    def get_rpc(self):
+        return self.w3
+
+    def contract(self):
+        with open(SRC_PATH + "abi/request_handler.abi") as file:
+            return self.w3.eth.contract(address=PROXY, abi=json.load(file))
+
+    def send(self, tx_hash, challenge_infos):
+        self.transactions[tx_hash] = {"input": self.contract().encodeABI(
+            fn_name="submitRequest",
+            args=[PROOF_CONFIG["challenge_timeout_secs_minimum_default"], PROOF_CONFIG["attribute_ids"],
+                  challenge_infos])}
+
+    def log(self, event, topics, data, tx_hash, block=1):
+        event_abi = getattr(self.contract().events, event)().abi
+        return AttributeDict({
+            "address": PROXY, "topics": [event_abi_to_log_topic(event_abi), *topics], "data": data,
+            "blockNumber": block, "blockHash": bytes([block]) * 32, "transactionHash": HexBytes(tx_hash),
+            "transactionIndex": 0, "logIndex": 0,
+        })
+
+    def processed_log(self, tx_hash, request_id, new_challenges):
+        return self.log("RequestProcessed", [request_id.to_bytes(32, "big")],
+                        eth_abi.encode(["uint256[]", "string[]"], [new_challenges, PROOF_CONFIG["attribute_ids"]]),
+                        tx_hash)
+
+    def timeout_log(self, request_id):
+        return self.log("RequestTimeout", [], eth_abi.encode(["uint256"], [request_id]), "0x" + "cd" * 32, 2)
+
+    def mine(self, tx_hash, request_id, new_challenges, status=1):
+        self.receipts[tx_hash] = AttributeDict({"logs": [self.processed_log(tx_hash, request_id, new_challenges)],
+                                                "status": status, "transactionHash": HexBytes(tx_hash)})
+
+
+class Poller:
+    def __init__(self):
+        self.registered = []
+
+    def register(self, proof_type, challenge_id, prover_id, status=None, challenge_type=None, on_end=None):
+        self.registered.append(challenge_id)
+        future = Future()
+        future.set_result(status)
+        return future
+
+
+def make_processor(journal, node, indexer=None):
+    processor = ProverProcessor(None, {}, CHAIN_CONFIG, PROOF_CONFIG, SRC_PATH, Poller(), node, journal,
+                                indexer=indexer)
+    submitted = []
+
+    def submit_request_transaction(proof_config, connection, account, challenge_infos):
+        submitted.append(list(challenge_infos))
+        return HexBytes(TX_HASH), 0, node.contract()
+    challenge = processor._get_challenge("pol")
+    challenge.transaction_manager.submit_request_transaction = submit_request_transaction
+    return processor, challenge, submitted
+
+
+def encoded_challenge(processor, index):
+    params = processor._prepare_challenge_params("pol", prover(index), False)
+    return processor._get_challenge("pol").encode_challenge(f"0x{index:040x}", **params)
+
+
+def crash_before_receipt(journal_path, index):
+    journal = ChallengeJournal(journal_path)
+    processor, challenge, _ = make_processor(journal, Node())
+
+    def wait_for_receipt(*args):
+        # The process dies after the node accepted the transaction, before any receipt
+        os._exit(9)
+    challenge.transaction_manager.wait_for_receipt = wait_for_receipt
+    processor.process_prover("pol", prover(index), **RUN)
+
+
+def stages(journal_path):
+    with sqlite3.connect(journal_path) as db:
+        return [row[0] for row in db.execute("SELECT stage FROM journal ORDER BY seq")]
+
+
+def final_state(journal_path):
+    with sqlite3.connect(journal_path) as db:
+        return db.execute("SELECT stage, state FROM journal ORDER BY seq DESC LIMIT 1").fetchone()
+
+
+@pytest.fixture
+def crashed_run(tmp_path):
+    journal_path = str(tmp_path / "journal.db")
+    child = multiprocessing.get_context("fork").Process(target=crash_before_receipt, args=(journal_path, 5))
+    child.start()
+    child.join(30)
+    assert child.exitcode == 9
+    assert stages(journal_path) == ["SELECTED", "SUBMITTED"]
+    return journal_path
+
+
+@pytest.fixture
+def triggered(monkeypatch):
+    calls = []
+
+    def request_challenge(session, api_config, proof_type, prover, challenge_id, challenge_type="NA",
+                          challenger_count=1):
+        calls.append((prover, challenge_id))
+        return {"result": {"challenge_id": challenge_id, "challenge_status": "ACCEPTED"}}
+    monkeypatch.setattr(challenge_handler, "request_challenge", request_challenge)
+    return calls
+
+
+def resume(processor):
+    return processor.challenge_handler.resume(
+        "testnet", "pol", None, lambda entry: processor.resume_submitted("pol", entry, **RUN))
+
+
+def test_resume_after_crash_reads_request_back_instead_of_resubmitting(crashed_run, triggered):
+    node = Node()
+    journal = ChallengeJournal(crashed_run)
+    processor, _, submitted = make_processor(journal, node)
+    node.send(TX_HASH, [encoded_challenge(processor, 5)])
+    node.mine(TX_HASH, 7, [101, 102])
+
+    futures = resume(processor)
+
+    assert submitted == []
+    assert [future.result() for future in futures] == [["ACCEPTED", "ACCEPTED"]]
+    assert triggered == [(prover(5)["id"], 101), (prover(5)["id"], 102)]
+    assert stages(crashed_run).count("REQUESTED") == 2
+    journal.close()
+
+
+def test_resume_leaves_pending_transaction_open(crashed_run, triggered):
+    node = Node()
+    journal = ChallengeJournal(crashed_run)
+    processor, _, submitted = make_processor(journal, node)
+    node.send(TX_HASH, [encoded_challenge(processor, 5)])
+
+    assert resume(processor) == []
+    assert submitted == [] and triggered == []
+    assert "ABANDONED" not in stages(crashed_run)
+    # Held by this run, so the sweep doesn't challenge the prover again either
+    assert journal.tracked_provers("testnet", "pol") == {prover(5)["id"]}
+    journal.close()
+
+
+@pytest.mark.parametrize("status, state", [(0, "REVERTED"), (None, "DROPPED")])
+def test_resume_abandons_failed_transaction(crashed_run, triggered, status, state):
+    node = Node()
+    journal = ChallengeJournal(crashed_run)
+    processor, _, submitted = make_processor(journal, node)
+    if status is not None:
+        node.send(TX_HASH, [encoded_challenge(processor, 5)])
+        node.mine(TX_HASH, 7, [], status=status)
+
+    assert resume(processor) == []
+    assert submitted == [] and triggered == []
+    assert stages(crashed_run)[-1] == "ABANDONED"
+    journal.close()
+
+
+def test_find_request_maps_batched_challenges_to_their_prover():
+    node = Node()
+    processor, challenge, _ = make_processor(None, node)
+    node.send(TX_HASH, [encoded_challenge(processor, index) for index in (1, 2, 3)])
+    node.mine(TX_HASH, 9, [11, 12, 21, 22, 31, 32])
+
+    assert challenge.find_request(TX_HASH, f"0x{2:040x}") == (None, 9, [21, 22])
+
+
+def test_receipt_failure_after_send_keeps_entry_for_resume(tmp_path):
+    journal = ChallengeJournal(str(tmp_path / "journal.db"))
+    processor, challenge, submitted = make_processor(journal, Node())
+
+    def wait_for_receipt(*args):
+        future = Future()
+        future.set_exception(TimeoutError("no receipt"))
+        return future
+    challenge.transaction_manager.wait_for_receipt = wait_for_receipt
+
+    assert processor.process_prover("pol", prover(5), **RUN) is None
+    assert len(submitted) == 1
+    assert stages(journal.path) == ["SELECTED", "SUBMITTED"]
+    journal.close()
+
+
+@pytest.fixture
+def indexer(tmp_path):
+    node = Node()
+    indexer = EventIndexer(node.w3, SRC_PATH + CHAIN_CONFIG["request_handler"]["abi_file_name_with_path"],
+                           PROXY, str(tmp_path / "events.db"))
+    yield indexer
+    indexer.close()
+
+
+def test_resume_abandons_request_the_index_saw_time_out(crashed_run, triggered, indexer):
+    node = Node()
+    journal = ChallengeJournal(crashed_run)
+    processor, _, submitted = make_processor(journal, node, indexer)
+    # The node has pruned the transaction, but the index saw it processed and timed out
+    indexer._store([node.processed_log(TX_HASH, 7, [101, 102]), node.timeout_log(7)], 2)
+
+    assert resume(processor) == []
+    assert submitted == [] and triggered == []
+    assert final_state(crashed_run) == ("ABANDONED", "TIMEOUT")
+    journal.close()
+
+
+def test_resume_checks_the_recovered_request_in_the_index(crashed_run, triggered, indexer):
+    node = Node()
+    journal = ChallengeJournal(crashed_run)
+    processor, _, submitted = make_processor(journal, node, indexer)
+    node.send(TX_HASH, [encoded_challenge(processor, 5)])
+    node.mine(TX_HASH, 7, [101, 102])
+    # Only the timeout is indexed, e.g. the request was processed before the index's start block
+    indexer._store([node.timeout_log(7)], 2)
+
+    assert resume(processor) == []
+    assert triggered == []
+    assert final_state(crashed_run) == ("ABANDONED", "TIMEOUT")
+    journal.close()
+
+
+def test_resume_triggers_request_the_index_saw_processed(crashed_run, triggered, indexer):
+    node = Node()
+    journal = ChallengeJournal(crashed_run)
+    processor, _, _ = make_processor(journal, node, indexer)
+    node.send(TX_HASH, [encoded_challenge(processor, 5)])
+    node.mine(TX_HASH, 7, [101, 102])
+    indexer._store([node.processed_log(TX_HASH, 7, [101, 102])], 1)
+
+    assert [future.result() for future in resume(processor)] == [["ACCEPTED", "ACCEPTED"]]
+    assert triggered == [(prover(5)["id"], 101), (prover(5)["id"], 102)]
+    journal.close()
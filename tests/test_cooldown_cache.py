@@ -0,0 +1,67 @@
+import multiprocessing
+
+from cooldown_cache import CooldownCache
+
+ADDRESSES = [f"0x{index:040x}" for index in range(200)]
+
+
+def claim_all(path, start, results):
+    cooldowns = CooldownCache(path)
+    start.wait(30)
+    won = [address for address in ADDRESSES if cooldowns.claim("testnet", "pol", address) is not None]
+    cooldowns.close()
+    results.put(won)
+
+
+def test_exactly_one_claimer_wins_each_prover(tmp_path):
+    path = str(tmp_path / "cooldown.db")
+    CooldownCache(path).close()
+    context = multiprocessing.get_context("fork")
+    start, results = context.Event(), context.Queue()
+    claimers = [context.Process(target=claim_all, args=(path, start, results)) for _ in range(4)]
+    for claimer in claimers:
+        claimer.start()
+    start.set()
+    won = [results.get(timeout=60) for _ in claimers]
+    for claimer in claimers:
+        claimer.join(30)
+        assert claimer.exitcode == 0
+
+    assert sorted(address for addresses in won for address in addresses) == ADDRESSES
+
+
+def test_release_lets_the_prover_be_claimed_again(tmp_path):
+    cooldowns = CooldownCache(str(tmp_path / "cooldown.db"))
+    claimed_at = cooldowns.claim("testnet", "pol", ADDRESSES[0].upper().replace("0X", "0x"))
+    assert claimed_at is not None
+    assert cooldowns.claim("testnet", "pol", ADDRESSES[0]) is None
+    assert cooldowns.claim("mainnet", "pol", ADDRESSES[0]) is not None
+    assert ADDRESSES[0] in cooldowns.cooling("testnet", "pol")
+
+    cooldowns.release("testnet", "pol", ADDRESSES[0], claimed_at)
+    assert ADDRESSES[0] not in cooldowns.cooling("testnet", "pol")
+    assert cooldowns.claim("testnet", "pol", ADDRESSES[0]) is not None
+    cooldowns.close()
+
+
+def count(cooldowns):
+    return cooldowns._db.execute("SELECT COUNT(*) FROM cooldowns").fetchone()[0]
+
+
+def test_evicts_on_an_interval(tmp_path, monkeypatch):
+    cooldowns = CooldownCache(str(tmp_path / "cooldown.db"), max_entries=10, evict_seconds=60)
+    now = [1000.0]
+    monkeypatch.setattr("cooldown_cache.time.time", lambda: now[0])
+    for address in ADDRESSES[:50]:
+        now[0] += 0.1
+        cooldowns.claim("testnet", "pol", address)
+    # Evicted on the first claim only, so the table grew past max_entries in between
+    assert count(cooldowns) == 50
+
+    now[0] += 60
+    cooldowns.claim("testnet", "pol", ADDRESSES[50])
+    assert count(cooldowns) == 10
+    # The least recently claimed went first
+    assert cooldowns.claim("testnet", "pol", ADDRESSES[0]) is not None
+    assert cooldowns.claim("testnet", "pol", ADDRESSES[50]) is None
+    cooldowns.close()
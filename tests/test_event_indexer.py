@@ -0,0 +1,38 @@
+import pytest
+import requests
+
+from event_indexer import is_range_error
+
+
+def http_error(status):
+    response = requests.Response()
+    response.status_code = status
+    return requests.exceptions.HTTPError(f"{status} Client Error", response=response)
+
+
+@pytest.mark.parametrize("message", [
+    "exceed maximum block range: 5000",
+    "Log response size exceeded. You can make eth_getLogs requests with up to a 2K block range",
+    "query returned more than 10000 results",
+    "eth_getLogs is limited to a 10,000 block range",
+    "block range is too wide",
+    "logs matched by query exceeds limit of 10000",
+])
+def test_range_errors(message):
+    assert is_range_error(ValueError({"code": -32005, "message": message}))
+
+
+@pytest.mark.parametrize("error", [
+    ValueError({"code": -32005, "message": "project ID request rate exceeded"}),
+    ValueError({"code": 429, "message": "Your app has exceeded its compute units per second capacity"}),
+    ValueError("rate limit exceeded, retry in 1s"),
+    http_error(429),
+    ValueError({"code": -32000, "message": "execution reverted"}),
+    ConnectionError("connection reset"),
+])
+def test_rate_limits_and_other_errors_are_not_range_errors(error):
+    assert not is_range_error(error)
+
+
+def test_timeouts_shrink_the_range():
+    assert is_range_error(requests.exceptions.ReadTimeout("read timed out"))
@@ -0,0 +1,40 @@
+import pytest
+
+import api
+from api import ProverListError, iter_provers
+
+
+def paged(pages):
+    """get_provers stand-in answering page by page; an exception or None fails that page."""
+    calls = []
+
+    def get_provers(session, api_config, proof_type, skip=0, limit=10000):
+        calls.append(skip)
+        page = pages[len(calls) - 1]
+        if isinstance(page, Exception):
+            raise page
+        return page if page is None else {"provers": page}
+    return get_provers, calls
+
+
+def provers(start, count):
+    return [{"id": f"IPv4/0x{index:040x}"} for index in range(start, start + count)]
+
+
+def test_yields_every_page(monkeypatch):
+    get_provers, calls = paged([provers(0, 2), provers(2, 2), provers(4, 1)])
+    monkeypatch.setattr(api, "get_provers", get_provers)
+    assert list(iter_provers(None, {}, "pol", page_size=2)) == provers(0, 5)
+    assert calls == [0, 2, 4]
+
+
+@pytest.mark.parametrize("failure", [None, ConnectionError("connection reset")],
+                         ids=["non-200", "request error"])
+def test_failed_page_raises_after_earlier_pages(monkeypatch, failure):
+    get_provers, _ = paged([provers(0, 2), failure])
+    monkeypatch.setattr(api, "get_provers", get_provers)
+    seen = []
+    with pytest.raises(ProverListError):
+        for prover in iter_provers(None, {}, "pol", page_size=2):
+            seen.append(prover)
+    assert seen == provers(0, 2)
@@ -0,0 +1,49 @@
+import pytest
+
+from metrics import LATEST, MAX, MetricsRegistry
+
+
+def shard_snapshots(merge, *values):
+    """One snapshot per shard process, each having set the same gauge, in order."""
+    snapshots = []
+    for value in values:
+        shard = MetricsRegistry()
+        shard.gauge("g", "gauge", ["account"], merge=merge).labels("0xa").set(value)
+        shard.counter("c", "counter").inc(value)
+        snapshots.append(shard.snapshot())
+    return snapshots
+
+
+def merged(merge, *values):
+    parent = MetricsRegistry()
+    gauge = parent.gauge("g", "gauge", ["account"], merge=merge)
+    counter = parent.counter("c", "counter")
+    for snapshot in shard_snapshots(merge, *values):
+        parent.merge(snapshot)
+    return gauge.labels("0xa").value, counter.labels().value
+
+
+def test_additive_gauges_and_counters_are_summed():
+    assert merged("sum", 1, 2, 3) == (6, 6)
+
+
+def test_state_gauge_keeps_latest_update():
+    assert merged(LATEST, 1, 0) == (0, 1)
+    assert merged(LATEST, 0, 1) == (1, 1)
+
+
+def test_state_gauge_keeps_max():
+    assert merged(MAX, 5, 9, 7) == (9, 21)
+
+
+def test_latest_ignores_older_snapshot():
+    parent = MetricsRegistry()
+    gauge = parent.gauge("g", "gauge", ["account"], merge=LATEST)
+    gauge.labels("0xa").set(3)
+    parent.merge({"g": {("0xa",): (10, gauge.labels("0xa").updated - 1)}})
+    assert gauge.labels("0xa").value == 3
+
+
+def test_unknown_merge_mode():
+    with pytest.raises(ValueError):
+        MetricsRegistry().gauge("g", "gauge", merge="avg")
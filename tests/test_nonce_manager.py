@@ -0,0 +1,105 @@
+import threading
+
+import pytest
+
+from nonce_manager import NonceManager
+
+ADDRESS = "0x" + "aB" * 20
+OTHER = "0x" + "cd" * 20
+
+
+class Eth:
+    """Stand-in web3 eth: pending transaction counts per account."""
+
+    def __init__(self, counts=None):
+        self.counts = dict(counts or {})
+        self.calls = 0
+
+    def get_transaction_count(self, address, block_identifier):
+        assert block_identifier == "pending"
+        self.calls += 1
+        return self.counts.get(address.lower(), 0)
+
+
+class Connection:
+    def __init__(self, counts=None):
+        self.eth = Eth(counts)
+
+
+@pytest.fixture(autouse=True)
+def fresh_instances(monkeypatch):
+    monkeypatch.setattr(NonceManager, "_instances", {})
+
+
+def test_concurrent_reservations_are_unique_and_gap_free():
+    connection = Connection({ADDRESS.lower(): 7})
+    manager = NonceManager(connection, ADDRESS)
+    nonces, start = [], threading.Barrier(8)
+
+    def reserve():
+        start.wait()
+        reserved = [manager.reserve() for _ in range(50)]
+        nonces.extend(reserved)
+    threads = [threading.Thread(target=reserve) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert sorted(nonces) == list(range(7, 7 + 400))
+    assert manager.pending == 400
+    # Only the first reservation asked the node
+    assert connection.eth.calls == 1
+
+
+def test_released_nonces_are_reused_first():
+    manager = NonceManager(Connection(), ADDRESS)
+    assert [manager.reserve() for _ in range(5)] == [0, 1, 2, 3, 4]
+    manager.release(2)
+    manager.release(4)
+    assert [manager.reserve() for _ in range(3)] == [2, 4, 5]
+
+
+def test_resync_after_a_dropped_transaction():
+    connection = Connection()
+    manager = NonceManager(connection, ADDRESS)
+    assert [manager.reserve() for _ in range(4)] == [0, 1, 2, 3]
+    manager.release(3)
+    # Nonce 1 was dropped: the node only holds 0, so 2 can never be mined
+    connection.eth.counts[ADDRESS.lower()] = 1
+    manager.finish(1)
+
+    assert manager.resync() == 1
+    assert [manager.reserve() for _ in range(3)] == [1, 2, 3]
+
+
+def test_resync_drops_released_nonces_the_node_has_used():
+    connection = Connection()
+    manager = NonceManager(connection, ADDRESS)
+    assert [manager.reserve() for _ in range(4)] == [0, 1, 2, 3]
+    manager.release(1)
+    # Another process sent 0..2 from the same account meanwhile
+    connection.eth.counts[ADDRESS.lower()] = 3
+    assert manager.resync() == 3
+    assert manager.reserve() == 3
+
+
+def test_for_account_is_per_chain_and_account():
+    connection = Connection({ADDRESS.lower(): 10, OTHER: 20})
+    manager = NonceManager.for_account(connection, 1, ADDRESS)
+
+    assert NonceManager.for_account(connection, 1, ADDRESS.lower()) is manager
+    assert NonceManager.for_account(connection, 5, ADDRESS) is not manager
+    other = NonceManager.for_account(connection, 1, OTHER)
+    assert other is not manager
+    assert [manager.reserve(), other.reserve(), manager.reserve(), other.reserve()] == [10, 20, 11, 21]
+
+
+def test_for_account_reads_through_the_latest_connection():
+    first, second = Connection({ADDRESS.lower(): 3}), Connection({ADDRESS.lower(): 9})
+    manager = NonceManager.for_account(first, 1, ADDRESS)
+    assert manager.reserve() == 3
+
+    NonceManager.for_account(second, 1, ADDRESS)
+    assert manager.resync() == 9
+    assert (first.eth.calls, second.eth.calls) == (1, 1)
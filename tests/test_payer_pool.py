@@ -0,0 +1,134 @@
+import pytest
+from eth_account import Account
+
+import payer_pool
+from nonce_manager import NonceManager
+from payer_pool import NoHealthyPayerError, PayerPool, load_private_keys
+
+ACCOUNTS = [Account.from_key("0x" + f"{index:02x}" * 32) for index in range(1, 4)]
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def monotonic(self):
+        return self.now
+
+
+class Eth:
+    """Stand-in web3 eth: balances and nonces per account."""
+
+    def __init__(self, balance=10 ** 18):
+        self.balances = {account.address: balance for account in ACCOUNTS}
+        self.confirmed = {account.address: 0 for account in ACCOUNTS}
+        self.pending_reads = []
+
+    def get_balance(self, address):
+        return self.balances[address]
+
+    def get_transaction_count(self, address, block_identifier):
+        if block_identifier == "pending":
+            self.pending_reads.append(address)
+        return self.confirmed[address]
+
+
+class Connection:
+    def __init__(self, **kwargs):
+        self.eth = Eth(**kwargs)
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(payer_pool, "time", clock)
+    monkeypatch.setattr(NonceManager, "_instances", {})
+    return clock
+
+
+def pool(strategy="least_pending", **kwargs):
+    return PayerPool(ACCOUNTS, {"chain_id": 1}, strategy, **kwargs)
+
+
+def addresses(accounts):
+    return [ACCOUNTS.index(account) for account in accounts]
+
+
+def test_least_pending_spreads_and_refills_released_accounts(clock):
+    payers, connection = pool(), Connection()
+    acquired = [payers.acquire(connection) for _ in range(6)]
+    assert sorted(addresses(acquired)) == [0, 0, 1, 1, 2, 2]
+
+    payers.release(ACCOUNTS[1])
+    payers.release(ACCOUNTS[1])
+    assert addresses([payers.acquire(connection), payers.acquire(connection)]) == [1, 1]
+    assert [payer["pending"] for payer in payers.status()] == [2, 2, 2]
+
+
+def test_round_robin_takes_turns(clock):
+    payers, connection = pool("round_robin"), Connection()
+    assert addresses([payers.acquire(connection) for _ in range(7)]) == [0, 1, 2, 0, 1, 2, 0]
+
+
+def test_low_balance_accounts_are_skipped(clock):
+    connection = Connection()
+    connection.eth.balances[ACCOUNTS[1].address] = 50
+    payers = pool("round_robin", min_balance_wei=100)
+    assert 1 not in addresses([payers.acquire(connection) for _ in range(6)])
+    assert payers.status()[1]["reason"] == "low balance"
+
+    for account in ACCOUNTS:
+        connection.eth.balances[account.address] = 0
+    clock.now += 30
+    with pytest.raises(NoHealthyPayerError):
+        payers.acquire(connection)
+
+
+def test_stuck_account_is_paused_resynced_and_resumed(clock):
+    connection = Connection()
+    payers = pool("round_robin", stuck_seconds=300, health_check_seconds=30)
+    stuck = ACCOUNTS[0]
+    assert payers.acquire(connection) == stuck
+
+    # Pending, and the confirmed nonce never moves
+    for _ in range(9):
+        clock.now += 30
+        payers._check_due(connection)
+    assert payers.status()[0]["healthy"]
+    clock.now += 30
+    payers._check_due(connection)
+    assert payers.status()[0]["reason"] == "stuck"
+    assert connection.eth.pending_reads == [stuck.address]
+    assert stuck not in [payers.acquire(connection) for _ in range(4)]
+
+    connection.eth.confirmed[stuck.address] = 1
+    clock.now += 30
+    payers._check_due(connection)
+    assert payers.status()[0]["healthy"]
+
+
+def test_idle_account_is_never_stuck(clock):
+    connection = Connection()
+    payers = pool(stuck_seconds=300, health_check_seconds=30)
+    for _ in range(20):
+        clock.now += 30
+        payers._check_due(connection)
+    assert all(payer["healthy"] for payer in payers.status())
+
+
+def test_unknown_strategy():
+    with pytest.raises(ValueError):
+        pool("random")
+
+
+def test_load_private_keys_dedupes_in_order(tmp_path):
+    keyfile = tmp_path / "payers.txt"
+    keyfile.write_text("k2\n\n# spare keys\nk3  # funded\nk4,k5\n")
+    keys = load_private_keys("k1,k2", str(keyfile), {"PAYER_PRIVATE_KEYS": "k6 k1\nk3"})
+    assert keys == ["k1", "k2", "k3", "k4", "k5", "k6"]
+
+
+def test_load_private_keys_from_the_environment_only():
+    assert load_private_keys(None, None, {"PAYER_PRIVATE_KEYS": "k1, k2"}) == ["k1", "k2"]
+    with pytest.raises(ValueError):
+        load_private_keys(None, None, {})
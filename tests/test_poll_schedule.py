@@ -0,0 +1,72 @@
+import json
+import multiprocessing
+import os
+
+from poll_schedule import AdaptivePollSchedule
+
+
+def schedule(**kwargs):
+    return AdaptivePollSchedule(min_seconds=1, max_seconds=1000, deadline_seconds=10000, jitter=0,
+                                min_samples=5, **kwargs)
+
+
+def test_polls_aim_at_completions_of_challenges_in_the_same_state():
+    poll = schedule()
+    for elapsed in range(100, 110):
+        poll.record_completion("pob/downlink", elapsed, ["ACCEPTED", "STARTED"])
+    for elapsed in range(400, 410):
+        poll.record_completion("pob/downlink", elapsed, ["ACCEPTED", "WAITING"])
+
+    assert poll.next_delay("pob/downlink", 50, 1, "STARTED") == 51
+    assert poll.next_delay("pob/downlink", 50, 1, "WAITING") == 351
+    # Without samples for the state, all completions of the key are used
+    assert poll.next_delay("pob/downlink", 50, 1, "UNKNOWN") == 52
+    assert poll.next_delay("pob/downlink", 50, 1) == 52
+
+
+def test_backs_off_without_enough_samples():
+    poll = schedule()
+    poll.record_completion("pol", 10, ["ACCEPTED"])
+    assert [poll.next_delay("pol", 0, attempt, "ACCEPTED") for attempt in range(4)] == [1, 2, 4, 8]
+
+
+def test_deadline():
+    poll = schedule()
+    assert poll.next_delay("pol", 9999.5, 20) == 0.5
+    assert poll.next_delay("pol", 10000, 20) is None
+
+
+def test_stats_survive_a_restart(tmp_path):
+    stats_file = str(tmp_path / "poll_stats.json")
+    poll = schedule(stats_file=stats_file)
+    for elapsed in range(100, 110):
+        poll.record_completion("pol", elapsed, ["ACCEPTED"])
+    poll.save()
+
+    restored = schedule(stats_file=stats_file)
+    assert restored.next_delay("pol", 50, 1, "ACCEPTED") == poll.next_delay("pol", 50, 1, "ACCEPTED")
+
+
+def save_repeatedly(stats_file, index):
+    poll = schedule(stats_file=stats_file)
+    for elapsed in range(1000):
+        poll.record_completion(f"pol/{index}", elapsed, ["ACCEPTED"])
+    for _ in range(50):
+        poll.save()
+
+
+def test_concurrent_saves_leave_a_complete_file(tmp_path):
+    stats_file = str(tmp_path / "poll_stats.json")
+    context = multiprocessing.get_context("fork")
+    writers = [context.Process(target=save_repeatedly, args=(stats_file, index)) for index in range(4)]
+    for writer in writers:
+        writer.start()
+    for writer in writers:
+        writer.join(60)
+        assert writer.exitcode == 0
+
+    with open(stats_file) as file:
+        stats = json.load(file)
+    # A writer may have loaded another's stats first, but every saved file is whole
+    assert stats["completions"] and all(len(samples) == 500 for samples in stats["completions"].values())
+    assert os.listdir(tmp_path) == ["poll_stats.json"]
@@ -0,0 +1,60 @@
+import pytest
+
+from api import ProverListError
+from prover_catalog import ProverCatalog
+
+
+def prover(index, **fields):
+    return {"id": f"IPv4/0x{index:040X}", "projectName": "Witness", "last_alive": "2026-03-01T12:00:00Z",
+            **fields}
+
+
+@pytest.fixture
+def catalog(tmp_path):
+    catalog = ProverCatalog(str(tmp_path / "catalog.db"))
+    yield catalog
+    catalog.close()
+
+
+def test_sync_skips_malformed_rows(catalog):
+    provers = [
+        prover(1),
+        {"projectName": "Witness"},
+        prover(2, id="0x" + "2" * 40),
+        prover(3, last_alive="yesterday"),
+        prover(4, last_alive=17),
+        prover(5, projectName=None),
+        prover(6, projectName=6),
+        prover(7),
+    ]
+
+    assert list(catalog.sync("testnet", "pol", provers)) == provers
+
+    assert catalog.last_synced("testnet", "pol") is not None
+    stored = catalog.select("testnet", "pol")
+    assert sorted(p["id"] for p in stored) == [prover(i)["id"] for i in (1, 5, 7)]
+    assert [p["id"] for p in catalog.select("testnet", "pol", project_name="wit")] == \
+        [prover(i)["id"] for i in (1, 7)]
+    assert catalog.select("testnet", "pol", address=f"0x{7:040x}") == [prover(7)]
+
+
+def test_complete_sync_drops_unseen_rows(catalog):
+    list(catalog.sync("testnet", "pol", [prover(1), prover(2)]))
+    list(catalog.sync("testnet", "pol", [prover(2)]))
+
+    assert catalog.select("testnet", "pol") == [prover(2)]
+
+
+def test_interrupted_sync_keeps_rows(catalog):
+    list(catalog.sync("testnet", "pol", [prover(1), prover(2)]))
+    synced = catalog.last_synced("testnet", "pol")
+
+    def failing_pages():
+        yield prover(2)
+        raise ProverListError("page 2 failed")
+
+    with pytest.raises(ProverListError):
+        list(catalog.sync("testnet", "pol", failing_pages()))
+
+    assert sorted(p["id"] for p in catalog.select("testnet", "pol")) == [prover(1)["id"], prover(2)["id"]]
+    assert catalog.last_synced("testnet", "pol") == synced
@@ -0,0 +1,120 @@
+import random
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+import api
+import prover_selection
+from api import is_alive_yet
+from prover_processor import ProverProcessor
+from prover_selection import select_provers
+
+NOW = datetime(2026, 3, 1, 12, 0, 0, 250000, tzinfo=timezone.utc)
+ALIVE_MINUTES = 240
+PROJECTS = ["witness_chain", "WITNESS_CHAIN", "Witness_Chain_2", "ping", "pingpong", "other", "", None]
+
+
+class FrozenDatetime(datetime):
+    @classmethod
+    def now(cls, tz=None):
+        return NOW.astimezone(tz) if tz else NOW.astimezone().replace(tzinfo=None)
+
+
+@pytest.fixture(autouse=True)
+def frozen_clock(monkeypatch):
+    monkeypatch.setattr(api, "datetime", FrozenDatetime)
+
+
+def last_alive(rng):
+    """A last_alive around the alive window's edges, in the formats the API and old rows use."""
+    window = timedelta(minutes=ALIVE_MINUTES)
+    age = rng.choice([
+        timedelta(0), window - timedelta(microseconds=1), window, window + timedelta(microseconds=1),
+        timedelta(seconds=rng.uniform(0, 2 * window.total_seconds())), -timedelta(minutes=5),
+    ])
+    stamp = NOW - age
+    form = rng.randrange(6)
+    if form == 0:
+        return stamp.strftime("%Y-%m-%dT%H:%M:%S.%fZ")
+    if form == 1:
+        return stamp.replace(microsecond=0).strftime("%Y-%m-%dT%H:%M:%SZ")
+    if form == 2:
+        return stamp.astimezone(timezone(timedelta(hours=5, minutes=30))).isoformat()
+    if form == 3:
+        return stamp.astimezone().replace(tzinfo=None).isoformat()
+    return rng.choice([None, ""])
+
+
+def synthetic_provers(rng, count):
+    provers = []
+    for _ in range(count):
+        family = rng.choice(["IPv4", "IPv6"])
+        address = f"0x{rng.getrandbits(160):040x}"
+        prover = {"id": f"{family}/{rng.choice([address, address.upper().replace('0X', '0x')])}"}
+        project = rng.choice(PROJECTS)
+        if project is not None or rng.random() < 0.5:
+            prover["projectName"] = project
+        alive = last_alive(rng)
+        if alive is not None or rng.random() < 0.5:
+            prover["last_alive"] = alive
+        provers.append(prover)
+    return provers
+
+
+def per_prover(processor, provers, project_name, prover_to_challenge):
+    """The one-by-one decision: should_run_for_prover and is_alive_yet, as _validate_prover applies them."""
+    decisions = []
+    for prover in provers:
+        prover_id = prover["id"].split("/")[1]
+        decisions.append(
+            processor.should_run_for_prover(prover, prover_id, project_name, prover_to_challenge)
+            and is_alive_yet(prover.get("last_alive"), ALIVE_MINUTES)
+        )
+    return decisions
+
+
+def cases(provers):
+    target = provers[0]["id"].split("/")[1]
+    yield "witness", None
+    yield "WITNESS_CHAIN", None
+    yield "ping", None
+    yield "missing", None
+    yield None, "all"
+    yield None, "ALL"
+    yield None, target
+    yield None, target.upper().replace("0X", "0x")
+    yield None, "0x" + "0" * 40
+    yield None, None
+
+
+@pytest.fixture
+def processor():
+    return ProverProcessor(None, {}, {}, {"alive_check_minutes": ALIVE_MINUTES}, "./", poller=object())
+
+
+@pytest.mark.parametrize("seed", range(5))
+@pytest.mark.parametrize("vectorized", [True, False], ids=["numpy", "scalar"])
+def test_matches_per_prover_decisions(monkeypatch, processor, seed, vectorized):
+    if not vectorized:
+        monkeypatch.setattr(prover_selection, "np", None)
+    rng = random.Random(seed)
+    provers = synthetic_provers(rng, 500)
+    for project_name, prover_to_challenge in cases(provers):
+        expected = per_prover(processor, provers, project_name, prover_to_challenge)
+        actual = select_provers(provers, ALIVE_MINUTES, project_name, prover_to_challenge,
+                                now=NOW.timestamp())
+        assert actual == expected, (project_name, prover_to_challenge)
+
+
+def test_alive_window_edges(processor):
+    window = timedelta(minutes=ALIVE_MINUTES)
+    ages = [timedelta(0), window - timedelta(microseconds=1), window, window + timedelta(microseconds=1)]
+    provers = [{"id": f"IPv6/0x{index:040x}", "projectName": "ping",
+                "last_alive": (NOW - age).strftime("%Y-%m-%dT%H:%M:%S.%fZ")}
+               for index, age in enumerate(ages)]
+    assert select_provers(provers, ALIVE_MINUTES, "ping", now=NOW.timestamp()) == [True, True, False, False]
+    assert per_prover(processor, provers, "ping", None) == [True, True, False, False]
+
+
+def test_empty_list():
+    assert select_provers([], ALIVE_MINUTES, "ping") == []
@@ -0,0 +1,98 @@
+import pytest
+
+import rate_limiter as rate_limiter_module
+from rate_limiter import (DEFAULT_RETRY_AFTER_SECONDS, MAX_RETRY_AFTER_SECONDS, RateLimiter, TokenBucket,
+                          endpoint_key, parse_retry_after)
+
+API_URL = "https://api.example.com/proof/v1/pol"
+
+
+class Clock:
+    """Fake time: sleeping moves the monotonic clock forward."""
+
+    def __init__(self):
+        self.now = 1000.0
+
+    def monotonic(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.now += seconds
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(rate_limiter_module, "time", clock)
+    return clock
+
+
+def waits(bucket, count):
+    return [round(bucket.acquire(), 6) for _ in range(count)]
+
+
+def test_burst_then_steady_rate(clock):
+    bucket = TokenBucket(rate_per_second=10, burst=5)
+    assert waits(bucket, 5) == [0] * 5
+    assert waits(bucket, 3) == [0.1] * 3
+    assert clock.now == pytest.approx(1000.3)
+
+
+def test_refills_at_the_rate_while_idle(clock):
+    bucket = TokenBucket(rate_per_second=10, burst=5)
+    waits(bucket, 6)
+    clock.sleep(0.3)
+    assert waits(bucket, 4) == [0, 0, 0, 0.1]
+    # Never more than the burst, however long the bucket idles
+    clock.sleep(60)
+    assert waits(bucket, 6) == [0] * 5 + [0.1]
+
+
+def test_retry_after_pauses_every_caller_then_resumes_without_burst(clock):
+    limiter = RateLimiter()
+    limiter.configure(API_URL, {"default": {"rate_per_second": 10, "burst": 5}})
+    url = f"{API_URL}/challenge-status"
+    assert limiter.acquire(url) == 0
+
+    assert limiter.throttled(url, "2") == 2
+    assert round(limiter.acquire(url), 6) == 2
+    assert [round(limiter.acquire(url), 6) for _ in range(2)] == [0.1, 0.1]
+
+
+def test_unlimited_bucket_only_enforces_pauses(clock):
+    bucket = TokenBucket()
+    assert waits(bucket, 100) == [0] * 100
+    bucket.pause(1.5)
+    assert waits(bucket, 2) == [1.5, 0]
+
+
+def test_limits_per_endpoint_and_host(clock):
+    limiter = RateLimiter()
+    limiter.configure(API_URL, {"default": {"rate_per_second": 1, "burst": 1},
+                                "challenge-status": {"rate_per_second": 10, "burst": 2}})
+    status, trigger = f"{API_URL}/challenge-status", f"{API_URL}/challenge-request"
+    assert [limiter.acquire(status) for _ in range(3)] == [0, 0, pytest.approx(0.1)]
+    assert [limiter.acquire(trigger) for _ in range(2)] == [0, pytest.approx(1)]
+    # Another host has its own buckets, unlimited until configured
+    assert limiter.acquire("https://other.example.com/proof/v1/pol/challenge-request") == 0
+
+    assert endpoint_key(status) == ("api.example.com", "challenge-status")
+
+
+@pytest.mark.parametrize("value, seconds", [
+    ("3", 3),
+    ("0.5", 0.5),
+    ("-4", 0),
+    ("100000", MAX_RETRY_AFTER_SECONDS),
+    (None, DEFAULT_RETRY_AFTER_SECONDS),
+    ("soon", DEFAULT_RETRY_AFTER_SECONDS),
+    ("Wed, 21 Oct 2015 07:28:00 GMT", 0),
+    ("Fri, 01 Jan 2100 00:00:00 GMT", MAX_RETRY_AFTER_SECONDS),
+])
+def test_parse_retry_after(value, seconds):
+    assert parse_retry_after(value) == seconds
+
+
+def test_zero_burst_holds_the_first_call(clock):
+    bucket = TokenBucket(rate_per_second=10, burst=0)
+    assert waits(bucket, 3) == [0.1, 0.1, 0.1]
@@ -0,0 +1,159 @@
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+from hexbytes import HexBytes
+
+from receipt_watcher import ReceiptTimeout, ReceiptWatcher
+from rpc_pool import RpcPool
+
+SENDER = "0x" + "aa" * 20
+CONTRACT = "0x" + "bb" * 20
+
+
+def raw_receipt(tx_hash, block):
+    return {
+        "blockHash": "0x" + f"{block:064x}",
+        "blockNumber": hex(block),
+        "contractAddress": None,
+        "cumulativeGasUsed": "0x5208",
+        "effectiveGasPrice": "0x3b9aca00",
+        "from": SENDER,
+        "gasUsed": "0x5208",
+        "logs": [{
+            "address": CONTRACT,
+            "blockHash": "0x" + f"{block:064x}",
+            "blockNumber": hex(block),
+            "data": "0x" + "00" * 31 + "2a",
+            "logIndex": "0x0",
+            "removed": False,
+            "topics": ["0x" + "cc" * 32],
+            "transactionHash": tx_hash,
+            "transactionIndex": "0x0",
+        }],
+        "logsBloom": "0x" + "00" * 256,
+        "status": "0x1",
+        "to": CONTRACT,
+        "transactionHash": tx_hash,
+        "transactionIndex": "0x0",
+        "type": "0x2",
+    }
+
+
+class StandInNode:
+    """Minimal JSON-RPC node: a block counter and the receipts mined into each block."""
+
+    def __init__(self, block_receipts=True):
+        self.block_receipts = block_receipts
+        self.block = 100
+        self.blocks = {}
+        self.calls = []
+        self.lock = threading.Lock()
+        node = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                payload = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+                body = json.dumps([node.answer(call) for call in payload]).encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.url = f"http://127.0.0.1:{self.server.server_port}"
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def mine(self, *tx_hashes):
+        with self.lock:
+            self.block += 1
+            self.blocks[self.block] = [raw_receipt(tx_hash, self.block) for tx_hash in tx_hashes]
+
+    def answer(self, call):
+        method, params = call["method"], call["params"]
+        with self.lock:
+            self.calls.append(method)
+            if method == "eth_blockNumber":
+                result = hex(self.block)
+            elif method == "eth_getBlockReceipts" and self.block_receipts:
+                result = self.blocks.get(int(params[0], 16), [])
+            elif method == "eth_getTransactionReceipt":
+                result = next((receipt for receipts in self.blocks.values() for receipt in receipts
+                               if receipt["transactionHash"] == params[0]), None)
+            else:
+                return {"jsonrpc": "2.0", "id": call["id"],
+                        "error": {"code": -32601, "message": "the method does not exist"}}
+        return {"jsonrpc": "2.0", "id": call["id"], "result": result}
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+@pytest.fixture(params=[True, False], ids=["eth_getBlockReceipts", "eth_getTransactionReceipt"])
+def node(request):
+    node = StandInNode(block_receipts=request.param)
+    yield node
+    node.close()
+
+
+def tx_hash(index):
+    return "0x" + f"{index:064x}"
+
+
+def test_resolves_receipts_per_block(node):
+    watcher = ReceiptWatcher(node.url, poll_interval=0.05, timeout=10, batch_size=3)
+    futures = [watcher.watch(tx_hash(index)) for index in range(7)]
+    # Every hash is looked up once, then later blocks cover them
+    deadline = time.monotonic() + 5
+    while node.calls.count("eth_getTransactionReceipt") < 7 and time.monotonic() < deadline:
+        time.sleep(0.01)
+    node.mine(*(tx_hash(index) for index in range(4)))
+    node.mine(*(tx_hash(index) for index in range(4, 7)))
+
+    receipts = [future.result(timeout=5) for future in futures]
+    assert [receipt.transactionHash for receipt in receipts] == [HexBytes(tx_hash(index)) for index in range(7)]
+    receipt = receipts[0]
+    assert receipt.status == 1 and receipt.blockNumber == 101 and receipt.gasUsed == 21000
+    assert receipt["from"] == "0xaAaAaAaaAaAaAaaAaAAAAAAAAaaaAaAaAaaAaaAa"
+    assert receipt.logs[0].topics == [HexBytes("0x" + "cc" * 32)]
+    assert receipt.logs[0].data == HexBytes("0x" + "00" * 31 + "2a")
+    assert watcher.pending == 0
+
+    if node.block_receipts:
+        assert "eth_getBlockReceipts" in node.calls
+    else:
+        # The node rejected eth_getBlockReceipts once, and the watcher stopped asking
+        assert node.calls.count("eth_getBlockReceipts") == 1
+        assert watcher._block_receipts_supported is False
+
+
+def test_already_mined_transaction_resolves_on_first_lookup(node):
+    node.mine(tx_hash(1))
+    watcher = ReceiptWatcher(node.url, poll_interval=0.05, timeout=10)
+    assert watcher.watch(HexBytes(tx_hash(1))).result(timeout=5).blockNumber == 101
+
+
+def test_times_out_when_never_mined(node):
+    watcher = ReceiptWatcher(node.url, poll_interval=0.05, timeout=0.2)
+    with pytest.raises(ReceiptTimeout):
+        watcher.watch(tx_hash(1)).result(timeout=5)
+
+
+def test_pool_watcher_moves_off_a_failing_endpoint(node):
+    # Nothing listens on the first endpoint
+    pool = RpcPool(["http://127.0.0.1:9", node.url])
+    node.mine(tx_hash(1))
+    watcher = ReceiptWatcher(pool=pool, poll_interval=0.05, timeout=10)
+
+    assert watcher.watch(tx_hash(1)).result(timeout=5).blockNumber == 101
+    down, up = pool.endpoints
+    assert not down.healthy and down.failures >= 1
+    assert up.latency is not None
+    assert pool.ranked()[0] is up
@@ -0,0 +1,135 @@
+import json
+import uuid
+
+import pytest
+import requests
+from urllib3.exceptions import MaxRetryError, NewConnectionError
+
+import api
+import resilience as resilience_module
+from resilience import CLOSED, HALF_OPEN, OPEN, CircuitBreaker, CircuitOpenError, resilience
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def monotonic(self):
+        return self.now
+
+
+class ScriptedSession:
+    """Session whose posts answer from a script of status codes and exceptions."""
+
+    def __init__(self, *script):
+        self.script = list(script)
+        self.posts = []
+
+    def post(self, url, **kwargs):
+        self.posts.append(url)
+        outcome = self.script.pop(0)
+        if isinstance(outcome, Exception):
+            raise outcome
+        response = requests.Response()
+        response.status_code = outcome
+        response.headers["Retry-After"] = "0"
+        response._content = json.dumps(
+            {"result": {"challenge_id": "c1", "challenge_status": "ACCEPTED"}}).encode()
+        return response
+
+
+def connection_refused():
+    reason = NewConnectionError(None, "Failed to establish a new connection: [Errno 111] Connection refused")
+    return requests.exceptions.ConnectionError(MaxRetryError(None, "/", reason=reason))
+
+
+@pytest.fixture
+def api_config():
+    # A host of its own, so breakers and policies don't leak between tests
+    api_config = {"api_url": f"https://{uuid.uuid4().hex}.example.com/proof/v1",
+                  "challenge_trigger_end_point": "challenge-request"}
+    resilience.configure(api_config["api_url"], {"attempts": 4, "backoff_seconds": 0},
+                         {"failure_threshold": 5, "reset_seconds": 30})
+    return api_config
+
+
+def trigger(session, api_config):
+    return api.request_challenge(session, api_config, "pol", "0x" + "11" * 20, "c1", challenger_count=2)
+
+
+def test_idempotent_calls_retry_network_errors_and_5xx(api_config):
+    session = ScriptedSession(requests.exceptions.ReadTimeout("read timed out"), 502, 200)
+    response = api._post(session, f"{api_config['api_url']}/pol/challenge-status")
+    assert response.status_code == 200
+    assert len(session.posts) == 3
+
+
+def test_idempotent_calls_give_up_after_the_policy_attempts(api_config):
+    session = ScriptedSession(500, 500, 500, 500)
+    assert api._post(session, f"{api_config['api_url']}/pol/prover").status_code == 500
+    assert len(session.posts) == 4
+
+
+@pytest.mark.parametrize("outcome", [
+    requests.exceptions.ReadTimeout("read timed out"),
+    requests.exceptions.ConnectionError("Connection aborted: connection reset by peer"),
+    requests.exceptions.ChunkedEncodingError("response ended prematurely"),
+    500, 502, 503, 504, 429,
+], ids=repr)
+def test_trigger_is_never_sent_twice_once_the_body_was_sent(api_config, outcome):
+    session = ScriptedSession(outcome, 200)
+    assert trigger(session, api_config) is None
+    assert len(session.posts) == 1
+
+
+@pytest.mark.parametrize("error", [requests.exceptions.ConnectTimeout("connect timed out"), connection_refused()],
+                         ids=["connect timeout", "connection refused"])
+def test_trigger_is_retried_when_the_connection_never_opened(api_config, error):
+    session = ScriptedSession(error, 200)
+    assert trigger(session, api_config)["result"]["challenge_id"] == "c1"
+    assert len(session.posts) == 2
+
+
+def test_open_circuit_fails_without_calling_the_api(api_config):
+    url = f"{api_config['api_url']}/pol/challenge-status"
+    session = ScriptedSession(*[requests.exceptions.ReadTimeout("read timed out")] * 5)
+    for _ in range(5):
+        with pytest.raises(requests.exceptions.ReadTimeout):
+            api._post(session, url, idempotent=False)
+    assert resilience.breaker(url).state == OPEN
+
+    with pytest.raises(CircuitOpenError):
+        api._post(session, url)
+    assert len(session.posts) == 5
+    # Other endpoints of the host keep their own circuit
+    assert resilience.breaker(f"{api_config['api_url']}/pol/prover").state == CLOSED
+
+
+def test_breaker_closed_open_half_open_closed(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(resilience_module, "time", clock)
+    breaker = CircuitBreaker("api/challenge-status", failure_threshold=3, reset_seconds=30)
+
+    for _ in range(2):
+        assert breaker.allow()
+        breaker.record_failure()
+    assert breaker.state == CLOSED
+    breaker.record_success()
+    for _ in range(3):
+        breaker.record_failure()
+    assert breaker.state == OPEN and not breaker.allow()
+
+    clock.now += 29.9
+    assert not breaker.allow()
+    clock.now += 0.1
+    # One probe at a time while half-open
+    assert breaker.allow() and breaker.state == HALF_OPEN
+    assert not breaker.allow()
+    breaker.record_failure()
+    assert breaker.state == OPEN and not breaker.allow()
+
+    clock.now += 30
+    assert breaker.allow() and breaker.state == HALF_OPEN
+    breaker.record_success()
+    assert breaker.state == CLOSED
+    assert all(breaker.allow() for _ in range(5))
@@ -0,0 +1,112 @@
+import os
+import queue
+import subprocess
+import sys
+from collections import Counter
+
+import pytest
+
+import sharded_runner
+from prover_selection import shard_of
+from sharded_runner import ShardedRunner, _scaled_rate_limits
+
+SRC_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src")
+ADDRESSES = [f"0x{index * 7919:040x}" for index in range(8000)]
+
+
+def test_shard_of_ignores_ip_family_and_case():
+    for address in ADDRESSES[:100]:
+        shard = shard_of(f"IPv4/{address}", 8)
+        assert shard_of(f"IPv6/{address.upper().replace('0X', '0x')}", 8) == shard
+        assert shard_of(address, 8) == shard
+
+
+def test_shard_of_is_stable_across_processes():
+    # A fresh interpreter has a different str hash seed, so this fails for hash()-based sharding
+    code = (f"import sys; sys.path.insert(0, {SRC_PATH!r}); from prover_selection import shard_of; "
+            f"print([shard_of(f'IPv4/0x{{i * 7919:040x}}', 8) for i in range(200)])")
+    output = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True,
+                            env={**os.environ, "PYTHONHASHSEED": "123"}).stdout
+    assert output.strip() == str([shard_of(f"IPv4/{address}", 8) for address in ADDRESSES[:200]])
+
+
+@pytest.mark.parametrize("shards", [2, 3, 8])
+def test_shard_of_spreads_provers_evenly(shards):
+    counts = Counter(shard_of(f"IPv4/{address}", shards) for address in ADDRESSES)
+    assert sorted(counts) == list(range(shards))
+    expected = len(ADDRESSES) / shards
+    assert all(abs(count - expected) < 0.1 * expected for count in counts.values())
+
+
+@pytest.mark.parametrize("shards", [1, 3, 4, 8])
+@pytest.mark.parametrize("burst", [1, 3, 8, 20])
+def test_scaled_rate_limits_stay_within_the_configured_limits(shards, burst):
+    rate_limits = {"default": {"rate_per_second": 10, "burst": burst},
+                   "challenge-status": {"rate_per_second": 20}}
+    scaled = [_scaled_rate_limits(rate_limits, shards, index) for index in range(shards)]
+
+    assert sum(limits["default"]["burst"] for limits in scaled) == burst
+    assert sum(limits["challenge-status"]["burst"] for limits in scaled) == 1
+    assert sum(limits["default"]["rate_per_second"] for limits in scaled) == pytest.approx(10)
+    bursts = [limits["default"]["burst"] for limits in scaled]
+    assert max(bursts) - min(bursts) <= 1
+    # The config is left as it was
+    assert rate_limits["default"] == {"rate_per_second": 10, "burst": burst}
+
+
+class Worker:
+    def __init__(self, alive, exitcode=None):
+        self.alive = alive
+        self.exitcode = exitcode
+
+    def is_alive(self):
+        return self.alive
+
+
+class Results:
+    """Results queue answering from a list, then empty."""
+
+    def __init__(self, results):
+        self.results = list(results)
+
+    def get(self, timeout=None):
+        if not self.results:
+            raise queue.Empty
+        return self.results.pop(0)
+
+
+class Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def monotonic(self):
+        self.now += 1
+        return self.now
+
+
+def test_collect_reports_a_worker_that_died_without_a_result(monkeypatch):
+    monkeypatch.setattr(sharded_runner, "time", Clock())
+    runner = ShardedRunner.__new__(ShardedRunner)
+    finished = {"shard": 0, "provers": 12, "error": None, "metrics": {}}
+    workers = [Worker(alive=False, exitcode=0), Worker(alive=False, exitcode=-9)]
+
+    results = runner._collect(Results([finished]), workers)
+
+    assert results[0] == finished
+    assert results[1] == {"shard": 1, "provers": 0, "metrics": {}, "error": "exited with code -9"}
+
+
+def test_collect_waits_for_a_result_sent_just_before_exit(monkeypatch):
+    monkeypatch.setattr(sharded_runner, "time", Clock())
+    runner = ShardedRunner.__new__(ShardedRunner)
+    late = {"shard": 0, "provers": 3, "error": None, "metrics": {}}
+
+    class LateResults(Results):
+        def get(self, timeout=None):
+            self.calls = getattr(self, "calls", 0) + 1
+            # Arrives after the worker was first seen exited, within the grace period
+            if self.calls == 3:
+                return late
+            raise queue.Empty
+
+    assert runner._collect(LateResults([]), [Worker(alive=False, exitcode=0)]) == [late]
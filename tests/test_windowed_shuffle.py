@@ -0,0 +1,59 @@
+import random
+
+import api
+from challenge_network import ChallengeNetwork, windowed_shuffle
+from logger import Logger
+
+PAGE_SIZE = 500
+WINDOW = 1000
+
+
+def paged(total):
+    """get_provers stand-in serving total provers, recording each page requested."""
+    calls = []
+
+    def get_provers(session, api_config, proof_type, skip=0, limit=10000):
+        calls.append(skip)
+        return {"provers": [{"id": f"IPv4/0x{index:040x}"} for index in range(skip, min(skip + limit, total))]}
+    return get_provers, calls
+
+
+def test_first_prover_after_one_page(monkeypatch):
+    get_provers, calls = paged(5 * PAGE_SIZE)
+    monkeypatch.setattr(api, "get_provers", get_provers)
+    network = ChallengeNetwork.__new__(ChallengeNetwork)
+    network.logger, network.catalog = Logger(), None
+    api_config = {"provers_page_size": PAGE_SIZE, "provers_shuffle_window": WINDOW}
+
+    provers = network._get_provers(None, api_config, "pol", "all")
+    next(provers)
+
+    assert calls == [0]
+
+
+def test_yields_every_item_once():
+    random.seed(3)
+    items = list(range(5000))
+    shuffled = list(windowed_shuffle(iter(items), WINDOW, PAGE_SIZE))
+    assert sorted(shuffled) == items
+    assert shuffled != items
+
+
+def test_buffer_stays_within_window():
+    consumed = []
+
+    def items():
+        for index in range(10000):
+            consumed.append(index)
+            yield index
+    for yielded, item in enumerate(windowed_shuffle(items(), WINDOW, PAGE_SIZE), 1):
+        if yielded == 1:
+            assert len(consumed) == PAGE_SIZE and item < PAGE_SIZE
+        assert len(consumed) - yielded < WINDOW
+    assert len(consumed) == 10000
+
+
+def test_defaults_to_full_window():
+    items = iter(range(3 * WINDOW))
+    next(windowed_shuffle(items, WINDOW))
+    assert next(items) == WINDOW